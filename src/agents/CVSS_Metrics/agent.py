@@ -1,16 +1,21 @@
 from google.adk.agents import SequentialAgent, ParallelAgent, LlmAgent, Agent
 import math
 
+from common.nvd_index import lookup_cve
+import common.scheduled_gemini  # noqa: F401  (gemini-* models go through the shared LLM scheduler)
+
 # --- Agent: Collect CVE Information from Internet ---
 cve_info_agent = LlmAgent(
     name="cve_info_agent",
     model="gemini-2.0-flash",
     instruction="""
-        For each CVE in the input list, search the internet (NVD, vendor advisories, security blogs, exploit databases, etc.)
-        and collect all relevant information: descriptions, exploit details, impact, and any available CVSS vectors.
+        For each CVE in the input list, call the lookup_cve tool to get the authoritative NVD record
+        (description, CVSS vector and score, severity, CWEs, affected products, dates) and collect all relevant information:
+        descriptions, exploit details, impact, and any available CVSS vectors.
         Store a dictionary for each CVE with all gathered details.
         Do not display any additional messages expect for the information that you collected in a clear bullet point format.
     """,
+    tools=[lookup_cve],
     output_key="cve_info"
 )
 
@@ -3,7 +3,9 @@ from google.adk.agents import Agent, LlmAgent
 from google.adk.tools.tool_context import ToolContext
 from google.genai import types
 from google.genai.client import Client
-from google.adk.agents import SequentialAgent
+from google.adk.agents import SequentialAgent, ParallelAgent
+from Neo4j_Information.callbacks import start_pipeline, finish_pipeline, start_timer, stop_timer
+import common.scheduled_gemini  # noqa: F401  (gemini-* models go through the shared LLM scheduler)
 from Neo4j_Information.sub_agents.cve_info_fetcher_agent.agent import cve_info_fetcher_agent
 from Neo4j_Information.sub_agents.cwe_info_fetcher_agent.agent import cwe_info_fetcher_agent
 from Neo4j_Information.sub_agents.capec_info_fetcher_agent.agent import capec_info_fetcher_agent
@@ -11,13 +13,26 @@ from Neo4j_Information.sub_agents.ttp_info_fetcher_agent.agent import ttp_info_f
 from Neo4j_Information.sub_agents.mitigation_plan_generator_agent.agent import mitigation_plan_generator_agent
 from Neo4j_Information.sub_agents.implementation_plan_generator_agent.agent import implementation_plan_generator_agent
 
-# --- 2. Create the SequentialAgent ---
-# This agent orchestrates the pipeline by running the sub_agents in order.
+# --- 2. Fetch stage ---
+# The CVE, CWE, CAPEC and TTP lookups are independent, so they run concurrently.
+# Each fetcher skips itself when the request does not mention an ID of its kind.
+parallel_info_fetcher = ParallelAgent(
+    name="parallel_info_fetcher",
+    sub_agents=[cve_info_fetcher_agent, cwe_info_fetcher_agent, capec_info_fetcher_agent, ttp_info_fetcher_agent],
+    description="Fetches CVE, CWE, CAPEC and TTP information in parallel.",
+    before_agent_callback=start_timer,
+    after_agent_callback=stop_timer,
+)
+
+# --- 3. Create the SequentialAgent ---
+# This agent orchestrates the pipeline: fetch stage -> mitigation plan -> implementation plan.
+# A per-stage timing breakdown is stored in state["timing_breakdown"].
 Neo4j_information = SequentialAgent(
     name="Neo4j_information",
-    sub_agents=[cve_info_fetcher_agent, cwe_info_fetcher_agent, capec_info_fetcher_agent, ttp_info_fetcher_agent, mitigation_plan_generator_agent, implementation_plan_generator_agent],
+    sub_agents=[parallel_info_fetcher, mitigation_plan_generator_agent, implementation_plan_generator_agent],
     description="Fetches information about CVE, CWE, CAPEC, and TTP, and generates a mitigation and implementation plan.",
-    # The agents will run in the order provided: Writer -> Reviewer -> Refactorer
+    before_agent_callback=start_pipeline,
+    after_agent_callback=finish_pipeline,
 )
 
 # For ADK tools compatibility, the root agent must be named `root_agent`
@@ -0,0 +1,112 @@
+import re
+import time
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.genai import types
+
+# Entity IDs the fetchers know how to handle, keyed by the fetcher's entity kind.
+ENTITY_PATTERNS = {
+    "cve": re.compile(r"\bCVE-\d{4}-\d{4,}\b", re.IGNORECASE),
+    "cwe": re.compile(r"\bCWE-\d+\b", re.IGNORECASE),
+    "capec": re.compile(r"\bCAPEC-\d+\b", re.IGNORECASE),
+    "ttp": re.compile(r"\bT\d{4}(?:\.\d{3})?\b", re.IGNORECASE),
+}
+
+FETCHER_AGENTS = (
+    "cve_info_fetcher_agent",
+    "cwe_info_fetcher_agent",
+    "capec_info_fetcher_agent",
+    "ttp_info_fetcher_agent",
+)
+
+
+def extract_entities(text: str) -> dict:
+    """Return the CVE/CWE/CAPEC/TTP IDs mentioned in text, upper-cased and de-duplicated."""
+    return {
+        kind: list(dict.fromkeys(m.upper() for m in pattern.findall(text or "")))
+        for kind, pattern in ENTITY_PATTERNS.items()
+    }
+
+
+def _user_text(callback_context: CallbackContext) -> str:
+    content = callback_context.user_content
+    if not content or not content.parts:
+        return ""
+    return " ".join(part.text for part in content.parts if part.text)
+
+
+def _mark(callback_context: CallbackContext, field: str, value) -> None:
+    # One state key per agent: parallel fetchers must not overwrite each other's entries.
+    key = f"timing:{callback_context.agent_name}"
+    entry = dict(callback_context.state.get(key) or {})
+    entry[field] = value
+    callback_context.state[key] = entry
+
+
+def start_pipeline(callback_context: CallbackContext) -> Optional[types.Content]:
+    """Detect the entities in the request once, for the fetchers to decide whether to run, and reset the timings."""
+    state = callback_context.state
+    state["entities"] = extract_entities(_user_text(callback_context))
+    # Timing entries live in session state: clear the previous turn's, or a fetcher skipped
+    # then would still show as skipped now.
+    for key in [k for k in state.to_dict() if k.startswith("timing:")]:
+        state[key] = {}
+    _mark(callback_context, "start", time.time())
+    return None
+
+
+def start_timer(callback_context: CallbackContext) -> Optional[types.Content]:
+    _mark(callback_context, "start", time.time())
+    return None
+
+
+def stop_timer(callback_context: CallbackContext) -> Optional[types.Content]:
+    _mark(callback_context, "end", time.time())
+    return None
+
+
+def skip_if_missing(kind: str, output_key: str):
+    """Build a before_agent_callback that skips a fetcher when the request has no `kind` ID.
+
+    If the request mentions no known IDs at all, every fetcher runs as before.
+    """
+
+    def callback(callback_context: CallbackContext) -> Optional[types.Content]:
+        entities = callback_context.state.get("entities") or extract_entities(_user_text(callback_context))
+        if entities.get(kind) or not any(entities.values()):
+            _mark(callback_context, "start", time.time())
+            return None
+        _mark(callback_context, "skipped", True)
+        callback_context.state[output_key] = f"No {kind.upper()} was provided."
+        return types.Content(role="model", parts=[types.Part(text=f"No {kind.upper()} in the request; skipped.")])
+
+    return callback
+
+
+def _duration(entry: dict) -> float:
+    if entry.get("skipped") or "start" not in entry or "end" not in entry:
+        return 0.0
+    return entry["end"] - entry["start"]
+
+
+def finish_pipeline(callback_context: CallbackContext) -> Optional[types.Content]:
+    """Store a timing breakdown comparing the parallel fetch stage with the old serial order."""
+    _mark(callback_context, "end", time.time())
+    state = callback_context.state
+    per_agent = {name: round(_duration(state.get(f"timing:{name}") or {}), 3) for name in FETCHER_AGENTS}
+    fetch_wall = _duration(state.get("timing:parallel_info_fetcher") or {})
+    fetch_serial = sum(per_agent.values())
+    breakdown = {
+        "fetchers_s": per_agent,
+        "skipped": [name for name in FETCHER_AGENTS if (state.get(f"timing:{name}") or {}).get("skipped")],
+        "fetch_stage_wall_s": round(fetch_wall, 3),
+        "fetch_stage_serial_s": round(fetch_serial, 3),
+        "fetch_stage_saved_s": round(fetch_serial - fetch_wall, 3),
+        "mitigation_s": round(_duration(state.get("timing:mitigation_plan_generator_agent") or {}), 3),
+        "implementation_s": round(_duration(state.get("timing:implementation_plan_generator_agent") or {}), 3),
+        "total_s": round(_duration(state.get(f"timing:{callback_context.agent_name}") or {}), 3),
+    }
+    state["timing_breakdown"] = breakdown
+    print(f"--- Neo4j_information timing: {breakdown} ---")
+    return None
@@ -4,6 +4,15 @@ from google.adk.tools.tool_context import ToolContext
 from google.genai import types
 from google.genai.client import Client
 from google.adk.agents import SequentialAgent
+from Neo4j_Information.callbacks import skip_if_missing, stop_timer
+from common.graph import graph_lookup_result
+from common.mitre_kb import mitre_lookup
+
+
+def fetch_capec_from_graph(capec_ids: list[str], tool_context: ToolContext) -> dict:
+    """Fetch the description, severity, references and related nodes of CAPEC nodes from the Neo4j graph."""
+    print(f"--- Tool: fetch_capec_from_graph called for {capec_ids} ---")
+    return graph_lookup_result("CAPEC", capec_ids)
 
 
 # CAPEC Information Fetcher Agent
@@ -12,11 +21,15 @@ capec_info_fetcher_agent = LlmAgent(
     name="capec_info_fetcher_agent",
     model='gemini-2.0-flash',
     instruction="""You are a CAPEC information fetcher. Given a CAPEC, you should:
-1. Search for relevant information about the CAPEC.
+1. Call fetch_capec_from_graph once with all CAPEC IDs in the request, and mitre_lookup for the MITRE entry of IDs missing from the graph.
 2. Provide a brief description of the CAPEC.
 3. Provide the severity and affected products of the CAPEC.
 4. Provide any relevant links or references for the CAPEC.
+5. Only format what the tools returned; do not add facts from memory. If a CAPEC is missing from the graph, say so.
 """, 
     description="Fetches information about a CAPEC.",
+    tools=[fetch_capec_from_graph, mitre_lookup],
+    before_agent_callback=skip_if_missing("capec", "capec_info"),
+    after_agent_callback=stop_timer,
     output_key="capec_info"
 )
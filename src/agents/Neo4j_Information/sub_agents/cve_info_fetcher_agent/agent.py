@@ -4,6 +4,15 @@ from google.adk.tools.tool_context import ToolContext
 from google.genai import types
 from google.genai.client import Client
 from google.adk.agents import SequentialAgent
+from Neo4j_Information.callbacks import skip_if_missing, stop_timer
+from common.graph import graph_lookup_result
+from common.nvd_index import lookup_cve
+
+def fetch_cve_from_graph(cve_ids: list[str], tool_context: ToolContext) -> dict:
+    """Fetch the description, severity, references and related nodes of CVE nodes from the Neo4j graph."""
+    print(f"--- Tool: fetch_cve_from_graph called for {cve_ids} ---")
+    return graph_lookup_result("CVE", cve_ids)
+
 
 # CVE Information Fetcher Agent
 # Takes the initial specification (from user query) and fetches CVE information.
@@ -11,12 +20,16 @@ cve_info_fetcher_agent = LlmAgent(
     name="cve_info_fetcher_agent",
     model='gemini-2.0-flash',
     instruction="""You are a CVE information provider. Given a CVE, you should:
-1. Search for relevant information about the CVE.
+1. Call fetch_cve_from_graph with all CVE IDs in the request, and lookup_cve for the authoritative NVD record.
 2. Provide a brief description of the CVE.
 3. Provide the severity and affected products of the CVE.
 4. Provide any relevant links or references for the CVE.
+5. Only format what the tools returned; do not add facts from memory. If a CVE is missing from the graph, say so.
 """, 
     description="Fetches information about a CVE.",
+    tools=[fetch_cve_from_graph, lookup_cve],
+    before_agent_callback=skip_if_missing("cve", "cve_info"),
+    after_agent_callback=stop_timer,
     output_key="cve_info"
 )
 
@@ -4,20 +4,32 @@ from google.adk.tools.tool_context import ToolContext
 from google.genai import types
 from google.genai.client import Client
 from google.adk.agents import SequentialAgent
+from Neo4j_Information.callbacks import skip_if_missing, stop_timer
+from common.graph import graph_lookup_result
 
 
 
+def fetch_cwe_from_graph(cwe_ids: list[str], tool_context: ToolContext) -> dict:
+    """Fetch the description, severity, references and related nodes of CWE nodes from the Neo4j graph."""
+    print(f"--- Tool: fetch_cwe_from_graph called for {cwe_ids} ---")
+    return graph_lookup_result("CWE", cwe_ids)
+
+
 # CWE Information Fetcher Agent
 # Takes the initial specification (from user query) and fetches CWE information.
 cwe_info_fetcher_agent = LlmAgent(
     name="cwe_info_fetcher_agent",
     model='gemini-2.0-flash',
     instruction="""You are a CWE information fetcher. Given a CWE, you should:
-1. Search for relevant information about the CWE.
+1. Call fetch_cwe_from_graph once with all CWE IDs in the request.
 2. Provide a brief description of the CWE.
 3. Provide the severity and affected products of the CWE.
 4. Provide any relevant links or references for the CWE.
+5. Only format what the tools returned; do not add facts from memory. If a CWE is missing from the graph, say so.
 """, 
     description="Fetches information about a CWE.",
+    tools=[fetch_cwe_from_graph],
+    before_agent_callback=skip_if_missing("cwe", "cwe_info"),
+    after_agent_callback=stop_timer,
     output_key="cwe_info"
 )
@@ -4,6 +4,7 @@ from google.adk.tools.tool_context import ToolContext
 from google.genai import types
 from google.genai.client import Client
 from google.adk.agents import SequentialAgent
+from Neo4j_Information.callbacks import start_timer, stop_timer
 
 
 # Implementation Plan Generator Agent
@@ -18,6 +19,8 @@ implementation_plan_generator_agent = LlmAgent(
 4. Don't provide any timeline, but just give a plan or steps.
 """, 
     description="Generates an implementation plan.",
+    before_agent_callback=start_timer,
+    after_agent_callback=stop_timer,
     output_key="implementation_plan"
 )
 
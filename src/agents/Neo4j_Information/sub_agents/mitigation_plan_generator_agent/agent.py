@@ -4,6 +4,7 @@ from google.adk.tools.tool_context import ToolContext
 from google.genai import types
 from google.genai.client import Client
 from google.adk.agents import SequentialAgent
+from Neo4j_Information.callbacks import start_timer, stop_timer
 
 
 
@@ -19,5 +20,7 @@ mitigation_plan_generator_agent = LlmAgent(
 4. Don't provide any timeline, but just give a plan or steps.
 """, 
     description="Generates a mitigation plan.",
+    before_agent_callback=start_timer,
+    after_agent_callback=stop_timer,
     output_key="mitigation_plan"
 )
@@ -4,6 +4,15 @@ from google.adk.tools.tool_context import ToolContext
 from google.genai import types
 from google.genai.client import Client
 from google.adk.agents import SequentialAgent
+from Neo4j_Information.callbacks import skip_if_missing, stop_timer
+from common.graph import graph_lookup_result
+from common.mitre_kb import mitre_lookup
+
+
+def fetch_ttp_from_graph(ttp_ids: list[str], tool_context: ToolContext) -> dict:
+    """Fetch the description, severity, references and related nodes of TTP nodes from the Neo4j graph."""
+    print(f"--- Tool: fetch_ttp_from_graph called for {ttp_ids} ---")
+    return graph_lookup_result("TTP", ttp_ids)
 
 
 # TTP Information Fetcher Agent
@@ -12,11 +21,15 @@ ttp_info_fetcher_agent = LlmAgent(
     name="ttp_info_fetcher_agent",
     model='gemini-2.0-flash',
     instruction="""You are a TTP information fetcher. Given a TTP, you should:
-1. Search for relevant information about the TTP.
+1. Call fetch_ttp_from_graph once with all TTP IDs in the request, and mitre_lookup for the MITRE entry of IDs missing from the graph.
 2. Provide a brief description of the TTP.
 3. Provide the severity and affected products of the TTP.
 4. Provide any relevant links or references for the TTP.
+5. Only format what the tools returned; do not add facts from memory. If a TTP is missing from the graph, say so.
 """, 
     description="Fetches information about a TTP.",
+    tools=[fetch_ttp_from_graph, mitre_lookup],
+    before_agent_callback=skip_if_missing("ttp", "ttp_info"),
+    after_agent_callback=stop_timer,
     output_key="ttp_info"
 )
@@ -0,0 +1,2 @@
+# Shared, agent-independent building blocks (offline indexes, tools, clients)
+# used by the root agents in this directory. This package has no root_agent.
@@ -0,0 +1,269 @@
+"""
+Session blackboard: typed artifacts the manager's specialists share.
+
+threat_generator, attack_risk_assessor, incident_response_agent and
+threat_intelligence_aggregator work on the same threat path within a
+session, and each used to regenerate what another had already produced.
+They now publish what they produce to ADK session state, and read from it
+before producing anything:
+
+- threat_chains, risk and mitigations are published by the
+  enumerate_threat_chains and assess_threat_risk tools, keyed by the
+  normalized threat path (ThreatPath.key()), so "CVE-X > CWE-Y" and
+  "cwe-y, CVE-X" share one entry.
+- iocs are published by threat_intelligence_aggregator through publish_iocs,
+  keyed by the threat path they were gathered for (or the topic text).
+
+Final answers are not shared: a later request about the same path usually
+asks something else ("only the exfiltration chains", "redo it with KEV in
+mind"), so every request reaches the model, which starts from the
+published artifacts instead of recomputing them.
+
+Each kind has a fixed set of required fields. An entry is stored under the
+stable key `blackboard:<kind>:<digest of subject>` with the content hash of
+its data, the producing agent, a version that only increases when the
+content changes, and the number of model calls it took to produce. Reading
+an entry back records the hit, and its model-call cost as saved, in
+`blackboard:metrics`:
+
+    {"llm_calls": 7, "llm_calls_saved": 4, "hits": 5, "misses": 2, ...}
+
+llm_calls is counted by count_llm_call, a before_model_callback on the
+manager and the specialists.
+
+    python -m common.blackboard session_state.json
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.tools.tool_context import ToolContext
+from google.genai import types
+
+from common.threat_chains import parse_path
+
+PREFIX = "blackboard"
+METRICS_KEY = f"{PREFIX}:metrics"
+INDEX_KEY = f"{PREFIX}:index"
+
+# Fields every published payload of a kind must carry.
+KINDS = {
+    "threat_chains": ("path", "anchors", "chains"),
+    "risk": ("path", "overall_risk", "chains"),
+    "mitigations": ("path", "mitigations"),
+    "iocs": ("indicators",),
+}
+# Kinds whose subject is a threat path rather than free text.
+PATH_KINDS = ("threat_chains", "risk", "mitigations", "iocs")
+
+IOC_PATTERNS = (
+    ("cve", re.compile(r"^CVE-\d{4}-\d{4,}$", re.IGNORECASE)),
+    ("sha256", re.compile(r"^[0-9a-f]{64}$", re.IGNORECASE)),
+    ("sha1", re.compile(r"^[0-9a-f]{40}$", re.IGNORECASE)),
+    ("md5", re.compile(r"^[0-9a-f]{32}$", re.IGNORECASE)),
+    ("ipv4", re.compile(r"^(?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d)(?:/\d{1,2})?$")),
+    ("url", re.compile(r"^[a-z][a-z0-9+.-]*://\S+$", re.IGNORECASE)),
+    ("email", re.compile(r"^[^@\s]+@[a-z0-9-]+(?:\.[a-z0-9-]+)+$", re.IGNORECASE)),
+    ("domain", re.compile(r"^(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,63}$", re.IGNORECASE)),
+)
+# Common defanging in advisories: hxxp://, example[.]com, 10[.]0[.]0[.]1, user[@]example.com
+DEFANG = ((re.compile(r"^hxxp", re.IGNORECASE), "http"), (re.compile(r"\[\.\]|\(\.\)|\{\.\}"), "."),
+          (re.compile(r"\[@\]|\[at\]", re.IGNORECASE), "@"), (re.compile(r"\[:\]"), ":"))
+
+
+# -------------------- Keys and hashes --------------------
+def subject_key(kind: str, subject: str) -> str:
+    """Normal form of a subject: the threat path key for path kinds when it names IDs, else folded text."""
+    if kind in PATH_KINDS:
+        path = parse_path(subject)
+        if any(path):
+            return path.key()
+    return " ".join(subject.lower().split())
+
+
+def state_key(kind: str, subject: str) -> str:
+    digest = hashlib.sha1(subject_key(kind, subject).encode("utf-8")).hexdigest()[:16]
+    return f"{PREFIX}:{kind}:{digest}"
+
+
+def content_hash(data: dict) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+# -------------------- Metrics --------------------
+def _bump(state, **deltas) -> None:
+    # Reassign instead of mutating in place: only top-level writes reach the session's state delta.
+    metrics = dict(state.get(METRICS_KEY) or {})
+    for name, delta in deltas.items():
+        if isinstance(delta, dict):
+            counts = dict(metrics.get(name) or {})
+            for k, v in delta.items():
+                counts[k] = counts.get(k, 0) + v
+            metrics[name] = counts
+        else:
+            metrics[name] = metrics.get(name, 0) + delta
+    state[METRICS_KEY] = metrics
+
+
+def metrics(state) -> dict:
+    """The session's blackboard counters, with the share of model calls reuse avoided."""
+    m = dict(state.get(METRICS_KEY) or {})
+    calls, saved = m.get("llm_calls", 0), m.get("llm_calls_saved", 0)
+    m["llm_calls_saved_share"] = round(saved / (calls + saved), 3) if calls + saved else 0.0
+    return m
+
+
+def _calls_key(agent: str) -> str:
+    return f"{PREFIX}:calls:{agent}"
+
+
+def count_llm_call(callback_context: CallbackContext, llm_request: LlmRequest) -> None:
+    """before_model_callback: count the session's model calls, in total and for the current agent run."""
+    _bump(callback_context.state, llm_calls=1)
+    key = _calls_key(callback_context.agent_name)
+    callback_context.state[key] = (callback_context.state.get(key) or 0) + 1
+    return None
+
+
+# -------------------- Publish and read --------------------
+def publish(state, kind: str, subject: str, data: dict, producer: str, llm_calls: int = 0) -> dict:
+    """Store an artifact, or keep the stored one when its content is unchanged. Returns the entry."""
+    if kind not in KINDS:
+        raise ValueError(f"Unknown blackboard kind {kind!r}; expected one of {', '.join(KINDS)}.")
+    missing = [f for f in KINDS[kind] if f not in data]
+    if missing:
+        raise ValueError(f"A {kind} artifact needs {', '.join(missing)}.")
+    key = state_key(kind, subject)
+    digest = content_hash(data)
+    existing = state.get(key)
+    if existing and existing["hash"] == digest:
+        _bump(state, unchanged=1)
+        return existing
+    entry = {
+        "kind": kind,
+        "subject": subject_key(kind, subject),
+        "hash": digest,
+        "producer": producer,
+        "version": existing["version"] + 1 if existing else 1,
+        "published_at": time.time(),
+        "llm_calls": llm_calls,
+        "data": data,
+    }
+    state[key] = entry
+    index = dict(state.get(INDEX_KEY) or {})
+    index[key] = {"kind": kind, "subject": entry["subject"], "hash": digest, "producer": producer}
+    state[INDEX_KEY] = index
+    _bump(state, published=1)
+    return entry
+
+
+def lookup(state, kind: str, subject: str) -> Optional[dict]:
+    """The stored entry for (kind, subject), recording the hit and the model calls it saves, or None."""
+    entry = state.get(state_key(kind, subject))
+    if entry is None:
+        _bump(state, misses=1)
+        return None
+    _bump(state, hits=1, llm_calls_saved=entry["llm_calls"], hits_by_kind={kind: 1})
+    return entry
+
+
+def producer_calls(state, agent: str) -> int:
+    """Model calls the agent has made so far in its current run, i.e. the cost of what it publishes now."""
+    return state.get(_calls_key(agent)) or 0
+
+
+def entries(state, kinds: Iterable[str] = ()) -> List[dict]:
+    """Index rows of the published artifacts, optionally of some kinds only."""
+    kinds = tuple(kinds)
+    return [{"key": key, **row} for key, row in (state.get(INDEX_KEY) or {}).items()
+            if not kinds or row["kind"] in kinds]
+
+
+# -------------------- IOCs --------------------
+def classify_ioc(value: str) -> Tuple[str, str]:
+    """(type, refanged value) of one indicator; type is "unknown" when nothing matches."""
+    value = value.strip().strip("'\"<>,;")
+    for pattern, replacement in DEFANG:
+        value = pattern.sub(replacement, value)
+    for kind, pattern in IOC_PATTERNS:
+        if pattern.match(value):
+            if kind in ("sha256", "sha1", "md5", "domain", "email"):
+                value = value.lower()
+            elif kind == "cve":
+                value = value.upper()
+            return kind, value
+    return "unknown", value
+
+
+def group_iocs(indicators: Iterable[str]) -> dict:
+    """{type: [values]} with duplicates removed and insertion order kept."""
+    grouped: dict = {}
+    for raw in indicators:
+        if not raw or not raw.strip():
+            continue
+        kind, value = classify_ioc(raw)
+        if value not in grouped.setdefault(kind, []):
+            grouped[kind].append(value)
+    return grouped
+
+
+# -------------------- Agent callbacks --------------------
+def reset_llm_calls(callback_context: CallbackContext) -> Optional[types.Content]:
+    """before_agent_callback: start counting the model calls of this agent run (see producer_calls)."""
+    callback_context.state[_calls_key(callback_context.agent_name)] = 0
+    return None
+
+
+# -------------------- Agent tools --------------------
+def read_blackboard(kind: str, subject: str, tool_context: ToolContext) -> dict:
+    """Read an artifact another specialist already published this session (threat_chains, risk, mitigations or iocs for a threat path); an empty subject lists what is published."""
+    print(f"--- Tool: read_blackboard called for {kind}: {subject} ---")
+    if kind not in KINDS:
+        return {"status": "error", "message": f"Unknown kind {kind!r}; expected one of {', '.join(KINDS)}."}
+    if not subject.strip():
+        return {"status": "success", "artifacts": entries(tool_context.state, [kind])}
+    entry = lookup(tool_context.state, kind, subject)
+    if entry is None:
+        return {"status": "error", "message": f"No {kind} artifact published for {subject_key(kind, subject)!r} yet."}
+    return {"status": "success", "from_blackboard": True, **{k: v for k, v in entry.items() if k != "data"},
+            **entry["data"]}
+
+
+def publish_iocs(subject: str, indicators: List[str], tool_context: ToolContext) -> dict:
+    """Publish the indicators of compromise found for a threat path or topic (IPs, domains, URLs, hashes, e-mail addresses, CVEs; defanged forms accepted) for the other specialists."""
+    print(f"--- Tool: publish_iocs called for {subject}: {len(indicators)} indicator(s) ---")
+    grouped = group_iocs(indicators)
+    if not grouped:
+        return {"status": "error", "message": "No indicators given."}
+    agent = tool_context.agent_name
+    entry = publish(tool_context.state, "iocs", subject, {"indicators": grouped}, producer=agent,
+                    llm_calls=producer_calls(tool_context.state, agent))
+    return {"status": "success", "key": state_key("iocs", subject), "hash": entry["hash"],
+            "version": entry["version"], "indicators": grouped}
+
+
+def blackboard_status(tool_context: ToolContext) -> dict:
+    """List the artifacts the specialists have published this session and how many model calls reusing them saved."""
+    print("--- Tool: blackboard_status called ---")
+    return {"status": "success", "artifacts": entries(tool_context.state), "metrics": metrics(tool_context.state)}
+
+
+# -------------------- CLI --------------------
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Show the blackboard artifacts and metrics in a saved session state.")
+    parser.add_argument("state", help="JSON file with a session's state dict")
+    parser.add_argument("--kind", action="append", default=[], choices=sorted(KINDS))
+    args = parser.parse_args(argv)
+    with open(args.state, encoding="utf-8") as f:
+        state = json.load(f)
+    print(json.dumps({"artifacts": entries(state, args.kind), "metrics": metrics(state)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
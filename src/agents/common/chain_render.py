@@ -0,0 +1,410 @@
+"""
+Local rendering of threat chains: Mermaid, Graphviz DOT and self-contained SVG.
+
+Chains are ID sequences ("T1190 > T1059 > T1486", CVE/CWE/CAPEC/mitigation
+IDs allowed too); chains sharing IDs are merged into one directed graph.
+The graph is laid out once, left to right, in layers:
+
+1. Layers by longest path from the sources (edges that would close a cycle
+   are drawn but do not count for layering).
+2. Within a layer, nodes are ordered by a few barycenter sweeps to reduce
+   edge crossings; ties keep first-seen order, so the layout is stable.
+3. Boxes get fixed-size coordinates.
+
+Layouts are cached per graph and labels, and every output (the SVG, the
+pinned `pos` attributes in the DOT file for `neato -n`, and draw_pdf for
+the fpdf-based PDF reports) draws the same Layout. Labels (technique name
+and tactic) come from the local MITRE knowledge base when it is built.
+
+    python -m common.chain_render "T1190 > T1059 > T1486" "T1190 > T1078 > T1486" -o /tmp/chain
+"""
+
+import argparse
+import hashlib
+import html
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from google.adk.tools.tool_context import ToolContext
+
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "agentic_ai", "diagrams")
+BOX_W, BOX_H = 180, 48
+GAP_X, GAP_Y = 56, 22
+MARGIN = 16
+SWEEPS = 4
+NAME_CHARS = 26
+CACHE_SIZE = 128
+PDF_MAX_SCALE = 0.35  # page units (mm) per layout pixel: about 9 pt text
+
+SPLIT_RE = re.compile(r"\s*(?:->|=>|>|,|;|\n)\s*")
+# Fill and stroke per ID kind; techniques are the common case.
+COLORS = {
+    "cve": ("#fee2e2", "#b91c1c"),
+    "cwe": ("#ffedd5", "#c2410c"),
+    "capec": ("#fef9c3", "#a16207"),
+    "technique": ("#dbeafe", "#1d4ed8"),
+    "mitigation": ("#dcfce7", "#15803d"),
+    "other": ("#f1f5f9", "#475569"),
+}
+
+_cache: "OrderedDict[tuple, Layout]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class Box(NamedTuple):
+    id: str
+    kind: str
+    name: str
+    detail: str
+    x: float
+    y: float
+
+
+class Layout(NamedTuple):
+    boxes: Dict[str, Box]
+    edges: Tuple[Tuple[str, str], ...]
+    width: float
+    height: float
+
+    def key(self) -> str:
+        """Short stable digest of the graph, used for output file names."""
+        text = "|".join(f"{b.id}:{b.name}" for b in self.boxes.values()) + "#" + "|".join(f"{a}>{b}" for a, b in self.edges)
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+def kind_of(node_id: str) -> str:
+    upper = node_id.upper()
+    for prefix, kind in (("CVE-", "cve"), ("CWE-", "cwe"), ("CAPEC-", "capec")):
+        if upper.startswith(prefix):
+            return kind
+    if re.fullmatch(r"T\d{4}(\.\d{3})?", upper):
+        return "technique"
+    if re.fullmatch(r"M\d{4}", upper):
+        return "mitigation"
+    return "other"
+
+
+def parse_chain(text: str) -> List[str]:
+    """'T1190 > T1059 -> T1486' -> ['T1190', 'T1059', 'T1486']."""
+    return [part.strip().strip("-* ") for part in SPLIT_RE.split(text) if part.strip().strip("-* ")]
+
+
+def build_graph(chains: Iterable[Sequence[str]]) -> Tuple[List[str], List[Tuple[str, str]]]:
+    """Nodes in first-seen order and de-duplicated edges between consecutive IDs."""
+    nodes, edges = {}, {}
+    for chain in chains:
+        ids = [i.upper() if kind_of(i) != "other" else i for i in chain]
+        for node in ids:
+            nodes.setdefault(node, None)
+        for a, b in zip(ids, ids[1:]):
+            if a != b:
+                edges.setdefault((a, b), None)
+    return list(nodes), list(edges)
+
+
+def kb_labels(node_ids: Iterable[str]) -> Dict[str, Tuple[str, str]]:
+    """{id: (name, detail)} from the local MITRE knowledge base; empty when it is not built."""
+    from common.mitre_kb import get_kb
+
+    try:
+        kb = get_kb()
+    except (OSError, ValueError):
+        return {}
+    labels = {}
+    for node_id in node_ids:
+        entry = kb.get(node_id)
+        if entry is None:
+            continue
+        tactics = ", ".join(kb.tactics[t]["name"] for t in entry.get("tactics", []) if t in kb.tactics)
+        labels[node_id] = (entry.get("name", ""), tactics)
+    return labels
+
+
+# -------------------- Layout --------------------
+def _layers(nodes: List[str], edges: List[Tuple[str, str]]) -> Dict[str, int]:
+    succ = {n: [] for n in nodes}
+    for a, b in edges:
+        succ[a].append(b)
+    # Drop edges that close a cycle (DFS back edges) for layering only.
+    state, forward = {}, []
+    for root in nodes:
+        if root in state:
+            continue
+        stack = [(root, iter(succ[root]))]
+        state[root] = "open"
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                state[node] = "done"
+                stack.pop()
+            elif state.get(child) == "open":
+                continue
+            else:
+                forward.append((node, child))
+                if child not in state:
+                    state[child] = "open"
+                    stack.append((child, iter(succ[child])))
+    indegree = {n: 0 for n in nodes}
+    dag = {n: [] for n in nodes}
+    for a, b in forward:
+        dag[a].append(b)
+        indegree[b] += 1
+    layer = {n: 0 for n in nodes}
+    ready = [n for n in nodes if indegree[n] == 0]
+    while ready:
+        node = ready.pop(0)
+        for child in dag[node]:
+            layer[child] = max(layer[child], layer[node] + 1)
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                ready.append(child)
+    return layer
+
+
+def _order(nodes: List[str], edges: List[Tuple[str, str]], layer: Dict[str, int]) -> List[List[str]]:
+    rows: List[List[str]] = [[] for _ in range(max(layer.values()) + 1)]
+    for node in nodes:
+        rows[layer[node]].append(node)
+    preds = {n: [] for n in nodes}
+    succs = {n: [] for n in nodes}
+    for a, b in edges:
+        preds[b].append(a)
+        succs[a].append(b)
+    for sweep in range(SWEEPS):
+        neighbours, sequence = (preds, range(1, len(rows))) if sweep % 2 == 0 else (succs, range(len(rows) - 2, -1, -1))
+        for i in sequence:
+            position = {n: p for row in rows for p, n in enumerate(row)}
+
+            def barycenter(n, row=rows[i]):
+                linked = [position[m] for m in neighbours[n]]
+                return (sum(linked) / len(linked) if linked else row.index(n), row.index(n))
+
+            rows[i] = sorted(rows[i], key=barycenter)
+    return rows
+
+
+def layout(chains: Iterable[Sequence[str]], labels: Optional[Dict[str, Tuple[str, str]]] = None) -> Layout:
+    """Lay out the merged graph of these chains; cached per graph and labels."""
+    nodes, edges = build_graph(chains)
+    if labels is None:
+        labels = kb_labels(nodes)
+    key = (tuple(nodes), tuple(edges), tuple(sorted((n, labels[n]) for n in nodes if n in labels)))
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return cached
+    if not nodes:
+        return Layout({}, (), 2 * MARGIN, 2 * MARGIN)
+
+    rows = _order(nodes, edges, _layers(nodes, edges))
+    tallest = max(len(row) for row in rows)
+    height = 2 * MARGIN + tallest * BOX_H + (tallest - 1) * GAP_Y
+    boxes = {}
+    for i, row in enumerate(rows):
+        top = (height - (len(row) * BOX_H + (len(row) - 1) * GAP_Y)) / 2
+        for j, node in enumerate(row):
+            name, detail = labels.get(node, ("", ""))
+            boxes[node] = Box(node, kind_of(node), name, detail, MARGIN + i * (BOX_W + GAP_X), top + j * (BOX_H + GAP_Y))
+    if any(boxes[b].x <= boxes[a].x for a, b in edges):
+        height += GAP_Y  # room for backward edges, which loop below the boxes
+    result = Layout(boxes, tuple(edges), 2 * MARGIN + len(rows) * BOX_W + (len(rows) - 1) * GAP_X, height)
+    with _cache_lock:
+        _cache[key] = result
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def _short(name: str) -> str:
+    return name if len(name) <= NAME_CHARS else name[:NAME_CHARS - 2].rstrip() + ".."
+
+
+def _edge_points(layout: Layout, a: str, b: str) -> Tuple[float, float, float, float]:
+    src, dst = layout.boxes[a], layout.boxes[b]
+    if dst.x > src.x:
+        return src.x + BOX_W, src.y + BOX_H / 2, dst.x, dst.y + BOX_H / 2
+    # Backward or same-layer edge: leave from the bottom, enter at the bottom
+    return src.x + BOX_W / 2, src.y + BOX_H, dst.x + BOX_W / 2, dst.y + BOX_H
+
+
+# -------------------- Writers --------------------
+def to_svg(layout: Layout, title: str = "") -> str:
+    """Self-contained SVG (no scripts, no external fonts); hover a box for its name and tactic."""
+    top = 24 if title else 0
+    out = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{layout.width:.0f}" height="{layout.height + top:.0f}" '
+        f'font-family="Helvetica,Arial,sans-serif" font-size="11">',
+        '<defs><marker id="arrow" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="7" markerHeight="7" '
+        'orient="auto-start-reverse"><path d="M0,0 L10,5 L0,10 z" fill="#64748b"/></marker></defs>',
+        '<rect width="100%" height="100%" fill="white"/>',
+    ]
+    if title:
+        out.append(f'<text x="{MARGIN}" y="17" font-size="14" font-weight="bold">{html.escape(title)}</text>')
+    out.append(f'<g transform="translate(0,{top})">')
+    for a, b in layout.edges:
+        x1, y1, x2, y2 = _edge_points(layout, a, b)
+        if x2 > x1:
+            mid = (x1 + x2) / 2
+            d = f"M{x1:.1f},{y1:.1f} C{mid:.1f},{y1:.1f} {mid:.1f},{y2:.1f} {x2:.1f},{y2:.1f}"
+        else:
+            drop = max(y1, y2) + GAP_Y
+            d = f"M{x1:.1f},{y1:.1f} C{x1:.1f},{drop:.1f} {x2:.1f},{drop:.1f} {x2:.1f},{y2:.1f}"
+        out.append(f'<path d="{d}" fill="none" stroke="#64748b" stroke-width="1.4" marker-end="url(#arrow)"/>')
+    for box in layout.boxes.values():
+        fill, stroke = COLORS[box.kind]
+        tip = " - ".join(p for p in (box.id, box.name, box.detail) if p)
+        out.append(
+            f'<g><title>{html.escape(tip)}</title>'
+            f'<rect x="{box.x:.1f}" y="{box.y:.1f}" width="{BOX_W}" height="{BOX_H}" rx="6" '
+            f'fill="{fill}" stroke="{stroke}" stroke-width="1.2"/>'
+            f'<text x="{box.x + BOX_W / 2:.1f}" y="{box.y + (19 if box.name else 28):.1f}" text-anchor="middle" '
+            f'font-weight="bold">{html.escape(box.id)}</text>'
+        )
+        if box.name:
+            out.append(f'<text x="{box.x + BOX_W / 2:.1f}" y="{box.y + 36:.1f}" text-anchor="middle" '
+                       f'fill="#334155">{html.escape(_short(box.name))}</text>')
+        out.append("</g>")
+    out.append("</g></svg>")
+    return "\n".join(out)
+
+
+def _dot_quote(text: str) -> str:
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def to_dot(layout: Layout, title: str = "") -> str:
+    """Graphviz DOT; `pos` pins the cached layout (render with `neato -n2`), `dot` re-lays it out on its own."""
+    lines = ["digraph threat_chain {", "  rankdir=LR;", '  node [shape=box, style="rounded,filled", fontname="Helvetica", fontsize=10];']
+    if title:
+        lines.append(f"  label={_dot_quote(title)}; labelloc=t;")
+    for box in layout.boxes.values():
+        fill, stroke = COLORS[box.kind]
+        label = box.id + (f"\\n{_short(box.name)}" if box.name else "")
+        # Graphviz points have y growing upwards
+        pos = f"{box.x + BOX_W / 2:.0f},{layout.height - box.y - BOX_H / 2:.0f}!"
+        tooltip = " - ".join(p for p in (box.id, box.name, box.detail) if p)
+        lines.append(f'  {_dot_quote(box.id)} [label="{label.replace(chr(34), chr(39))}", fillcolor="{fill}", '
+                     f'color="{stroke}", tooltip={_dot_quote(tooltip)}, pos="{pos}"];')
+    for a, b in layout.edges:
+        lines.append(f"  {_dot_quote(a)} -> {_dot_quote(b)};")
+    lines.append("}")
+    return "\n".join(lines)
+
+
+def to_mermaid(layout: Layout) -> str:
+    """Mermaid flowchart; Mermaid does its own layout from the same nodes and edges."""
+    names = {node: f"n{i}" for i, node in enumerate(layout.boxes)}
+    lines = ["flowchart LR"]
+    for box in layout.boxes.values():
+        label = box.id + (f"<br/>{_short(box.name)}" if box.name else "")
+        lines.append(f'  {names[box.id]}["{label.replace(chr(34), "#quot;")}"]')
+    lines += [f"  {names[a]} --> {names[b]}" for a, b in layout.edges]
+    for kind, (fill, stroke) in COLORS.items():
+        members = [names[b.id] for b in layout.boxes.values() if b.kind == kind]
+        if members:
+            lines.append(f"  classDef {kind} fill:{fill},stroke:{stroke}")
+            lines.append(f"  class {','.join(members)} {kind}")
+    return "\n".join(lines)
+
+
+def _rgb(color: str) -> Tuple[int, int, int]:
+    return int(color[1:3], 16), int(color[3:5], 16), int(color[5:7], 16)
+
+
+def pdf_scale(layout: Layout, width: float) -> float:
+    return min(width / layout.width, PDF_MAX_SCALE)
+
+
+def draw_pdf(pdf, layout: Layout, x: float, y: float, width: float) -> float:
+    """Draw the layout on an fpdf2 FPDF page at (x, y), scaled to at most width (page units); returns the height used."""
+    scale = pdf_scale(layout, width)
+    pdf.set_line_width(0.3)
+    pdf.set_draw_color(100, 116, 139)
+    pdf.set_fill_color(100, 116, 139)
+    for a, b in layout.edges:
+        x1, y1, x2, y2 = (v * scale for v in _edge_points(layout, a, b))
+        x1, x2, y1, y2 = x + x1, x + x2, y + y1, y + y2
+        if x2 > x1:
+            mid = (x1 + x2) / 2
+            pdf.bezier([(x1, y1), (mid, y1), (mid, y2), (x2, y2)])
+            tip = [(x2, y2), (x2 - 2, y2 - 1), (x2 - 2, y2 + 1)]
+        else:
+            drop = max(y1, y2) + GAP_Y * scale
+            pdf.bezier([(x1, y1), (x1, drop), (x2, drop), (x2, y2)])
+            tip = [(x2, y2), (x2 - 1, y2 + 2), (x2 + 1, y2 + 2)]
+        pdf.polygon(tip, style="F")
+    for box in layout.boxes.values():
+        fill, stroke = COLORS[box.kind]
+        bx, by, bw, bh = x + box.x * scale, y + box.y * scale, BOX_W * scale, BOX_H * scale
+        pdf.set_fill_color(*_rgb(fill))
+        pdf.set_draw_color(*_rgb(stroke))
+        pdf.rect(bx, by, bw, bh, style="DF", round_corners=True, corner_radius=1.5)
+        pdf.set_text_color(15, 23, 42)
+        pdf.set_font("Helvetica", "B", 7)
+        pdf.set_xy(bx, by + (1.5 if box.name else bh / 2 - 2))
+        pdf.cell(bw, 4, box.id, align="C")
+        if box.name:
+            pdf.set_font("Helvetica", "", 6)
+            pdf.set_xy(bx, by + bh / 2)
+            pdf.cell(bw, 4, _short(box.name).encode("latin-1", "replace").decode("latin-1"), align="C")
+    pdf.set_text_color(0, 0, 0)
+    pdf.set_draw_color(0, 0, 0)
+    return layout.height * scale
+
+
+def render_files(chains: Iterable[Sequence[str]], output_dir: str, title: str = "") -> Dict[str, str]:
+    """Write <key>.svg, .dot and .mmd for the merged chains; existing files for the same graph are reused."""
+    result = layout(chains)
+    os.makedirs(output_dir, exist_ok=True)
+    suffix = "-" + hashlib.sha1(title.encode("utf-8")).hexdigest()[:6] if title else ""
+    stem = os.path.join(output_dir, f"chain-{result.key()}{suffix}")
+    paths = {"svg": stem + ".svg", "dot": stem + ".dot", "mermaid": stem + ".mmd"}
+    writers = {"svg": lambda: to_svg(result, title), "dot": lambda: to_dot(result, title), "mermaid": lambda: to_mermaid(result)}
+    for fmt, path in paths.items():
+        if not os.path.exists(path):
+            tmp = f"{path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(writers[fmt]())
+            os.replace(tmp, path)
+    return paths
+
+
+# -------------------- Agent tool --------------------
+def render_threat_chain(chains: list[str], output_dir: str, tool_context: ToolContext) -> dict:
+    """Render threat chains locally as Mermaid, Graphviz DOT and SVG files. Each chain is a string of IDs in order, e.g. 'T1190 > T1059 > T1486'; chains sharing IDs are merged into one graph. output_dir may be empty for the default diagrams folder."""
+    print(f"--- Tool: render_threat_chain called for {len(chains)} chain(s) ---")
+    parsed = [parse_chain(c) for c in chains if c.strip()]
+    if not any(parsed):
+        return {"status": "error", "message": "No IDs found in the chains."}
+    try:
+        paths = render_files(parsed, output_dir or DEFAULT_OUTPUT_DIR)
+    except OSError as e:
+        return {"status": "error", "message": f"Could not write diagrams: {e}"}
+    result = layout(parsed)
+    return {
+        "status": "success",
+        "files": paths,
+        "nodes": len(result.boxes),
+        "edges": len(result.edges),
+        "unlabelled": [b.id for b in result.boxes.values() if not b.name],
+    }
+
+
+# -------------------- CLI --------------------
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Render threat chains to SVG, DOT and Mermaid.")
+    parser.add_argument("chains", nargs="+", help="e.g. 'T1190 > T1059 > T1486'")
+    parser.add_argument("-o", "--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--title", default="")
+    args = parser.parse_args(argv)
+    for fmt, path in render_files([parse_chain(c) for c in args.chains], args.output_dir, args.title).items():
+        print(f"{fmt:<8} {path}")
+
+
+if __name__ == "__main__":
+    main()
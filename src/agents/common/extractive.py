@@ -0,0 +1,238 @@
+"""
+Extractive summarization engine.
+
+Sentences are split and tokenized with precompiled regexes, stop words come
+from a set built once per process, and stems from an LRU-cached Porter
+stemmer. Each document becomes a sparse sentence x term count matrix, and
+sentences are ranked either by summed term frequency (the original
+article_summarizer score) or by TextRank over cosine similarity, both as
+sparse matrix products. The chosen sentences are returned as written, in
+document order.
+
+Benchmark against the original per-call implementation:
+    python -m common.extractive --bench 10000
+"""
+
+import argparse
+import functools
+import random
+import re
+import time
+from typing import List, Optional
+
+import numpy as np
+from nltk.stem import PorterStemmer
+from scipy import sparse
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9])")
+WORD_RE = re.compile(r"[A-Za-z][A-Za-z0-9]+")
+MIN_SENTENCE_WORDS = 4
+DAMPING = 0.85
+
+# Used when the NLTK stopwords corpus has not been downloaded.
+FALLBACK_STOPWORDS = """
+a about above after again against all am an and any are as at be because been before being below between both
+but by can did do does doing down during each few for from further had has have having he her here hers herself
+him himself his how i if in into is it its itself just me more most my myself no nor not now of off on once only
+or other our ours ourselves out over own same she should so some such than that the their theirs them themselves
+then there these they this those through to too under until up very was we were what when where which while who
+whom why will with you your yours yourself yourselves
+""".split()
+
+_stemmer = PorterStemmer()
+
+
+@functools.lru_cache(maxsize=None)
+def stopword_set() -> frozenset:
+    """English stop words, loaded once per process."""
+    try:
+        from nltk.corpus import stopwords
+
+        return frozenset(stopwords.words("english"))
+    except LookupError:
+        return frozenset(FALLBACK_STOPWORDS)
+
+
+@functools.lru_cache(maxsize=200_000)
+def stem(word: str) -> str:
+    """Porter stem of a lower-cased word; the stemmer is slow and vocabularies repeat across articles."""
+    return _stemmer.stem(word)
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in SENTENCE_RE.split(text) if s.strip()]
+
+
+def term_matrix(sentences: List[str]):
+    """Return a CSR matrix of stem counts (sentences x vocabulary) with stop words removed."""
+    stop = stopword_set()
+    vocab = {}
+    rows, cols = [], []
+    for i, sentence in enumerate(sentences):
+        for word in WORD_RE.findall(sentence):
+            word = word.lower()
+            if word in stop:
+                continue
+            col = vocab.setdefault(stem(word), len(vocab))
+            rows.append(i)
+            cols.append(col)
+    data = np.ones(len(rows), dtype=np.float64)
+    # Duplicate (row, col) pairs are summed when the COO input is converted.
+    return sparse.csr_matrix((data, (rows, cols)), shape=(len(sentences), max(len(vocab), 1)))
+
+
+def frequency_scores(matrix) -> np.ndarray:
+    """Each sentence scores the document frequency of every term it contains, summed."""
+    word_freq = np.asarray(matrix.sum(axis=0)).ravel()
+    return matrix @ word_freq
+
+
+def textrank_scores(matrix, iterations: int = 50, tol: float = 1e-6) -> np.ndarray:
+    """PageRank over the sentence cosine-similarity graph."""
+    n = matrix.shape[0]
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    unit = sparse.diags(1.0 / norms) @ matrix
+    similarity = (unit @ unit.T).tocsr()
+    similarity.setdiag(0)
+    similarity.eliminate_zeros()
+    out_weight = np.asarray(similarity.sum(axis=1)).ravel()
+    dangling = out_weight == 0
+    out_weight[dangling] = 1.0
+    transition = (sparse.diags(1.0 / out_weight) @ similarity).T.tocsr()
+    rank = np.full(n, 1.0 / n)
+    for _ in range(iterations):
+        # Sentences sharing no terms with any other spread their rank evenly.
+        new = (1 - DAMPING) / n + DAMPING * (transition @ rank + rank[dangling].sum() / n)
+        if np.abs(new - rank).sum() < tol:
+            return new
+        rank = new
+    return rank
+
+
+def summarize(text: str, num_sentences: int = 5, method: str = "textrank") -> List[str]:
+    """Return the `num_sentences` highest ranked sentences of text, unchanged and in document order.
+
+    method is "textrank" or "frequency" (the score article_summarizer used originally).
+    """
+    sentences = split_sentences(text)
+    candidates = [s for s in sentences if len(WORD_RE.findall(s)) >= MIN_SENTENCE_WORDS] or sentences
+    if len(candidates) <= num_sentences:
+        return candidates
+    matrix = term_matrix(candidates)
+    if method == "frequency":
+        scores = frequency_scores(matrix)
+    elif method == "textrank":
+        scores = textrank_scores(matrix)
+    else:
+        raise ValueError(f"Unknown method {method!r}; expected 'textrank' or 'frequency'")
+    top = np.argpartition(-scores, num_sentences - 1)[:num_sentences]
+    return [candidates[i] for i in sorted(top)]
+
+
+# -------------------- Benchmark --------------------
+def legacy_summarize(text: str, num_sentences: int = 5) -> List[str]:
+    """The scoring loop article_summarizer used before this module, kept for benchmarking.
+
+    Note it returns stemmed sentences, by score rather than in document order.
+    """
+    from nltk.corpus import stopwords
+    from nltk.tokenize import sent_tokenize, word_tokenize
+
+    sentences = sent_tokenize(text)
+    stop_words = set(stopwords.words("english"))
+    stemmer = PorterStemmer()
+    stemmed_sentences = []
+    for sentence in sentences:
+        words = word_tokenize(sentence)
+        stemmed_sentences.append(" ".join(stemmer.stem(w) for w in words if w.lower() not in stop_words))
+    word_freq = {}
+    for sentence in stemmed_sentences:
+        for word in sentence.split():
+            word_freq[word] = word_freq.get(word, 0) + 1
+    ranked = [(s, sum(word_freq[w] for w in s.split())) for s in stemmed_sentences]
+    ranked.sort(key=lambda x: x[1], reverse=True)
+    return [s for s, _ in ranked[:num_sentences]]
+
+
+def _legacy_regex_tokenized(text: str, num_sentences: int = 5) -> List[str]:
+    # Same loop as legacy_summarize, for hosts without the punkt/stopwords data.
+    stop_words = set(FALLBACK_STOPWORDS)
+    stemmer = PorterStemmer()
+    stemmed_sentences = [
+        " ".join(stemmer.stem(w) for w in WORD_RE.findall(s) if w.lower() not in stop_words)
+        for s in split_sentences(text)
+    ]
+    word_freq = {}
+    for sentence in stemmed_sentences:
+        for word in sentence.split():
+            word_freq[word] = word_freq.get(word, 0) + 1
+    ranked = [(s, sum(word_freq[w] for w in s.split())) for s in stemmed_sentences]
+    ranked.sort(key=lambda x: x[1], reverse=True)
+    return [s for s, _ in ranked[:num_sentences]]
+
+
+def _synthetic_articles(n: int, sentences: int = 40, seed: int = 3) -> List[str]:
+    rng = random.Random(seed)
+    syllables = ["ex", "ploit", "vul", "ner", "abil", "ity", "patch", "serv", "er", "net", "work", "at", "tack",
+                 "ran", "som", "ware", "cred", "ent", "ial", "phish", "ing", "mal", "code", "sys", "tem", "data"]
+    words = list({"".join(rng.choice(syllables) for _ in range(rng.randint(1, 3))) for _ in range(5000)})
+    words += FALLBACK_STOPWORDS * 3
+    weights = [1.0 / (i + 1) for i in range(len(words))]
+    articles = []
+    for _ in range(n):
+        body = []
+        for _ in range(sentences):
+            tokens = rng.choices(words, weights, k=rng.randint(8, 30))
+            body.append(" ".join(tokens).capitalize() + rng.choice([".", ".", ".", "?", "!"]))
+        articles.append(" ".join(body))
+    return articles
+
+
+def benchmark(n: int, method: str = "textrank") -> None:
+    articles = _synthetic_articles(n)
+    try:
+        legacy_summarize(articles[0])
+        legacy, legacy_name = legacy_summarize, "legacy (nltk punkt + word_tokenize)"
+    except LookupError:
+        legacy, legacy_name = _legacy_regex_tokenized, "legacy loop (nltk data missing: regex tokenizers)"
+
+    start = time.perf_counter()
+    for article in articles:
+        legacy(article)
+    legacy_s = time.perf_counter() - start
+
+    stem.cache_clear()
+    results = {}
+    for name in ("frequency", method) if method != "frequency" else ("frequency",):
+        start = time.perf_counter()
+        for article in articles:
+            summarize(article, method=name)
+        results[name] = time.perf_counter() - start
+
+    print(f"{n:,} synthetic articles of ~40 sentences")
+    print(f"  {legacy_name}: {legacy_s:.2f}s ({n / legacy_s:.0f} articles/s)")
+    for name, elapsed in results.items():
+        print(f"  engine, {name}: {elapsed:.2f}s ({n / elapsed:.0f} articles/s, {legacy_s / elapsed:.1f}x)")
+    print(f"  stem cache: {stem.cache_info()}")
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Summarize a text file, or benchmark the engine.")
+    parser.add_argument("path", nargs="?", help="plain-text file to summarize")
+    parser.add_argument("-n", "--sentences", type=int, default=5)
+    parser.add_argument("--method", default="textrank", choices=["textrank", "frequency"])
+    parser.add_argument("--bench", type=int, nargs="?", const=10_000, metavar="ARTICLES",
+                        help="benchmark on ARTICLES synthetic articles (default 10k)")
+    args = parser.parse_args(argv)
+    if args.bench:
+        benchmark(args.bench, args.method)
+    elif args.path:
+        with open(args.path, encoding="utf-8") as f:
+            print("\n".join(summarize(f.read(), args.sentences, args.method)))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Offline stand-in for Gemini, for load-testing the agent server.
+
+FakeLlm answers every request after a fixed latency plus jitter, with no
+network and no API key. The answer echoes the last user text, so responses
+differ per request while the cost per call stays predictable:
+
+    [gemini-2.0-flash-fake] <first FAKE_LLM_ECHO characters of the request>
+
+use_model(root_agent, model) swaps the model of an agent and all of its
+sub-agents and AgentTool agents in place; the server does this for every
+root agent when AGENT_MODEL_BACKEND=fake. Model names matching "fake-*"
+also resolve to FakeLlm through ADK's model registry once this module is
+imported.
+
+    AGENT_MODEL_BACKEND=fake FAKE_LLM_LATENCY_MS=200 python -m common.server
+"""
+
+import asyncio
+import os
+import random
+from typing import AsyncGenerator, Iterator, Union
+
+from google.adk.agents import BaseAgent, LlmAgent
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.models.registry import LLMRegistry
+from google.adk.tools.agent_tool import AgentTool
+from google.genai import types
+
+LATENCY_MS = float(os.environ.get("FAKE_LLM_LATENCY_MS", "100"))
+JITTER_MS = float(os.environ.get("FAKE_LLM_JITTER_MS", "50"))
+ECHO = int(os.environ.get("FAKE_LLM_ECHO", "200"))
+
+
+class FakeLlm(BaseLlm):
+    """Deterministic-content, fixed-latency model that never leaves the process."""
+
+    # A Gemini-looking name: built-in tools such as google_search refuse to attach to any other model.
+    model: str = "gemini-2.0-flash-fake"
+    latency_ms: float = LATENCY_MS
+    jitter_ms: float = JITTER_MS
+
+    @classmethod
+    def supported_models(cls) -> list:
+        return [r"fake-.*"]
+
+    async def generate_content_async(self, llm_request: LlmRequest,
+                                     stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        await asyncio.sleep((self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000)
+        text = f"[{self.model}] {_last_user_text(llm_request)[:ECHO]}".rstrip()
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=text)]), turn_complete=True)
+
+
+LLMRegistry.register(FakeLlm)
+
+
+def _last_user_text(llm_request: LlmRequest) -> str:
+    for content in reversed(llm_request.contents or []):
+        if content.role == "user" and content.parts:
+            text = " ".join(part.text for part in content.parts if part.text)
+            if text:
+                return text
+    return ""
+
+
+def walk_agents(agent: BaseAgent) -> Iterator[BaseAgent]:
+    """The agent, its sub-agents and the agents behind its AgentTools, each once."""
+    seen, stack = set(), [agent]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        yield current
+        stack.extend(current.sub_agents)
+        if isinstance(current, LlmAgent):
+            stack.extend(tool.agent for tool in current.tools if isinstance(tool, AgentTool))
+
+
+def use_model(agent: BaseAgent, model: Union[str, BaseLlm]) -> int:
+    """Set the model of every LLM agent under agent; returns how many were changed."""
+    changed = 0
+    for current in walk_agents(agent):
+        if isinstance(current, LlmAgent):
+            current.model = model
+            changed += 1
+    return changed
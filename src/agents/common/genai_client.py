@@ -0,0 +1,207 @@
+"""
+Shared google-genai client for every direct SDK call in the project.
+
+`get_client()` builds one Client per configuration (API key, or Vertex AI
+project/location), on first use, from the same environment variables ADK
+reads (GOOGLE_API_KEY or GEMINI_API_KEY, GOOGLE_GENAI_USE_VERTEXAI,
+GOOGLE_CLOUD_PROJECT, GOOGLE_CLOUD_LOCATION). Every caller then shares that
+client's HTTP connection pool instead of opening a new one per tool call.
+
+`client.models.generate_content` is wrapped: every attempt goes through
+the process-wide LLM scheduler (common.llm_scheduler), which enforces the
+RPM/TPM limits, orders calls by priority, shares identical text prompts in
+flight and handles 429s; other transient failures (5xx, timeouts, dropped
+connections) are retried with exponential backoff. Every call is counted in
+per-model request counters, a latency histogram and retry statistics,
+available from `stats()`. Everything else (files, caches, ...) is passed
+through to the SDK client unchanged.
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Optional
+
+import httpx
+from google.genai import errors
+from google.genai.client import Client
+
+from common.llm_scheduler import estimate_tokens, get_scheduler, request_key
+
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 1.0  # seconds, doubled per retry, plus up to 1 s of jitter
+BACKOFF_MAX = 30.0
+RETRYABLE_CODES = (408, 429, 500, 502, 503, 504)
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is open-ended.
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 30, 60, 120)
+
+_clients = {}
+_clients_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def _model_stats(model: str) -> dict:
+    entry = _stats.get(model)
+    if entry is None:
+        entry = _stats[model] = {
+            "requests": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "retries": 0,
+            "retried_requests": 0,
+            "retry_codes": {},
+            "latency_total_s": 0.0,
+            "latency_max_s": 0.0,
+            "latency_histogram": [0] * (len(LATENCY_BUCKETS) + 1),
+        }
+    return entry
+
+
+def _record(model: str, seconds: float, ok: bool, retry_codes: list) -> None:
+    bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+    with _stats_lock:
+        entry = _model_stats(model)
+        entry["requests"] += 1
+        entry["succeeded" if ok else "failed"] += 1
+        entry["latency_total_s"] += seconds
+        entry["latency_max_s"] = max(entry["latency_max_s"], seconds)
+        entry["latency_histogram"][bucket] += 1
+        if retry_codes:
+            entry["retries"] += len(retry_codes)
+            entry["retried_requests"] += 1
+            for code in retry_codes:
+                entry["retry_codes"][code] = entry["retry_codes"].get(code, 0) + 1
+
+
+def stats() -> dict:
+    """Per-model request counts, retry counts by cause and latency histogram (seconds)."""
+    labels = [f"<={b}" for b in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}"]
+    with _stats_lock:
+        report = {}
+        for model, entry in _stats.items():
+            report[model] = {
+                **{k: v for k, v in entry.items() if k != "latency_histogram"},
+                "retry_codes": dict(entry["retry_codes"]),
+                "latency_total_s": round(entry["latency_total_s"], 3),
+                "latency_max_s": round(entry["latency_max_s"], 3),
+                "latency_mean_s": round(entry["latency_total_s"] / entry["requests"], 3) if entry["requests"] else 0.0,
+                "latency_histogram": dict(zip(labels, entry["latency_histogram"])),
+            }
+        return {"clients": len(_clients), "models": report}
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
+
+
+def _retry_cause(exc: Exception) -> Optional[str]:
+    """Return a label if exc is worth retrying, else None."""
+    if isinstance(exc, errors.APIError):
+        return str(exc.code) if exc.code in RETRYABLE_CODES else None
+    if isinstance(exc, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(exc, (httpx.ConnectError, httpx.RemoteProtocolError, httpx.ReadError)):
+        return "connection"
+    return None
+
+
+def _prompt_text(contents, config) -> Optional[str]:
+    """Text identifying a text-only request, for coalescing and token estimates; None for files and media."""
+    if isinstance(contents, str):
+        parts = [contents]
+    elif isinstance(contents, list) and all(isinstance(c, str) for c in contents):
+        parts = list(contents)
+    else:
+        return None
+    if config is not None:
+        parts.append(config.model_dump_json(exclude_none=True) if hasattr(config, "model_dump_json")
+                     else repr(sorted(config.items())) if isinstance(config, dict) else repr(config))
+    return "\n".join(parts)
+
+
+def _usage(response) -> Optional[int]:
+    metadata = getattr(response, "usage_metadata", None)
+    return getattr(metadata, "total_token_count", None)
+
+
+class _InstrumentedModels:
+    """client.models with retries and metrics on generate_content."""
+
+    def __init__(self, models):
+        self._models = models
+
+    def generate_content(self, *, model: str, contents, config=None):
+        text = _prompt_text(contents, config)
+        key = request_key(model, text) if text is not None else None
+        # Callers sending the same text prompt meanwhile share this call, retries included
+        return get_scheduler().shared(model, key, lambda: self._generate(model, contents, config, text))
+
+    def _generate(self, model: str, contents, config, text: Optional[str]):
+        start = time.perf_counter()
+        retry_codes = []
+        scheduler = get_scheduler()
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                response = scheduler.call(
+                    model,
+                    lambda: self._models.generate_content(model=model, contents=contents, config=config),
+                    tokens=estimate_tokens(text or ""),
+                    usage=_usage,
+                )
+            except Exception as e:
+                cause = _retry_cause(e)
+                # The scheduler already waited out and retried rate limits
+                if cause is None or cause == "429" or attempt == MAX_ATTEMPTS:
+                    _record(model, time.perf_counter() - start, False, retry_codes)
+                    raise
+                retry_codes.append(cause)
+                time.sleep(min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1)) + random.uniform(0, 1))
+                continue
+            _record(model, time.perf_counter() - start, True, retry_codes)
+            return response
+
+    def __getattr__(self, name):
+        return getattr(self._models, name)
+
+
+class SharedClient:
+    """A google-genai Client whose models.generate_content is retried and measured."""
+
+    def __init__(self, client: Client):
+        self._client = client
+        self.models = _InstrumentedModels(client.models)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def _config_from_env(api_key: Optional[str]) -> tuple:
+    vertexai = os.environ.get("GOOGLE_GENAI_USE_VERTEXAI", "").lower() in ("1", "true")
+    if vertexai and not api_key:
+        return ("vertexai", os.environ.get("GOOGLE_CLOUD_PROJECT"), os.environ.get("GOOGLE_CLOUD_LOCATION"))
+    return ("api_key", api_key or os.environ.get("GOOGLE_API_KEY") or os.environ.get("GEMINI_API_KEY"), None)
+
+
+def get_client(api_key: Optional[str] = None) -> SharedClient:
+    """Return the process-wide client for this configuration, creating it on first use.
+
+    api_key overrides the environment; without one the client is configured
+    from GOOGLE_API_KEY/GEMINI_API_KEY, or for Vertex AI when
+    GOOGLE_GENAI_USE_VERTEXAI is set.
+    """
+    config = _config_from_env(api_key)
+    client = _clients.get(config)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(config)
+            if client is None:
+                kind, first, second = config
+                if kind == "vertexai":
+                    raw = Client(vertexai=True, project=first, location=second)
+                else:
+                    raw = Client(api_key=first)
+                client = _clients[config] = SharedClient(raw)
+    return client
@@ -0,0 +1,140 @@
+"""
+Shared Neo4j access for agents that read node properties from the threat graph.
+
+Nodes are labelled CVE, CWE, CAPEC and TTP and keyed by their `ID` property
+(see docs/Neo4j_Cypher_Query.txt). Connection settings come from NEO4J_URI,
+NEO4J_USER and NEO4J_PASSWORD and default to the local instance used by the
+other Neo4j tools.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from neo4j import GraphDatabase
+
+NODE_LABELS = ("CVE", "CWE", "CAPEC", "TTP")
+CACHE_SIZE = 4096
+
+# Property names vary between graph imports, so each field is read from the first key present.
+DESCRIPTION_KEYS = ("description", "Description", "summary", "Summary")
+SEVERITY_KEYS = ("severity", "Severity", "Typical_Severity", "typical_severity", "baseSeverity", "cvss_score")
+REFERENCE_KEYS = ("references", "References", "reference", "url", "URL", "link", "Link")
+NAME_KEYS = ("name", "Name", "title", "Title")
+
+_driver = None
+_driver_lock = threading.Lock()
+_cache: "OrderedDict[tuple, dict]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_driver():
+    """Return the process-wide Neo4j driver, creating it on first use."""
+    global _driver
+    if _driver is None:
+        with _driver_lock:
+            if _driver is None:
+                uri = os.environ.get("NEO4J_URI", "bolt://localhost:7687")
+                auth = (os.environ.get("NEO4J_USER", "neo4j"), os.environ.get("NEO4J_PASSWORD", "neo4j"))
+                _driver = GraphDatabase.driver(uri, auth=auth)
+    return _driver
+
+
+def canonical_id(label: str, node_id: str) -> str:
+    """Normalize '79', 'cwe-79' and 'CWE-79' to 'CWE-79'; TTP IDs are upper-cased ('t1059.001' -> 'T1059.001')."""
+    node_id = str(node_id).strip().upper()
+    if label in ("CWE", "CAPEC") and re.fullmatch(r"\d+", node_id):
+        return f"{label}-{node_id}"
+    return node_id
+
+
+def _id_variants(label: str, node_id: str) -> List[str]:
+    # Graph imports store CWE/CAPEC IDs either prefixed ("CWE-79") or bare ("79").
+    variants = [node_id]
+    if label in ("CWE", "CAPEC") and node_id.startswith(f"{label}-"):
+        variants.append(node_id[len(label) + 1:])
+    return variants
+
+
+def _first(props: dict, keys: Iterable[str]):
+    for key in keys:
+        if props.get(key) not in (None, "", []):
+            return props[key]
+    return None
+
+
+def _node_record(label: str, props: dict, related: list) -> dict:
+    references = _first(props, REFERENCE_KEYS) or []
+    if isinstance(references, str):
+        references = [references]
+    return {
+        "id": canonical_id(label, props.get("ID", "")),
+        "name": _first(props, NAME_KEYS),
+        "description": _first(props, DESCRIPTION_KEYS),
+        "severity": _first(props, SEVERITY_KEYS),
+        "references": list(references),
+        "related": [r for r in related if r.get("id")],
+    }
+
+
+def lookup_nodes(label: str, node_ids: Iterable[str]) -> Dict[str, Optional[dict]]:
+    """Fetch description, severity, references and neighbours for several nodes in one query.
+
+    Results are kept in a per-process LRU cache, so only IDs not seen before hit the database.
+    Returns {canonical_id: record or None}.
+    """
+    if label not in NODE_LABELS:
+        raise ValueError(f"Unsupported node label: {label}")
+    wanted = list(dict.fromkeys(canonical_id(label, i) for i in node_ids if str(i).strip()))
+
+    results: Dict[str, Optional[dict]] = {}
+    misses = []
+    with _cache_lock:
+        for node_id in wanted:
+            key = (label, node_id)
+            if key in _cache:
+                _cache.move_to_end(key)
+                results[node_id] = _cache[key]
+            else:
+                misses.append(node_id)
+
+    if misses:
+        query = (
+            f"MATCH (n:{label}) WHERE n.ID IN $ids "
+            "OPTIONAL MATCH (n)--(m) "
+            "WITH n, collect(DISTINCT {label: head(labels(m)), id: m.ID})[..25] AS related "
+            "RETURN properties(n) AS props, related"
+        )
+        ids = [v for node_id in misses for v in _id_variants(label, node_id)]
+        with get_driver().session() as session:
+            rows = session.run(query, ids=ids).data()
+        fetched = {}
+        for row in rows:
+            record = _node_record(label, row["props"], row["related"])
+            fetched[record["id"]] = record
+        with _cache_lock:
+            for node_id in misses:
+                record = fetched.get(node_id)
+                results[node_id] = record
+                if record is not None:
+                    _cache[(label, node_id)] = record
+                    if len(_cache) > CACHE_SIZE:
+                        _cache.popitem(last=False)
+
+    return {node_id: results.get(node_id) for node_id in wanted}
+
+
+def graph_lookup_result(label: str, node_ids: List[str]) -> dict:
+    """Run lookup_nodes and shape the result the way the agent tools return it."""
+    try:
+        nodes = lookup_nodes(label, node_ids)
+    except Exception as e:
+        return {"status": "error", "message": f"Neo4j lookup failed: {e}"}
+    return {
+        "status": "success",
+        "source": "Neo4j graph",
+        "nodes": {k: v for k, v in nodes.items() if v is not None},
+        "missing": [k for k, v in nodes.items() if v is None],
+    }
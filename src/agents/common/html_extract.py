@@ -0,0 +1,316 @@
+"""
+HTML to article text.
+
+Three interchangeable backends parse the page: selectolax and lxml (fast, C
+parsers) and BeautifulSoup's html.parser as the fallback that always works.
+"auto" picks the first one installed. Each backend only lists the page's
+paragraphs with their ancestors; main-content detection is shared and
+readability-style:
+
+  * script/style/nav/header/footer/aside/form elements are dropped, and so
+    is any paragraph inside an element whose class or id looks like
+    boilerplate (cookie banners, menus, share bars, comments, ...);
+  * every remaining paragraph scores its parent (and half of that its
+    grandparent) by length and comma count; class/id hints such as
+    "article" or "content" add to a container's score, and the score is
+    discounted by the share of link text;
+  * the paragraphs under the best container are the article. Pages with
+    no clear container fall back to all of their body text.
+
+Benchmark over saved pages (or synthetic ones if no directory is given):
+    python -m common.html_extract --bench path/to/html_dir
+"""
+
+import argparse
+import glob
+import multiprocessing
+import os
+import random
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser  # selectolax < 1.0 (modest backend)
+    except ImportError:
+        HTMLParser = None
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+DROP_TAGS = ("script", "style", "noscript", "nav", "header", "footer", "aside", "form", "iframe", "svg", "button", "select")
+PARAGRAPH_TAGS = ("p", "pre", "blockquote")
+BOILERPLATE_RE = re.compile(
+    r"cookie|consent|banner|nav|menu|footer|sidebar|comment|share|social|subscribe|newsletter|promo|advert|"
+    r"\bads?\b|related|breadcrumb|popup|modal|sponsor|masthead|widget|disclaimer",
+    re.IGNORECASE,
+)
+POSITIVE_RE = re.compile(r"article|body|content|entry|main|post|story|text|blog", re.IGNORECASE)
+ANCESTOR_DEPTH = 8
+MIN_PARAGRAPH_CHARS = 25
+MIN_ARTICLE_CHARS = 250
+# Below this many pages a process pool costs more to start than it saves.
+PARALLEL_MIN_PAGES = 16
+
+
+class Extracted(NamedTuple):
+    title: str
+    text: str
+    backend: str
+    main_content: bool  # False if no article container was found and the whole body was used
+
+
+class _Block(NamedTuple):
+    text: str
+    link_chars: int
+    ancestors: Tuple[Tuple[object, str, str], ...]  # (key, tag, "class id") from parent upwards
+
+
+def _clean(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _is_boilerplate(attrs: str) -> bool:
+    return bool(attrs) and BOILERPLATE_RE.search(attrs) is not None and POSITIVE_RE.search(attrs) is None
+
+
+# -------------------- Backends --------------------
+def _selectolax_blocks(html) -> Tuple[str, List[_Block], str]:
+    tree = HTMLParser(html)
+    title_node = tree.css_first("title")
+    title = _clean(title_node.text()) if title_node else ""
+    tree.strip_tags(list(DROP_TAGS))
+    blocks = []
+    for node in tree.css(",".join(PARAGRAPH_TAGS)):
+        ancestors = []
+        parent = node.parent
+        while parent is not None and parent.tag not in ("body", "html") and len(ancestors) < ANCESTOR_DEPTH:
+            attrs = parent.attributes
+            ancestors.append((parent.mem_id, parent.tag, f"{attrs.get('class') or ''} {attrs.get('id') or ''}".strip()))
+            parent = parent.parent
+        text = _clean(node.text(separator=" "))
+        link_chars = sum(len(a.text()) for a in node.css("a"))
+        blocks.append(_Block(text, link_chars, tuple(ancestors)))
+    body = tree.body
+    return title, blocks, _clean(body.text(separator=" ")) if body else ""
+
+
+def _lxml_blocks(html) -> Tuple[str, List[_Block], str]:
+    doc = lxml.html.document_fromstring(html)
+    title = _clean(doc.findtext(".//title") or "")
+    for element in list(doc.iter(*DROP_TAGS)):
+        element.drop_tree()
+    blocks = []
+    for element in doc.iter(*PARAGRAPH_TAGS):
+        ancestors = []
+        for parent in element.iterancestors():
+            if parent.tag in ("body", "html") or len(ancestors) >= ANCESTOR_DEPTH:
+                break
+            # The element itself is the key; holding it in the block keeps the proxy (and its hash) alive.
+            ancestors.append((parent, parent.tag, f"{parent.get('class') or ''} {parent.get('id') or ''}".strip()))
+        text = _clean(element.text_content())
+        link_chars = sum(len(a.text_content()) for a in element.iter("a"))
+        blocks.append(_Block(text, link_chars, tuple(ancestors)))
+    body = doc.find("body")
+    return title, blocks, _clean(body.text_content()) if body is not None else ""
+
+
+def _bs4_blocks(html) -> Tuple[str, List[_Block], str]:
+    soup = BeautifulSoup(html, "html.parser")
+    title = _clean(soup.title.get_text()) if soup.title else ""
+    for tag in soup(list(DROP_TAGS)):
+        tag.decompose()
+    blocks = []
+    for tag in soup.find_all(PARAGRAPH_TAGS):
+        ancestors = []
+        for parent in tag.parents:
+            if parent.name in ("body", "html", "[document]") or len(ancestors) >= ANCESTOR_DEPTH:
+                break
+            attrs = f"{' '.join(parent.get('class') or [])} {parent.get('id') or ''}".strip()
+            ancestors.append((id(parent), parent.name, attrs))
+        text = _clean(tag.get_text(" "))
+        link_chars = sum(len(a.get_text()) for a in tag.find_all("a"))
+        blocks.append(_Block(text, link_chars, tuple(ancestors)))
+    body = soup.body or soup
+    return title, blocks, _clean(body.get_text(" "))
+
+
+BACKENDS = {
+    "selectolax": _selectolax_blocks if HTMLParser else None,
+    "lxml": _lxml_blocks if lxml else None,
+    "bs4": _bs4_blocks,
+}
+
+
+def available_backends() -> List[str]:
+    return [name for name, fn in BACKENDS.items() if fn is not None]
+
+
+# -------------------- Main-content detection --------------------
+def _container_bonus(tag: str, attrs: str) -> float:
+    bonus = 5.0 if tag in ("article", "main") else 0.0
+    if attrs and POSITIVE_RE.search(attrs):
+        bonus += 25.0
+    return bonus
+
+
+def _main_content(blocks: List[_Block]) -> List[str]:
+    scores: Dict[object, float] = {}
+    kept = []
+    for block in blocks:
+        if len(block.text) < MIN_PARAGRAPH_CHARS or any(_is_boilerplate(attrs) for _, _, attrs in block.ancestors):
+            continue
+        kept.append(block)
+        score = 1.0 + block.text.count(",") + min(len(block.text) / 100.0, 3.0)
+        for depth, (key, tag, attrs) in enumerate(block.ancestors[:2]):
+            if key not in scores:
+                scores[key] = _container_bonus(tag, attrs)
+            scores[key] += score / (1 + depth)
+    if not scores:
+        return []
+
+    text_chars: Dict[object, int] = {}
+    link_chars: Dict[object, int] = {}
+    for block in kept:
+        for key, _, _ in block.ancestors[:2]:
+            text_chars[key] = text_chars.get(key, 0) + len(block.text)
+            link_chars[key] = link_chars.get(key, 0) + block.link_chars
+    best = max(scores, key=lambda k: scores[k] * (1 - link_chars[k] / max(text_chars[k], 1)))
+    return [b.text for b in kept if any(key == best for key, _, _ in b.ancestors)]
+
+
+def extract(html, backend: str = "auto") -> Extracted:
+    """Return the title and main text of an HTML page (bytes or str)."""
+    if backend == "auto":
+        backend = available_backends()[0]
+    parse = BACKENDS.get(backend)
+    if parse is None:
+        raise ValueError(f"HTML backend {backend!r} is not available; installed: {available_backends()}")
+    if not html or not html.strip():
+        return Extracted("", "", backend, False)
+    title, blocks, body_text = parse(html)
+    paragraphs = _main_content(blocks)
+    text = "\n\n".join(paragraphs)
+    if len(text) < MIN_ARTICLE_CHARS:
+        return Extracted(title, body_text, backend, False)
+    return Extracted(title, text, backend, True)
+
+
+def _extract_for_pool(args) -> Extracted:
+    html, backend = args
+    return extract(html, backend)
+
+
+def extract_many(pages: Iterable, backend: str = "auto", workers: int = 0) -> List[Extracted]:
+    """Extract several pages, in a process pool when the batch is large enough."""
+    pages = list(pages)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(pages) < PARALLEL_MIN_PAGES:
+        return [extract(page, backend) for page in pages]
+    # Spawned, not forked: the caller is usually a multi-threaded agent server, and a forked
+    # child can inherit a lock another thread was holding. `common` imports no agents, so
+    # spawned workers start quickly.
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(_extract_for_pool, ((page, backend) for page in pages), chunksize=4))
+
+
+# -------------------- Benchmark --------------------
+def legacy_text(html) -> str:
+    """What article_summarizer extracted before this module (html.parser, get_text, split on double spaces)."""
+    soup = BeautifulSoup(html, "html.parser")
+    for script in soup(["script", "style"]):
+        script.decompose()
+    lines = (line.strip() for line in soup.get_text().splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return " ".join(chunk for chunk in chunks if chunk)
+
+
+def _synthetic_pages(n: int, seed: int = 5) -> List[str]:
+    rng = random.Random(seed)
+    words = "threat actors exploited vulnerability patch server network ransomware credentials phishing campaign " \
+            "defenders observed malware payload lateral movement exfiltration indicators advisory vendor".split()
+
+    def sentence():
+        return " ".join(rng.choice(words) for _ in range(rng.randint(8, 20))).capitalize() + rng.choice([".", ",", "."])
+
+    pages = []
+    for i in range(n):
+        nav = "".join(f'<li><a href="/s{j}">Section {j}</a></li>' for j in range(30))
+        article = "".join(f"<p>{' '.join(sentence() for _ in range(rng.randint(2, 5)))}</p>" for _ in range(rng.randint(8, 20)))
+        related = "".join(f'<li><a href="/r{j}">{sentence()}</a></li>' for j in range(10))
+        pages.append(
+            f"<html><head><title>Report {i}</title><style>body{{margin:0}}</style>"
+            f"<script>var t={i};{'x=1;' * 200}</script></head><body>"
+            f"<header><nav><ul>{nav}</ul></nav></header>"
+            f'<div class="cookie-banner"><p>We use cookies to improve your experience. Accept all cookies to continue.</p></div>'
+            f'<div class="layout"><div class="post-content"><h1>Report {i}</h1>{article}</div>'
+            f'<div class="sidebar"><p>Subscribe to our newsletter for weekly threat digests and more.</p>'
+            f"<ul>{related}</ul></div></div>"
+            f'<div id="comments"><p>{sentence()} {sentence()}</p></div>'
+            f"<footer><p>Copyright 2024 Example Security. All rights reserved. Privacy policy.</p></footer>"
+            f"</body></html>"
+        )
+    return pages
+
+
+def benchmark(directory: str = "", n: int = 500) -> None:
+    if directory:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(directory, "**", "*.htm*"), recursive=True)):
+            with open(path, "rb") as f:
+                pages.append(f.read())
+        source = f"{len(pages)} pages from {directory}"
+    else:
+        pages = _synthetic_pages(n)
+        source = f"{n} synthetic pages"
+    if not pages:
+        print("no pages found")
+        return
+    print(f"{source}, {sum(len(p) for p in pages) / 1e6:.1f} MB of HTML")
+
+    start = time.perf_counter()
+    legacy_chars = sum(len(legacy_text(p)) for p in pages)
+    legacy_s = time.perf_counter() - start
+    print(f"  legacy bs4 get_text:  {legacy_s:6.2f}s  {legacy_chars / len(pages):8.0f} chars/page (~{legacy_chars / 4 / len(pages):.0f} tokens)")
+    for backend in available_backends():
+        start = time.perf_counter()
+        results = [extract(p, backend) for p in pages]
+        elapsed = time.perf_counter() - start
+        chars = sum(len(r.text) for r in results)
+        main = sum(r.main_content for r in results)
+        print(f"  {backend:<20}  {elapsed:6.2f}s  {chars / len(pages):8.0f} chars/page (~{chars / 4 / len(pages):.0f} tokens), "
+              f"{legacy_s / elapsed:.1f}x faster, main content found on {main}/{len(pages)}")
+    if (os.cpu_count() or 1) > 1:
+        start = time.perf_counter()
+        extract_many(pages)
+        print(f"  auto, process pool:   {time.perf_counter() - start:6.2f}s on {os.cpu_count()} CPUs")
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Extract article text from HTML, or benchmark the extractors.")
+    parser.add_argument("path", nargs="?", help="HTML file to extract")
+    parser.add_argument("--backend", default="auto", choices=["auto"] + list(BACKENDS))
+    parser.add_argument("--bench", nargs="?", const="", metavar="DIR",
+                        help="benchmark on the .html files under DIR (synthetic pages if omitted)")
+    parser.add_argument("--pages", type=int, default=500, help="synthetic pages for --bench")
+    args = parser.parse_args(argv)
+    if args.bench is not None:
+        benchmark(args.bench, args.pages)
+    elif args.path:
+        with open(args.path, "rb") as f:
+            result = extract(f.read(), args.backend)
+        print(result.title, "\n")
+        print(result.text)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
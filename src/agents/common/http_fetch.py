@@ -0,0 +1,279 @@
+"""
+Concurrent URL fetching for the summarizer agents.
+
+All requests go through one pooled requests.Session. urllib3 keeps a
+connection pool per host, and `pool_block=True` caps each pool at
+PER_HOST_CONNECTIONS, so a digest of 200 links to the same site never opens
+more than that many sockets to it. Bodies are streamed and cut off at
+`max_bytes`. Responses with an ETag or Last-Modified header are stored in
+an on-disk cache (HTTP_CACHE_DIR, default ~/.cache/agentic_ai/http) and
+revalidated with conditional GETs; a 304 is answered from the cache.
+
+Self-check against a local stand-in server (no network needed):
+    python -m common.http_fetch
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", os.path.expanduser("~/.cache/agentic_ai/http"))
+PER_HOST_CONNECTIONS = 8
+MAX_WORKERS = 32
+MAX_BYTES = 5 * 1024 * 1024
+TIMEOUT = (5, 20)  # connect, read (seconds)
+CHUNK = 64 * 1024
+USER_AGENT = "Mozilla/5.0 (compatible; AgenticAI-Summarizer/1.0)"
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class FetchResult(NamedTuple):
+    url: str
+    status_code: int  # 0 if the request failed before a response
+    content: bytes
+    content_type: str
+    encoding: Optional[str]
+    from_cache: bool  # served from the disk cache after a 304
+    truncated: bool  # body cut off at max_bytes
+    error: str
+    timing: Dict[str, float]  # seconds: "headers" (time to response headers), "body", "total"
+
+    @property
+    def ok(self) -> bool:
+        return not self.error and 200 <= self.status_code < 400
+
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", "replace")
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=64,
+                    pool_maxsize=PER_HOST_CONNECTIONS,
+                    pool_block=True,
+                    max_retries=Retry(total=2, connect=2, read=0, backoff_factor=0.3,
+                                      status_forcelist=(502, 503, 504), allowed_methods=("GET",)),
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers["User-Agent"] = USER_AGENT
+                _session = session
+    return _session
+
+
+# -------------------- Disk cache --------------------
+def _cache_paths(url: str, cache_dir: str):
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    base = os.path.join(cache_dir, key[:2], key)
+    return base + ".json", base + ".body"
+
+
+def _read_cache(url: str, cache_dir: str) -> Optional[dict]:
+    meta_path, body_path = _cache_paths(url, cache_dir)
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            meta["content"] = f.read()
+        return meta
+    except (OSError, ValueError):
+        return None
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def _write_cache(url: str, cache_dir: str, response: requests.Response, content: bytes, truncated: bool) -> None:
+    etag, modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+    if not (etag or modified) or "no-store" in response.headers.get("Cache-Control", ""):
+        return
+    meta_path, body_path = _cache_paths(url, cache_dir)
+    os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+    meta = {
+        "url": url,
+        "etag": etag,
+        "last_modified": modified,
+        "content_type": response.headers.get("Content-Type", ""),
+        "encoding": response.encoding,
+        "truncated": truncated,
+        "stored_at": time.time(),
+    }
+    # Body first: a reader that finds the metadata always finds a complete body.
+    _atomic_write(body_path, content)
+    _atomic_write(meta_path, json.dumps(meta).encode("utf-8"))
+
+
+# -------------------- Fetching --------------------
+def fetch_url(url: str, max_bytes: int = MAX_BYTES, use_cache: bool = True, cache_dir: str = "") -> FetchResult:
+    """GET one URL through the shared session; never raises (errors are in FetchResult.error)."""
+    cache_dir = cache_dir or CACHE_DIR
+    start = time.perf_counter()
+    timing = {}
+    cached = _read_cache(url, cache_dir) if use_cache else None
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    try:
+        with get_session().get(url, headers=headers, stream=True, timeout=TIMEOUT) as response:
+            timing["headers"] = time.perf_counter() - start
+            if response.status_code == 304 and cached:
+                timing["body"] = 0.0
+                timing["total"] = time.perf_counter() - start
+                return FetchResult(url, 304, cached["content"], cached.get("content_type", ""), cached.get("encoding"),
+                                   True, bool(cached.get("truncated")), "", timing)
+
+            body = bytearray()
+            truncated = False
+            for chunk in response.iter_content(CHUNK):
+                body += chunk
+                if len(body) > max_bytes:
+                    del body[max_bytes:]
+                    truncated = True
+                    break
+            content = bytes(body)
+            timing["body"] = time.perf_counter() - start - timing["headers"]
+            if use_cache and response.status_code == 200:
+                try:
+                    _write_cache(url, cache_dir, response, content, truncated)
+                except OSError:
+                    pass  # the cache is an optimization; a full disk must not fail the fetch
+            timing["total"] = time.perf_counter() - start
+            error = "" if response.ok else f"HTTP {response.status_code}"
+            return FetchResult(url, response.status_code, content, response.headers.get("Content-Type", ""),
+                               response.encoding, False, truncated, error, timing)
+    except requests.RequestException as e:
+        timing["total"] = time.perf_counter() - start
+        return FetchResult(url, 0, b"", "", None, False, False, str(e), timing)
+
+
+def fetch_many(
+    urls: List[str],
+    max_workers: int = MAX_WORKERS,
+    max_bytes: int = MAX_BYTES,
+    use_cache: bool = True,
+    cache_dir: str = "",
+) -> List[FetchResult]:
+    """Fetch URLs concurrently; results are in input order and duplicate URLs are fetched once."""
+    unique = list(dict.fromkeys(urls))
+    if not unique:
+        return []
+    workers = max(1, min(max_workers, len(unique)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch") as pool:
+        results = dict(zip(unique, pool.map(lambda u: fetch_url(u, max_bytes, use_cache, cache_dir), unique)))
+    return [results[u] for u in urls]
+
+
+# -------------------- Self-check --------------------
+def _self_check() -> None:
+    import shutil
+    from email.utils import formatdate
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    modified = formatdate(time.time() - 3600, usegmt=True)
+
+    class StandIn(BaseHTTPRequestHandler):
+        hits = {"200": 0, "304": 0}
+        lock = threading.Lock()
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.startswith("/slow/"):
+                time.sleep(0.3)
+            if self.path == "/big":
+                body = b"x" * (3 * 1024 * 1024)
+            elif self.path == "/missing":
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            else:
+                body = f"<html><body><p>Article at {self.path}.</p></body></html>".encode()
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                with self.lock:
+                    self.hits["304"] += 1
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            with self.lock:
+                self.hits["200"] += 1
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", modified)
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    cache_dir = tempfile.mkdtemp(prefix="http-cache-")
+    try:
+        slow = [f"{base}/slow/{i}" for i in range(16)]
+        start = time.perf_counter()
+        first = fetch_many(slow + [slow[0]], cache_dir=cache_dir)
+        elapsed = time.perf_counter() - start
+        assert all(r.status_code == 200 and not r.from_cache for r in first), first
+        assert first[0] is first[-1], "duplicate URL should be fetched once"
+        assert StandIn.hits["200"] == 16
+        # 16 requests of 0.3 s with 8 connections to one host: two rounds, not sixteen.
+        assert elapsed < 16 * 0.3 / 2, f"fetches did not overlap ({elapsed:.2f}s)"
+        print(f"ok: 16 slow URLs in {elapsed:.2f}s (serial would be {16 * 0.3:.1f}s)")
+
+        again = fetch_many(slow, cache_dir=cache_dir)
+        assert all(r.status_code == 304 and r.from_cache for r in again)
+        assert [r.content for r in again] == [r.content for r in first[:16]]
+        assert StandIn.hits["304"] == 16
+        print("ok: second pass revalidated with If-None-Match, bodies served from cache")
+
+        big = fetch_url(f"{base}/big", max_bytes=1024 * 1024, cache_dir=cache_dir)
+        assert big.truncated and len(big.content) == 1024 * 1024
+        print(f"ok: 3 MB body capped at 1 MB in {big.timing['total']:.3f}s")
+
+        missing = fetch_url(f"{base}/missing", cache_dir=cache_dir)
+        refused = fetch_url("http://127.0.0.1:9/", cache_dir=cache_dir)
+        assert missing.status_code == 404 and not missing.ok
+        assert refused.status_code == 0 and refused.error
+        print("ok: HTTP errors and connection failures are reported, not raised")
+        print("timing of first fetch:", {k: round(v, 3) for k, v in first[0].timing.items()})
+    finally:
+        server.shutdown()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    _self_check()
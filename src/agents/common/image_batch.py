@@ -0,0 +1,357 @@
+"""
+Batch image captioning for incident screenshot dumps.
+
+    walk      every image file under a directory (by extension)
+    dedupe    exact copies by SHA-256, near-duplicates by 64-bit difference
+              hash (dHash) within HAMMING_THRESHOLD bits; only one image
+              per group is captioned and the others share its caption
+    shrink    downscale to MAX_SIDE pixels and re-encode until the payload
+              is under MAX_PAYLOAD_BYTES; formats Gemini does not accept
+              (GIF, BMP, TIFF) are converted
+    caption   concurrently (MAX_WORKERS) under a requests-per-minute budget
+              (CAPTION_RPM), through the shared genai client
+    cache     one JSON line per image, keyed by the SHA-256 of the original
+              file, in CAPTION_CACHE_PATH; re-runs only caption new images
+
+Pillow is optional: without it near-duplicates are not detected and
+images are sent as they are (or skipped if over the payload cap).
+
+Caption a directory:
+    python -m common.image_batch /path/to/screenshots
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from google.genai import types
+
+from common.genai_client import get_client
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+MODEL = "gemini-2.0-flash"
+PROMPT = "Caption this image."
+CACHE_PATH = os.environ.get("CAPTION_CACHE_PATH", os.path.expanduser("~/.cache/agentic_ai/captions.jsonl"))
+RPM = int(os.environ.get("CAPTION_RPM", "60"))
+MAX_WORKERS = 8
+MAX_SIDE = 1536
+MAX_PAYLOAD_BYTES = 1024 * 1024
+JPEG_QUALITIES = (85, 70, 55)
+HAMMING_THRESHOLD = 4
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp", ".tif", ".tiff", ".heic", ".heif")
+# Formats Gemini accepts inline; anything else is re-encoded.
+ACCEPTED_MIME = ("image/png", "image/jpeg", "image/webp", "image/heic", "image/heif")
+
+_MAGIC = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+)
+
+
+class Prepared(NamedTuple):
+    path: str
+    sha256: str
+    dhash: Optional[int]
+    data: bytes  # payload to send, already downscaled/re-encoded
+    mime_type: str
+    error: str
+
+
+def sniff_mime(data: bytes) -> str:
+    """MIME type from the file's magic bytes, '' if unknown."""
+    for magic, mime in _MAGIC:
+        if data.startswith(magic):
+            return mime
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:8] == b"ftyp" and data[8:12] in (b"heic", b"heix", b"mif1", b"msf1", b"heif"):
+        return "image/heic" if data[8:12].startswith(b"hei") else "image/heif"
+    return ""
+
+
+def iter_images(directory: str) -> Iterator[str]:
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(root, name)
+
+
+def dhash(image) -> int:
+    """64-bit difference hash: brightness gradients of a 9x8 grayscale thumbnail."""
+    pixels = list(image.convert("L").resize((9, 8), Image.BILINEAR).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+def _encode(image, mime_type: str) -> tuple:
+    if mime_type == "image/png" or image.mode in ("RGBA", "LA", "P"):
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG", optimize=True)
+        if buffer.tell() <= MAX_PAYLOAD_BYTES:
+            return buffer.getvalue(), "image/png"
+    rgb = image.convert("RGB")
+    for quality in JPEG_QUALITIES:
+        buffer = io.BytesIO()
+        rgb.save(buffer, format="JPEG", quality=quality, optimize=True)
+        if buffer.tell() <= MAX_PAYLOAD_BYTES:
+            break
+    return buffer.getvalue(), "image/jpeg"
+
+
+def prepare(path: str) -> Prepared:
+    """Read, hash and shrink one image; never raises (errors are in Prepared.error)."""
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except OSError as e:
+        return Prepared(path, "", None, b"", "", str(e))
+    digest = hashlib.sha256(raw).hexdigest()
+    mime_type = sniff_mime(raw)
+    if Image is None:
+        if mime_type not in ACCEPTED_MIME:
+            return Prepared(path, digest, None, b"", mime_type, f"unsupported format {mime_type or 'unknown'}")
+        if len(raw) > MAX_PAYLOAD_BYTES:
+            return Prepared(path, digest, None, b"", mime_type, "too large to send without Pillow")
+        return Prepared(path, digest, None, raw, mime_type, "")
+    try:
+        with Image.open(io.BytesIO(raw)) as image:
+            image.load()
+            fingerprint = dhash(image)
+            small_enough = max(image.size) <= MAX_SIDE and len(raw) <= MAX_PAYLOAD_BYTES
+            if small_enough and mime_type in ACCEPTED_MIME:
+                return Prepared(path, digest, fingerprint, raw, mime_type, "")
+            if max(image.size) > MAX_SIDE:
+                image.thumbnail((MAX_SIDE, MAX_SIDE), Image.LANCZOS)
+            data, mime_type = _encode(image, mime_type)
+    except Exception as e:
+        return Prepared(path, digest, None, b"", mime_type, f"{type(e).__name__}: {e}")
+    return Prepared(path, digest, fingerprint, data, mime_type, "")
+
+
+def group_duplicates(items: List[Prepared], threshold: int = HAMMING_THRESHOLD) -> Dict[str, str]:
+    """Map the sha256 of every duplicate image to the sha256 of its representative.
+
+    Near-duplicate search splits each hash into threshold + 1 bands: two
+    hashes within `threshold` bits agree exactly on at least one band, so
+    only images sharing a band are compared. A zero hash (a flat image with
+    no gradients) says nothing about content and only matches exact copies.
+    """
+    duplicate_of = {}
+    bands = threshold + 1
+    width = -(-64 // bands)
+    index = [dict() for _ in range(bands)]
+    kept = {}
+    for item in items:
+        if item.sha256 in kept or item.sha256 in duplicate_of:
+            continue
+        match = None
+        if item.dhash:
+            keys = [(item.dhash >> (b * width)) & ((1 << width) - 1) for b in range(bands)]
+            for b, key in enumerate(keys):
+                for other in index[b].get(key, ()):
+                    if bin(item.dhash ^ kept[other]).count("1") <= threshold:
+                        match = other
+                        break
+                if match:
+                    break
+        if match:
+            duplicate_of[item.sha256] = match
+            continue
+        kept[item.sha256] = item.dhash
+        if item.dhash:
+            for b, key in enumerate(keys):
+                index[b].setdefault(key, []).append(item.sha256)
+    return duplicate_of
+
+
+class RateLimiter:
+    """Token bucket: at most `per_minute` acquisitions per rolling minute, smoothed."""
+
+    def __init__(self, per_minute: int):
+        self.interval = 60.0 / max(1, per_minute)
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class CaptionCache:
+    """Append-only JSONL cache of captions keyed by image SHA-256 (and prompt)."""
+
+    def __init__(self, path: str = CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self._entries[(entry["sha256"], entry["prompt"])] = entry
+                    except (ValueError, KeyError):
+                        continue  # a torn last line from an interrupted run
+        except FileNotFoundError:
+            pass
+
+    def get(self, sha256: str, prompt: str) -> Optional[dict]:
+        return self._entries.get((sha256, prompt))
+
+    def put(self, entry: dict) -> None:
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._entries[(entry["sha256"], entry["prompt"])] = entry
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(block)
+    except OSError:
+        return ""
+    return h.hexdigest()
+
+
+def caption_directory(
+    directory: str,
+    prompt: str = PROMPT,
+    rpm: int = RPM,
+    max_workers: int = MAX_WORKERS,
+    cache_path: str = "",
+) -> dict:
+    """Caption every image under directory; returns counts, per-image results and timing.
+
+    Cached images are only hashed, not decoded; new images are deduplicated
+    against each other and against the cached ones.
+    """
+    start = time.perf_counter()
+    cache = CaptionCache(cache_path or CACHE_PATH)
+    paths = list(iter_images(directory))
+    workers = max(1, min(max_workers, len(paths) or 1))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="img-hash") as pool:
+        digests = list(pool.map(file_digest, paths))
+    new_paths = [p for p, d in zip(paths, digests) if not d or not cache.get(d, prompt)]
+    # Decoding and resizing release the GIL in Pillow, so threads are enough here
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="img-prep") as pool:
+        prepared = {item.path: item for item in pool.map(prepare, new_paths)}
+    prepare_s = time.perf_counter() - start
+
+    ok = [item for item in prepared.values() if not item.error]
+    seeds = [Prepared("", d, cache.get(d, prompt).get("dhash"), b"", "", "")
+             for d in dict.fromkeys(digests) if d and cache.get(d, prompt)]
+    duplicate_of = group_duplicates(seeds + ok)
+    todo = list({item.sha256: item for item in ok if item.sha256 not in duplicate_of}.values())
+
+    limiter = RateLimiter(rpm)
+    client = get_client() if todo else None
+
+    def caption(item: Prepared) -> dict:
+        limiter.acquire()
+        try:
+            response = client.models.generate_content(
+                model=MODEL,
+                contents=[types.Part.from_bytes(data=item.data, mime_type=item.mime_type), prompt],
+            )
+            text = (response.text or "").strip()
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}"}
+        if not text:
+            return {"error": "empty caption"}
+        entry = {"sha256": item.sha256, "dhash": item.dhash, "prompt": prompt, "caption": text, "model": MODEL,
+                 "created": time.time()}
+        cache.put(entry)
+        return entry
+
+    caption_start = time.perf_counter()
+    failed = {}
+    if todo:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(todo)), thread_name_prefix="img-caption") as pool:
+            for item, outcome in zip(todo, pool.map(caption, todo)):
+                if "error" in outcome:
+                    failed[item.sha256] = outcome["error"]
+    caption_s = time.perf_counter() - caption_start
+
+    new = {item.sha256 for item in todo}
+    counted, results = set(), []
+    for path, digest in zip(paths, digests):
+        result = {"path": path, "sha256": digest}
+        item = prepared.get(path)
+        if item is not None and item.error:
+            result.update(status="error", error=item.error)
+            results.append(result)
+            continue
+        rep = duplicate_of.get(digest, digest)
+        if rep != digest:
+            result["duplicate_of"] = rep
+        if rep in failed:
+            result.update(status="error", error=failed[rep])
+        else:
+            if rep != digest or digest in counted:
+                source = "duplicate"
+            else:
+                source = "model" if digest in new else "cache"
+            result.update(status="success", caption=cache.get(rep, prompt)["caption"], source=source)
+        counted.add(digest)
+        results.append(result)
+
+    sources = [r.get("source") for r in results]
+    return {
+        "images": len(paths),
+        "captioned": len(todo) - len(failed),
+        "cached": sources.count("cache"),
+        "duplicates": sources.count("duplicate"),
+        "failed": sum(1 for r in results if r["status"] == "error"),
+        "results": results,
+        "cache_path": cache.path,
+        "timing_s": {
+            "prepare": round(prepare_s, 3),
+            "caption": round(caption_s, 3),
+            "total": round(time.perf_counter() - start, 3),
+        },
+    }
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Caption every image under a directory.")
+    parser.add_argument("directory")
+    parser.add_argument("--prompt", default=PROMPT)
+    parser.add_argument("--rpm", type=int, default=RPM, help="requests per minute budget")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    args = parser.parse_args(argv)
+    report = caption_directory(args.directory, args.prompt, args.rpm, args.workers)
+    for result in report.pop("results"):
+        print(json.dumps(result, ensure_ascii=False))
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
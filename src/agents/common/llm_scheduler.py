@@ -0,0 +1,453 @@
+"""
+Process-wide scheduler for every Gemini call: rate limits, priorities, coalescing.
+
+The root agents hold ~40 LlmAgents on gemini-2.0-flash, and ParallelAgent
+fan-outs start 7-8 model calls at once; on their own they overrun the
+per-minute quota and each one backs off blindly after its 429. Instead,
+every call now asks this scheduler for permission first:
+
+- Token buckets per model enforce requests per minute (LLM_RPM) and tokens
+  per minute (LLM_TPM). A call reserves its estimated tokens (prompt
+  characters / 4 plus OUTPUT_TOKENS_ESTIMATE) and is settled with the
+  actual count afterwards; an overrun is carried as debt. Both buckets hold
+  at most a minute's worth, so an idle period allows one minute's burst.
+- Waiting calls are served strictly in (priority, arrival) order per model:
+  INTERACTIVE (the manager, via the server) before NORMAL (default) before
+  BATCH (report generators). Set it for a block with `with priority(BATCH):`.
+- Identical requests in flight at the same time (same model, contents and
+  config) are sent once; the others wait for and share the result.
+- A 429 drains the model's request bucket and pauses it for as long as the
+  API asked (Retry-After header or RetryInfo detail, capped at
+  MAX_THROTTLE_S; THROTTLE_S if it named no delay), so all waiting calls
+  back off together; the call is then retried through the queue, up to
+  MAX_ATTEMPTS times. Streaming calls are retried the same way as long as
+  nothing has been streamed yet.
+
+The defaults are the Gemini API free tier for gemini-2.0-flash (15 RPM,
+1M TPM); set LLM_RPM and LLM_TPM to your tier, divided by the number of
+server processes sharing the key.
+
+ADK agents reach it through common.scheduled_gemini, direct SDK calls
+through common.genai_client, and the report app's REST calls through
+acquire()/settle()/throttled(). stats() reports queue depth per priority,
+wait times, coalesced and throttled calls per model.
+"""
+
+import asyncio
+import concurrent.futures
+import contextlib
+import email.utils
+import hashlib
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Mapping, Optional
+
+from google.genai import errors
+
+INTERACTIVE, NORMAL, BATCH = 0, 1, 2
+LEVELS = {INTERACTIVE: "interactive", NORMAL: "normal", BATCH: "batch"}
+
+RPM = float(os.environ.get("LLM_RPM", "15"))
+TPM = float(os.environ.get("LLM_TPM", "1000000"))
+OUTPUT_TOKENS_ESTIMATE = 1024
+CHARS_PER_TOKEN = 4
+THROTTLE_S = 5.0
+# A daily-quota 429 can ask for hours; past this the call fails instead of blocking the model.
+MAX_THROTTLE_S = 60.0
+MAX_ATTEMPTS = 4
+POLL_S = 0.05  # re-check interval for calls waiting behind another one
+WAIT_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 30, 60)
+
+_priority: ContextVar[int] = ContextVar("llm_priority", default=NORMAL)
+
+_scheduler: Optional["LlmScheduler"] = None
+_scheduler_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def priority(level: int) -> Iterator[None]:
+    """Schedule the model calls made inside this block (and the tasks it starts) at `level`."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + OUTPUT_TOKENS_ESTIMATE
+
+
+def is_rate_limited(exc: Exception) -> bool:
+    return isinstance(exc, errors.APIError) and exc.code == 429
+
+
+def parse_delay(value: Any) -> Optional[float]:
+    """Seconds from a Retry-After value (delta-seconds or HTTP date) or a RetryInfo retryDelay ("37s")."""
+    if value is None:
+        return None
+    text = str(value).strip()
+    try:
+        return max(0.0, float(text[:-1] if text.endswith("s") else text))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(text).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_after(headers: Optional[Mapping] = None, payload: Any = None) -> Optional[float]:
+    """The delay a 429 asked for: its Retry-After header, else the RetryInfo detail of its JSON body."""
+    delay = parse_delay((headers or {}).get("retry-after") or (headers or {}).get("Retry-After"))
+    if delay is not None:
+        return delay
+    error = payload.get("error", payload) if isinstance(payload, dict) else None
+    details = error.get("details") if isinstance(error, dict) else None
+    for detail in details or []:
+        if isinstance(detail, dict) and "retryDelay" in detail:
+            return parse_delay(detail["retryDelay"])
+    return None
+
+
+def error_retry_after(exc: Exception) -> Optional[float]:
+    """retry_after() for a google-genai APIError."""
+    return retry_after(getattr(getattr(exc, "response", None), "headers", None), getattr(exc, "details", None))
+
+
+# -------------------- Token buckets --------------------
+class TokenBucket:
+    """`rate` units per minute, holding at most one minute's worth; may go negative (debt)."""
+
+    def __init__(self, rate_per_min: float):
+        self.rate = rate_per_min / 60.0
+        self.capacity = rate_per_min
+        self.level = rate_per_min
+        self.stamp = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` (capped at capacity) is available; 0 when it is now."""
+        missing = min(amount, self.capacity) - self.level
+        return 0.0 if missing <= 0 else missing / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= amount
+
+
+class Grant:
+    """Permission for one call: what was reserved and how long it waited."""
+
+    def __init__(self, model: str, tokens: int, level: int, waited: float):
+        self.model, self.tokens, self.level, self.waited = model, tokens, level, waited
+
+
+class _Ticket:
+    def __init__(self, model: str, tokens: int, level: int, seq: int):
+        self.model, self.tokens, self.level, self.seq = model, tokens, level, seq
+        self.enqueued = time.monotonic()
+
+    def __lt__(self, other: "_Ticket") -> bool:
+        return (self.level, self.seq) < (other.level, other.seq)
+
+
+# -------------------- Scheduler --------------------
+class LlmScheduler:
+    """Per-model RPM/TPM buckets with a priority queue in front and coalescing of identical calls."""
+
+    def __init__(self, rpm: float = RPM, tpm: float = TPM):
+        self.rpm, self.tpm = rpm, tpm
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._queues: Dict[str, List[_Ticket]] = {}
+        self._buckets: Dict[str, tuple] = {}
+        self._paused: Dict[str, float] = {}
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+        self._stats: Dict[str, dict] = {}
+
+    # ---- admission ----
+    def _model(self, model: str) -> tuple:
+        if model not in self._buckets:
+            self._buckets[model] = (TokenBucket(self.rpm), TokenBucket(self.tpm))
+            self._queues[model] = []
+        return self._buckets[model]
+
+    def _enqueue(self, model: str, tokens: int, level: Optional[int]) -> _Ticket:
+        with self._cond:
+            self._model(model)
+            ticket = _Ticket(model, tokens, _priority.get() if level is None else level, next(self._seq))
+            heapq.heappush(self._queues[model], ticket)
+            return ticket
+
+    def _try_grant(self, ticket: _Ticket) -> float:
+        """Grant the ticket (returns 0) or return how long to wait before asking again."""
+        with self._cond:
+            queue = self._queues[ticket.model]
+            if queue[0] is not ticket:
+                return POLL_S
+            now = time.monotonic()
+            requests, tokens = self._buckets[ticket.model]
+            requests.refill(now)
+            tokens.refill(now)
+            wait = max(requests.wait_time(1), tokens.wait_time(ticket.tokens),
+                       self._paused.get(ticket.model, 0.0) - now)
+            if wait > 0:
+                return wait
+            heapq.heappop(queue)
+            requests.take(1)
+            tokens.take(ticket.tokens)
+            self._record(ticket, now - ticket.enqueued)
+            self._cond.notify_all()
+            return 0.0
+
+    def acquire(self, model: str, tokens: int, level: Optional[int] = None) -> Grant:
+        """Block until the call may be sent."""
+        ticket = self._enqueue(model, tokens, level)
+        try:
+            while True:
+                wait = self._try_grant(ticket)
+                if wait == 0:
+                    return Grant(model, tokens, ticket.level, time.monotonic() - ticket.enqueued)
+                with self._cond:
+                    self._cond.wait(wait)
+        except BaseException:
+            # A ticket left at the head of the queue would block the model for everyone
+            self._abandon(ticket)
+            raise
+
+    async def acquire_async(self, model: str, tokens: int, level: Optional[int] = None) -> Grant:
+        """acquire() for coroutines: waits without blocking the event loop."""
+        ticket = self._enqueue(model, tokens, level)
+        try:
+            while True:
+                wait = self._try_grant(ticket)
+                if wait == 0:
+                    return Grant(model, tokens, ticket.level, time.monotonic() - ticket.enqueued)
+                await asyncio.sleep(min(wait, 1.0))
+        except BaseException:
+            self._abandon(ticket)
+            raise
+
+    def _abandon(self, ticket: _Ticket) -> None:
+        with self._cond:
+            queue = self._queues[ticket.model]
+            if ticket in queue:
+                queue.remove(ticket)
+                heapq.heapify(queue)
+                self._cond.notify_all()
+
+    def settle(self, grant: Grant, used_tokens: Optional[int]) -> None:
+        """Correct the token reservation with the real usage, once known."""
+        if used_tokens is None:
+            return
+        with self._cond:
+            bucket = self._buckets[grant.model][1]
+            bucket.level = min(bucket.capacity, bucket.level - (used_tokens - grant.tokens))
+            self._stats[grant.model]["tokens_used"] += used_tokens
+
+    def throttled(self, model: str, retry_after: Optional[float] = None) -> None:
+        """The API answered 429: empty the request bucket and pause the model for everyone.
+
+        retry_after is the delay the API asked for (see retry_after()); THROTTLE_S if it named none.
+        """
+        retry_after = THROTTLE_S if retry_after is None else min(retry_after, MAX_THROTTLE_S)
+        with self._cond:
+            requests, _ = self._model(model)
+            requests.level = min(requests.level, 0.0)
+            self._paused[model] = max(self._paused.get(model, 0.0), time.monotonic() + retry_after)
+            self._model_stats(model)["throttled"] += 1
+
+    # ---- calls ----
+    def _leader(self, key: str):
+        """(future, is_leader) for a coalescing key; followers get the leader's future."""
+        with self._cond:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = self._inflight[key] = concurrent.futures.Future()
+            return future, True
+
+    def _done(self, key: str) -> None:
+        with self._cond:
+            self._inflight.pop(key, None)
+
+    def shared(self, model: str, key: Optional[str], send: Callable[[], object]):
+        """Run send(), or wait for the identical call (same key) already running and take its result."""
+        if key is None:
+            return send()
+        future, leader = self._leader(key)
+        if not leader:
+            self._count(model, "coalesced")
+            return future.result()
+        try:
+            result = send()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._done(key)
+
+    async def shared_async(self, model: str, key: Optional[str], send: Callable[[], Awaitable[object]]):
+        """shared() for coroutines; the identical call may be running on any thread or event loop."""
+        if key is None:
+            return await send()
+        future, leader = self._leader(key)
+        if not leader:
+            self._count(model, "coalesced")
+            return await asyncio.wrap_future(future)
+        try:
+            result = await send()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._done(key)
+
+    def _retry(self, model: str, exc: Exception, attempt: int) -> bool:
+        """After a failed attempt: pause the model and return True if the call should be retried."""
+        if not is_rate_limited(exc) or attempt >= MAX_ATTEMPTS:
+            return False
+        delay = error_retry_after(exc)
+        if delay is not None and delay > MAX_THROTTLE_S:
+            return False
+        self.throttled(model, delay)
+        return True
+
+    def call(self, model: str, send: Callable[[], object], *, tokens: int, key: Optional[str] = None,
+             usage: Optional[Callable[[object], Optional[int]]] = None, level: Optional[int] = None):
+        """Send through the scheduler: wait for a grant, retry 429s via the queue, share identical calls."""
+
+        def attempt():
+            for n in range(1, MAX_ATTEMPTS + 1):
+                grant = self.acquire(model, tokens, level)
+                try:
+                    result = send()
+                except Exception as e:
+                    if self._retry(model, e, n):
+                        continue
+                    raise
+                self.settle(grant, usage(result) if usage else None)
+                return result
+
+        return self.shared(model, key, attempt)
+
+    async def call_async(self, model: str, send: Callable[[], Awaitable[object]], *, tokens: int,
+                         key: Optional[str] = None, usage: Optional[Callable[[object], Optional[int]]] = None,
+                         level: Optional[int] = None):
+        """call() for coroutines."""
+
+        async def attempt():
+            for n in range(1, MAX_ATTEMPTS + 1):
+                grant = await self.acquire_async(model, tokens, level)
+                try:
+                    result = await send()
+                except Exception as e:
+                    if self._retry(model, e, n):
+                        continue
+                    raise
+                self.settle(grant, usage(result) if usage else None)
+                return result
+
+        return await self.shared_async(model, key, attempt)
+
+    async def call_stream(self, model: str, open_stream: Callable[[], AsyncIterator[Any]], *, tokens: int,
+                          usage: Optional[Callable[[List[Any]], Optional[int]]] = None,
+                          level: Optional[int] = None) -> AsyncIterator[Any]:
+        """call_async() for a streamed response, yielding items as they arrive; never coalesced.
+
+        A 429 is retried only before the first item; usage() gets every item once the stream ends.
+        """
+        for n in range(1, MAX_ATTEMPTS + 1):
+            grant = await self.acquire_async(model, tokens, level)
+            items = []
+            try:
+                async for item in open_stream():
+                    items.append(item)
+                    yield item
+            except Exception as e:
+                if not items and self._retry(model, e, n):
+                    continue
+                raise
+            self.settle(grant, usage(items) if usage else None)
+            return
+
+    # ---- stats ----
+    def _model_stats(self, model: str) -> dict:
+        entry = self._stats.get(model)
+        if entry is None:
+            entry = self._stats[model] = {
+                "granted": 0, "coalesced": 0, "throttled": 0, "tokens_reserved": 0, "tokens_used": 0,
+                "wait_total_s": {name: 0.0 for name in LEVELS.values()},
+                "wait_max_s": {name: 0.0 for name in LEVELS.values()},
+                "granted_by_priority": {name: 0 for name in LEVELS.values()},
+                "wait_histogram": [0] * (len(WAIT_BUCKETS) + 1),
+            }
+        return entry
+
+    def _record(self, ticket: _Ticket, waited: float) -> None:
+        entry = self._model_stats(ticket.model)
+        name = LEVELS.get(ticket.level, str(ticket.level))
+        entry["granted"] += 1
+        entry["tokens_reserved"] += ticket.tokens
+        entry["granted_by_priority"][name] = entry["granted_by_priority"].get(name, 0) + 1
+        entry["wait_total_s"][name] = entry["wait_total_s"].get(name, 0.0) + waited
+        entry["wait_max_s"][name] = max(entry["wait_max_s"].get(name, 0.0), waited)
+        entry["wait_histogram"][next((i for i, b in enumerate(WAIT_BUCKETS) if waited <= b), len(WAIT_BUCKETS))] += 1
+
+    def _count(self, model: str, field: str) -> None:
+        with self._cond:
+            self._model_stats(model)[field] += 1
+
+    def stats(self) -> dict:
+        """Per model: queue depth by priority, grants, mean/max wait by priority, coalesced and throttled calls."""
+        labels = [f"<={b}" for b in WAIT_BUCKETS] + [f">{WAIT_BUCKETS[-1]}"]
+        with self._cond:
+            report = {}
+            for model, entry in self._stats.items():
+                depth = {name: 0 for name in LEVELS.values()}
+                for ticket in self._queues.get(model, []):
+                    depth[LEVELS.get(ticket.level, str(ticket.level))] += 1
+                requests, tokens = self._buckets[model]
+                report[model] = {
+                    **{k: entry[k] for k in ("granted", "coalesced", "throttled", "tokens_reserved", "tokens_used")},
+                    "queued": depth,
+                    "granted_by_priority": dict(entry["granted_by_priority"]),
+                    "wait_mean_s": {name: round(total / entry["granted_by_priority"][name], 3)
+                                    if entry["granted_by_priority"].get(name) else 0.0
+                                    for name, total in entry["wait_total_s"].items()},
+                    "wait_max_s": {name: round(v, 3) for name, v in entry["wait_max_s"].items()},
+                    "wait_histogram": dict(zip(labels, entry["wait_histogram"])),
+                    "requests_available": round(requests.level, 2),
+                    "tokens_available": round(tokens.level),
+                }
+            return {"rpm": self.rpm, "tpm": self.tpm, "models": report}
+
+
+def get_scheduler() -> LlmScheduler:
+    """The process-wide scheduler, created on first use from LLM_RPM / LLM_TPM."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LlmScheduler()
+        return _scheduler
+
+
+def stats() -> dict:
+    return get_scheduler().stats()
+
+
+def request_key(model: str, payload: str) -> str:
+    return hashlib.sha256(f"{model}\n{payload}".encode("utf-8")).hexdigest()
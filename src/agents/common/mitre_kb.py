@@ -0,0 +1,449 @@
+"""
+Offline MITRE knowledge base (ATT&CK, CAPEC, CWE).
+
+Parses the ATT&CK Enterprise STIX bundle, the CAPEC XML catalog and the CWE
+XML catalog once into a single pickled index, so agents can resolve IDs,
+tactic -> technique maps and CWE -> CAPEC -> technique cross-references
+locally instead of through web search or model recall.
+
+Usage:
+    python -m common.mitre_kb build --attack enterprise-attack.json --capec capec_latest.xml --cwe cwec_v4.14.xml
+    python -m common.mitre_kb lookup T1059 CAPEC-66 CWE-89
+    python -m common.mitre_kb search "sql injection"
+"""
+
+import argparse
+import gc
+import json
+import os
+import pickle
+import re
+import time
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from google.adk.tools.tool_context import ToolContext
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional, json is fine for a one-off build
+    orjson = None
+
+DEFAULT_KB_PATH = os.path.join(os.path.expanduser("~"), ".cache", "agentic_ai", "mitre_kb.pickle")
+KB_VERSION = 1
+DESCRIPTION_LIMIT = 1200
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-.][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by can could for from has have in into is it its may of on or such that the "
+    "their this to use used uses using via was were when which while with within without".split()
+)
+
+
+def kb_path() -> str:
+    return os.environ.get("MITRE_KB_PATH", DEFAULT_KB_PATH)
+
+
+def normalize_id(value: str) -> str:
+    """'t1059' -> 'T1059', '89' is ambiguous and left as-is, 'capec 66' -> 'CAPEC-66'."""
+    value = value.strip().upper().replace(" ", "-").replace("_", "-")
+    return re.sub(r"^(CAPEC|CWE)-?(\d+)$", r"\1-\2", value)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+def _clip(text: Optional[str]) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= DESCRIPTION_LIMIT else text[:DESCRIPTION_LIMIT].rsplit(" ", 1)[0] + " ..."
+
+
+# -------------------- Parsers --------------------
+def parse_attack(path: str) -> dict:
+    """Parse an ATT&CK STIX 2.x bundle into techniques, tactics (in matrix order) and mitigations."""
+    with open(path, "rb") as f:
+        bundle = orjson.loads(f.read()) if orjson else json.load(f)
+
+    techniques, tactics, mitigations = {}, {}, {}
+    stix_to_id = {}
+    tactic_order: List[str] = []
+    for obj in bundle.get("objects", []):
+        if obj.get("revoked") or obj.get("x_mitre_deprecated"):
+            continue
+        refs = obj.get("external_references", [])
+        ext_id = next((r.get("external_id") for r in refs if r.get("source_name") == "mitre-attack"), None)
+        url = next((r.get("url") for r in refs if r.get("source_name") == "mitre-attack"), None)
+        kind = obj.get("type")
+        if kind == "attack-pattern" and ext_id:
+            techniques[ext_id] = {
+                "id": ext_id,
+                "type": "technique",
+                "name": obj.get("name", ""),
+                "description": _clip(obj.get("description")),
+                "tactics": [
+                    p["phase_name"] for p in obj.get("kill_chain_phases", [])
+                    if p.get("kill_chain_name") == "mitre-attack"
+                ],
+                "platforms": obj.get("x_mitre_platforms", []),
+                "is_subtechnique": bool(obj.get("x_mitre_is_subtechnique")),
+                "capecs": [r["external_id"] for r in refs if r.get("source_name") == "capec" and r.get("external_id")],
+                "mitigations": [],
+                "url": url,
+            }
+            stix_to_id[obj["id"]] = ext_id
+        elif kind == "x-mitre-tactic" and ext_id:
+            shortname = obj.get("x_mitre_shortname", "")
+            tactics[shortname] = {
+                "id": ext_id,
+                "type": "tactic",
+                "shortname": shortname,
+                "name": obj.get("name", ""),
+                "description": _clip(obj.get("description")),
+                "url": url,
+            }
+            stix_to_id[obj["id"]] = shortname
+        elif kind == "course-of-action" and ext_id and ext_id.startswith("M"):
+            mitigations[ext_id] = {
+                "id": ext_id,
+                "type": "mitigation",
+                "name": obj.get("name", ""),
+                "description": _clip(obj.get("description")),
+                "url": url,
+            }
+            stix_to_id[obj["id"]] = ext_id
+        elif kind == "x-mitre-matrix" and not tactic_order:
+            tactic_order = obj.get("tactic_refs", [])
+
+    for obj in bundle.get("objects", []):
+        if obj.get("type") == "relationship" and obj.get("relationship_type") == "mitigates" and not obj.get("revoked"):
+            source, target = stix_to_id.get(obj.get("source_ref")), stix_to_id.get(obj.get("target_ref"))
+            if source in mitigations and target in techniques:
+                techniques[target]["mitigations"].append(source)
+
+    ordered = [stix_to_id[ref] for ref in tactic_order if ref in stix_to_id]
+    ordered += sorted(t for t in tactics if t not in ordered)
+    for n, shortname in enumerate(ordered):
+        tactics[shortname]["order"] = n
+    return {"techniques": techniques, "tactics": tactics, "tactic_order": ordered, "mitigations": mitigations}
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _text(elem: Optional[ET.Element]) -> str:
+    return " ".join("".join(elem.itertext()).split()) if elem is not None else ""
+
+
+def _child(elem: ET.Element, name: str) -> Optional[ET.Element]:
+    for c in elem:
+        if _local(c.tag) == name:
+            return c
+    return None
+
+
+def _children(elem: ET.Element, container: str, name: str) -> Iterable[ET.Element]:
+    parent = _child(elem, container)
+    return [c for c in parent if _local(c.tag) == name] if parent is not None else []
+
+
+def _iter_elements(path: str, name: str) -> Iterable[ET.Element]:
+    # iterparse keeps memory flat on the multi-MB catalogs; elements are cleared once handled.
+    for _, elem in ET.iterparse(path, events=("end",)):
+        if _local(elem.tag) == name:
+            yield elem
+            elem.clear()
+
+
+def parse_capec(path: str) -> Dict[str, dict]:
+    capecs = {}
+    for elem in _iter_elements(path, "Attack_Pattern"):
+        if elem.get("Status") == "Deprecated":
+            continue
+        capec_id = f"CAPEC-{elem.get('ID')}"
+        techniques = []
+        for mapping in _children(elem, "Taxonomy_Mappings", "Taxonomy_Mapping"):
+            if mapping.get("Taxonomy_Name") == "ATTACK":
+                entry = _text(_child(mapping, "Entry_ID"))
+                if entry:
+                    techniques.append(entry if entry.startswith("T") else f"T{entry}")
+        capecs[capec_id] = {
+            "id": capec_id,
+            "type": "capec",
+            "name": elem.get("Name", ""),
+            "description": _clip(_text(_child(elem, "Description"))),
+            "severity": _text(_child(elem, "Typical_Severity")),
+            "likelihood": _text(_child(elem, "Likelihood_Of_Attack")),
+            "cwes": [f"CWE-{w.get('CWE_ID')}" for w in _children(elem, "Related_Weaknesses", "Related_Weakness")],
+            "techniques": techniques,
+            "url": f"https://capec.mitre.org/data/definitions/{elem.get('ID')}.html",
+        }
+    return capecs
+
+
+def parse_cwe(path: str) -> Dict[str, dict]:
+    cwes = {}
+    for elem in _iter_elements(path, "Weakness"):
+        if elem.get("Status") == "Deprecated":
+            continue
+        cwe_id = f"CWE-{elem.get('ID')}"
+        cwes[cwe_id] = {
+            "id": cwe_id,
+            "type": "cwe",
+            "name": elem.get("Name", ""),
+            "description": _clip(_text(_child(elem, "Description"))),
+            "likelihood": _text(_child(elem, "Likelihood_Of_Exploit")),
+            "capecs": [f"CAPEC-{c.get('CAPEC_ID')}" for c in _children(elem, "Related_Attack_Patterns", "Related_Attack_Pattern")],
+            "url": f"https://cwe.mitre.org/data/definitions/{elem.get('ID')}.html",
+        }
+    return cwes
+
+
+# -------------------- Build --------------------
+def build(attack_path: str, capec_path: Optional[str], cwe_path: Optional[str], out_path: Optional[str] = None) -> dict:
+    """Parse the MITRE sources, cross-link them and write the pickled index."""
+    attack = parse_attack(attack_path)
+    capecs = parse_capec(capec_path) if capec_path else {}
+    cwes = parse_cwe(cwe_path) if cwe_path else {}
+    techniques = attack["techniques"]
+
+    # CWE <-> CAPEC links are listed on both sides; CAPEC <-> technique links too.
+    for capec_id, capec in capecs.items():
+        for cwe_id in capec["cwes"]:
+            if cwe_id in cwes and capec_id not in cwes[cwe_id]["capecs"]:
+                cwes[cwe_id]["capecs"].append(capec_id)
+        for tech_id in capec["techniques"]:
+            if tech_id in techniques and capec_id not in techniques[tech_id]["capecs"]:
+                techniques[tech_id]["capecs"].append(capec_id)
+    for tech_id, tech in techniques.items():
+        for capec_id in tech["capecs"]:
+            if capec_id in capecs and tech_id not in capecs[capec_id]["techniques"]:
+                capecs[capec_id]["techniques"].append(tech_id)
+    for cwe_id, cwe in cwes.items():
+        for capec_id in cwe["capecs"]:
+            if capec_id in capecs and cwe_id not in capecs[capec_id]["cwes"]:
+                capecs[capec_id]["cwes"].append(cwe_id)
+
+    tactic_techniques = defaultdict(list)
+    for tech_id in sorted(techniques):
+        for tactic in techniques[tech_id]["tactics"]:
+            tactic_techniques[tactic].append(tech_id)
+
+    entries = {}
+    entries.update(techniques)
+    entries.update(attack["mitigations"])
+    entries.update({t["id"]: t for t in attack["tactics"].values()})
+    entries.update(capecs)
+    entries.update(cwes)
+
+    # Inverted keyword index: names count three times as much as descriptions.
+    keywords = defaultdict(dict)
+    for entry_id, entry in entries.items():
+        for token in tokenize(entry.get("description", "")):
+            keywords[token][entry_id] = 1
+        for token in tokenize(entry.get("name", "")):
+            keywords[token][entry_id] = 3
+    # Postings are packed into one "ID:weight ..." string per token; hundreds of thousands of
+    # small tuples would dominate unpickling time, and a search only unpacks a few tokens.
+    keywords = {token: " ".join(f"{i}:{w}" for i, w in postings.items()) for token, postings in keywords.items()}
+
+    kb = {
+        "version": KB_VERSION,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "entries": entries,
+        "tactics": attack["tactics"],
+        "tactic_order": attack["tactic_order"],
+        "tactic_techniques": dict(tactic_techniques),
+        "keywords": keywords,
+    }
+    out_path = out_path or kb_path()
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    tmp = f"{out_path}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(kb, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, out_path)
+    return kb
+
+
+# -------------------- Query --------------------
+class MitreKB:
+    def __init__(self, data: dict):
+        if data.get("version") != KB_VERSION:
+            raise ValueError("MITRE KB was built by an incompatible version; rebuild it")
+        self.entries: Dict[str, dict] = data["entries"]
+        self.tactics: Dict[str, dict] = data["tactics"]
+        self.tactic_order: List[str] = data["tactic_order"]
+        self.tactic_techniques: Dict[str, List[str]] = data["tactic_techniques"]
+        self.keywords: Dict[str, str] = data["keywords"]
+        self._tactic_by_id = {t["id"]: s for s, t in self.tactics.items()}
+        self._tactic_by_name = {t["name"].lower(): s for s, t in self.tactics.items()}
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "MitreKB":
+        # The index is one large acyclic object graph; pausing the cyclic GC while it is
+        # rebuilt roughly halves load time.
+        gc.disable()
+        try:
+            with open(path or kb_path(), "rb") as f:
+                return cls(pickle.load(f))
+        finally:
+            gc.enable()
+
+    def get(self, entry_id: str) -> Optional[dict]:
+        return self.entries.get(normalize_id(entry_id))
+
+    def tactic(self, value: str) -> Optional[str]:
+        """Resolve a tactic shortname, display name or TA ID to its shortname."""
+        value = value.strip()
+        if value in self.tactics:
+            return value
+        return self._tactic_by_id.get(value.upper()) or self._tactic_by_name.get(value.lower()) \
+            or self._tactic_by_name.get(value.lower().replace("-", " "))
+
+    def techniques_for_tactic(self, tactic: str) -> List[str]:
+        shortname = self.tactic(tactic)
+        return self.tactic_techniques.get(shortname, []) if shortname else []
+
+    def cwe_chain(self, cwe_id: str) -> dict:
+        """CWE -> related CAPECs -> ATT&CK techniques."""
+        cwe = self.get(cwe_id)
+        if cwe is None:
+            return {}
+        capecs = {}
+        for capec_id in cwe["capecs"]:
+            capec = self.entries.get(capec_id)
+            if capec:
+                capecs[capec_id] = {
+                    "name": capec["name"],
+                    "techniques": {t: self.entries[t]["name"] for t in capec["techniques"] if t in self.entries},
+                }
+        return {"cwe": cwe["id"], "name": cwe["name"], "capecs": capecs}
+
+    def search(self, query: str, limit: int = 10, kind: Optional[str] = None) -> List[dict]:
+        scores: Dict[str, int] = defaultdict(int)
+        for token in set(tokenize(query)):
+            for posting in self.keywords.get(token, "").split():
+                entry_id, weight = posting.rsplit(":", 1)
+                scores[entry_id] += int(weight)
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))
+        results = []
+        for entry_id, score in ranked:
+            entry = self.entries[entry_id]
+            if kind and entry["type"] != kind:
+                continue
+            results.append({"id": entry_id, "type": entry["type"], "name": entry["name"], "score": score})
+            if len(results) >= limit:
+                break
+        return results
+
+
+_kb: Optional[MitreKB] = None
+
+
+def get_kb() -> MitreKB:
+    """Return the process-wide knowledge base, loading the pickle on first use."""
+    global _kb
+    if _kb is None:
+        _kb = MitreKB.load()
+    return _kb
+
+
+def _unavailable(e: Exception) -> dict:
+    return {
+        "status": "error",
+        "message": f"Local MITRE knowledge base unavailable ({e}). Build it with `python -m common.mitre_kb build ...`.",
+    }
+
+
+# -------------------- Agent tools --------------------
+def mitre_lookup(ids: list[str], tool_context: ToolContext) -> dict:
+    """Look up MITRE ATT&CK techniques (T1059, T1059.001), tactics (TA0002), mitigations (M1050), CAPEC (CAPEC-66) and CWE (CWE-89) entries by ID in the local MITRE knowledge base."""
+    print(f"--- Tool: mitre_lookup called for {ids} ---")
+    try:
+        kb = get_kb()
+    except (OSError, ValueError) as e:
+        return _unavailable(e)
+    records, missing = {}, []
+    for entry_id in ids:
+        entry = kb.get(entry_id)
+        if entry is None:
+            missing.append(entry_id)
+        else:
+            records[entry["id"]] = entry
+    return {"status": "success", "source": "MITRE (local KB)", "records": records, "missing": missing}
+
+
+def mitre_search(query: str, tool_context: ToolContext) -> dict:
+    """Keyword search over MITRE ATT&CK techniques, mitigations, CAPEC and CWE names and descriptions; returns the top 10 matching IDs."""
+    print(f"--- Tool: mitre_search called for query: {query} ---")
+    try:
+        kb = get_kb()
+    except (OSError, ValueError) as e:
+        return _unavailable(e)
+    return {"status": "success", "query": query, "results": kb.search(query)}
+
+
+def mitre_techniques_for_tactic(tactic: str, tool_context: ToolContext) -> dict:
+    """List the ATT&CK technique IDs and names for a tactic given by name (Initial Access), shortname (initial-access) or ID (TA0001)."""
+    print(f"--- Tool: mitre_techniques_for_tactic called for tactic: {tactic} ---")
+    try:
+        kb = get_kb()
+    except (OSError, ValueError) as e:
+        return _unavailable(e)
+    shortname = kb.tactic(tactic)
+    if shortname is None:
+        return {"status": "error", "message": f"Unknown tactic: {tactic}", "tactics": kb.tactic_order}
+    techniques = {t: kb.entries[t]["name"] for t in kb.techniques_for_tactic(shortname)}
+    return {"status": "success", "tactic": kb.tactics[shortname], "techniques": techniques}
+
+
+def mitre_cwe_chain(cwe_id: str, tool_context: ToolContext) -> dict:
+    """Follow a CWE to its related CAPEC attack patterns and the ATT&CK techniques those patterns map to."""
+    print(f"--- Tool: mitre_cwe_chain called for {cwe_id} ---")
+    try:
+        kb = get_kb()
+    except (OSError, ValueError) as e:
+        return _unavailable(e)
+    chain = kb.cwe_chain(cwe_id)
+    if not chain:
+        return {"status": "error", "message": f"{cwe_id} not found in the local MITRE knowledge base"}
+    return {"status": "success", "chain": chain}
+
+
+# -------------------- CLI --------------------
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build and query the local MITRE ATT&CK/CAPEC/CWE knowledge base.")
+    parser.add_argument("--kb", default=None, help=f"index file (default: $MITRE_KB_PATH or {DEFAULT_KB_PATH})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_parser = sub.add_parser("build", help="parse the MITRE sources into the index")
+    build_parser.add_argument("--attack", required=True, help="ATT&CK Enterprise STIX JSON bundle")
+    build_parser.add_argument("--capec", help="CAPEC XML catalog")
+    build_parser.add_argument("--cwe", help="CWE XML catalog")
+    sub.add_parser("lookup", help="print entries by ID").add_argument("ids", nargs="+")
+    sub.add_parser("search", help="keyword search").add_argument("query")
+    args = parser.parse_args(argv)
+    path = args.kb or kb_path()
+
+    start = time.perf_counter()
+    if args.command == "build":
+        kb = build(args.attack, args.capec, args.cwe, path)
+        print(f"Indexed {len(kb['entries'])} entries and {len(kb['keywords'])} keywords into {path}")
+        print(f"Built in {time.perf_counter() - start:.2f}s")
+        return
+
+    kb = MitreKB.load(path)
+    print(f"(loaded in {(time.perf_counter() - start) * 1000:.1f} ms)")
+    t0 = time.perf_counter()
+    if args.command == "lookup":
+        for entry_id in args.ids:
+            print(json.dumps(kb.get(entry_id), indent=2) if kb.get(entry_id) else f"{entry_id}: not found")
+    else:
+        for hit in kb.search(args.query):
+            print(f"{hit['id']:<12} {hit['type']:<10} {hit['score']:>3}  {hit['name']}")
+    print(f"(query took {(time.perf_counter() - t0) * 1e6:.1f} us)")
+
+
+if __name__ == "__main__":
+    main()
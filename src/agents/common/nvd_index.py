@@ -0,0 +1,457 @@
+"""
+Offline NVD/CVE index.
+
+Streams NVD JSON feeds (legacy 1.1 `CVE_Items` feeds or API 2.0
+`vulnerabilities` dumps, optionally gzipped) into a compact, memory-mapped
+columnar store so agents can look CVE metadata up locally instead of
+re-discovering it with google_search on every call.
+
+Store layout (one directory):
+- index.bin       header + sorted fixed-width CVE IDs + per-column (offset, length) pointers
+- <column>.dat    append-only UTF-8 values of a single column
+- meta.json       feeds ingested and record counts
+
+Usage:
+    python -m common.nvd_index ingest nvdcve-1.1-2023.json.gz nvdcve-1.1-2024.json.gz
+    python -m common.nvd_index update nvdcve-1.1-modified.json.gz
+    python -m common.nvd_index lookup CVE-2021-44228
+    python -m common.nvd_index compact
+"""
+
+import argparse
+import gzip
+import json
+import mmap
+import os
+import shutil
+import struct
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from google.adk.tools.tool_context import ToolContext
+
+try:
+    import ijson
+except ImportError:  # pragma: no cover - optional, falls back to json.load
+    ijson = None
+
+DEFAULT_INDEX_DIR = os.path.join(os.path.expanduser("~"), ".cache", "agentic_ai", "nvd")
+
+COLUMNS = (
+    "description",
+    "published",
+    "last_modified",
+    "cvss_vector",
+    "cvss_score",
+    "severity",
+    "cwes",
+    "cpes",
+)
+# Columns holding lists are stored newline-joined.
+LIST_COLUMNS = ("cwes", "cpes")
+
+MAGIC = b"NVDIDX01"
+KEY_WIDTH = 24
+HEADER = struct.Struct("<8sII")  # magic, record count, column count
+POINTER = struct.Struct("<QI")  # offset into <column>.dat, length in bytes
+ROW_WIDTH = POINTER.size * len(COLUMNS)
+
+
+def index_dir() -> str:
+    return os.environ.get("NVD_INDEX_DIR", DEFAULT_INDEX_DIR)
+
+
+def _normalize_id(cve_id: str) -> str:
+    return cve_id.strip().upper()
+
+
+def _encode_key(cve_id: str) -> bytes:
+    key = _normalize_id(cve_id).encode("ascii", "ignore")
+    if len(key) > KEY_WIDTH:
+        raise ValueError(f"CVE ID too long for index: {cve_id}")
+    return key.ljust(KEY_WIDTH, b"\0")
+
+
+# -------------------- Feed parsing --------------------
+def _open_feed(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def _detect_prefix(path: str) -> str:
+    """Return the ijson prefix of the record array for a feed file."""
+    with _open_feed(path) as f:
+        head = f.read(65536)
+    if b'"vulnerabilities"' in head:
+        return "vulnerabilities.item"
+    if b'"CVE_Items"' in head:
+        return "CVE_Items.item"
+    raise ValueError(f"{path} does not look like an NVD JSON feed")
+
+
+def _iter_raw_items(path: str) -> Iterator[dict]:
+    prefix = _detect_prefix(path)
+    with _open_feed(path) as f:
+        if ijson is not None:
+            yield from ijson.items(f, prefix, use_float=True)
+        else:
+            # Without ijson the whole feed has to be loaded; fine for the modified feed,
+            # but install ijson before ingesting the yearly feeds.
+            doc = json.load(f)
+            yield from doc[prefix.split(".")[0]]
+
+
+def _english(descriptions: Iterable[dict]) -> str:
+    for d in descriptions or []:
+        if d.get("lang") == "en":
+            return d.get("value", "")
+    return ""
+
+
+def _dedupe(values: Iterable[str]) -> List[str]:
+    seen = {}
+    for v in values:
+        if v and v not in seen:
+            seen[v] = None
+    return list(seen)
+
+
+def _cpes_v11(nodes: Iterable[dict]) -> Iterator[str]:
+    for node in nodes or []:
+        for match in node.get("cpe_match", []):
+            if match.get("vulnerable", True):
+                yield match.get("cpe23Uri", "")
+        yield from _cpes_v11(node.get("children", []))
+
+
+def _record_from_v11(item: dict) -> Tuple[str, dict]:
+    cve = item.get("cve", {})
+    cve_id = cve.get("CVE_data_meta", {}).get("ID", "")
+    impact = item.get("impact", {})
+    v3 = impact.get("baseMetricV3", {}).get("cvssV3", {})
+    v2 = impact.get("baseMetricV2", {})
+    cwes = [
+        d.get("value", "")
+        for pt in cve.get("problemtype", {}).get("problemtype_data", [])
+        for d in pt.get("description", [])
+    ]
+    return cve_id, {
+        "description": _english(cve.get("description", {}).get("description_data", [])),
+        "published": item.get("publishedDate", ""),
+        "last_modified": item.get("lastModifiedDate", ""),
+        "cvss_vector": v3.get("vectorString") or v2.get("cvssV2", {}).get("vectorString", ""),
+        "cvss_score": str(v3.get("baseScore", v2.get("cvssV2", {}).get("baseScore", ""))),
+        "severity": v3.get("baseSeverity") or v2.get("severity", ""),
+        "cwes": _dedupe(c for c in cwes if c.startswith("CWE-")),
+        "cpes": _dedupe(_cpes_v11(item.get("configurations", {}).get("nodes", []))),
+    }
+
+
+def _record_from_v2(item: dict) -> Tuple[str, dict]:
+    cve = item.get("cve", item)
+    metrics = cve.get("metrics", {})
+    cvss = {}
+    for key in ("cvssMetricV40", "cvssMetricV31", "cvssMetricV30", "cvssMetricV2"):
+        if metrics.get(key):
+            # Prefer the NVD ("Primary") entry over CNA-supplied scores.
+            entries = metrics[key]
+            entry = next((e for e in entries if e.get("type") == "Primary"), entries[0])
+            cvss = dict(entry.get("cvssData", {}))
+            cvss.setdefault("baseSeverity", entry.get("baseSeverity", ""))
+            break
+    cwes = [
+        d.get("value", "")
+        for w in cve.get("weaknesses", [])
+        for d in w.get("description", [])
+    ]
+    cpes = [
+        m.get("criteria", "")
+        for conf in cve.get("configurations", [])
+        for node in conf.get("nodes", [])
+        for m in node.get("cpeMatch", [])
+        if m.get("vulnerable", True)
+    ]
+    return cve.get("id", ""), {
+        "description": _english(cve.get("descriptions", [])),
+        "published": cve.get("published", ""),
+        "last_modified": cve.get("lastModified", ""),
+        "cvss_vector": cvss.get("vectorString", ""),
+        "cvss_score": str(cvss.get("baseScore", "")),
+        "severity": cvss.get("baseSeverity", ""),
+        "cwes": _dedupe(c for c in cwes if c.startswith("CWE-")),
+        "cpes": _dedupe(cpes),
+    }
+
+
+def iter_feed_records(path: str) -> Iterator[Tuple[str, dict]]:
+    """Yield (cve_id, record) pairs from an NVD feed without loading it into memory."""
+    for item in _iter_raw_items(path):
+        if "CVE_data_meta" in item.get("cve", {}):
+            cve_id, record = _record_from_v11(item)
+        else:
+            cve_id, record = _record_from_v2(item)
+        if cve_id:
+            yield cve_id, record
+
+
+# -------------------- Writer --------------------
+class NvdIndexWriter:
+    """Appends feed records to the column files and rewrites index.bin on close."""
+
+    def __init__(self, path: str, fresh: bool = False):
+        # A fresh build goes to a sibling directory that is swapped in on close, so
+        # processes still reading the old (mmap'd) column files are never truncated.
+        self.target = path
+        self.fresh = fresh
+        self.path = f"{path}.building" if fresh else path
+        if fresh:
+            shutil.rmtree(self.path, ignore_errors=True)
+        os.makedirs(self.path, exist_ok=True)
+        mode = "wb" if fresh else "ab"
+        self._files = {col: open(os.path.join(self.path, f"{col}.dat"), mode) for col in COLUMNS}
+        self._offsets = {col: f.seek(0, os.SEEK_END) for col, f in self._files.items()}
+        self.rows: Dict[bytes, Tuple[int, ...]] = {} if fresh else _read_rows(path)
+        self.meta = {"feeds": {}} if fresh else _read_meta(path)
+        self.added = 0
+
+    def add(self, cve_id: str, record: dict) -> None:
+        pointers = []
+        for col in COLUMNS:
+            value = record.get(col, "")
+            if col in LIST_COLUMNS:
+                value = "\n".join(value)
+            data = value.encode("utf-8")
+            self._files[col].write(data)
+            pointers.extend((self._offsets[col], len(data)))
+            self._offsets[col] += len(data)
+        self.rows[_encode_key(cve_id)] = tuple(pointers)
+        self.added += 1
+
+    def add_feed(self, feed_path: str) -> int:
+        count = 0
+        for cve_id, record in iter_feed_records(feed_path):
+            self.add(cve_id, record)
+            count += 1
+        self.meta["feeds"][os.path.basename(feed_path)] = {
+            "records": count,
+            "ingested_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        return count
+
+    def close(self) -> None:
+        for f in self._files.values():
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+        keys = sorted(self.rows)
+        tmp = os.path.join(self.path, "index.bin.tmp")
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(keys), len(COLUMNS)))
+            f.write(b"".join(keys))
+            for key in keys:
+                f.write(struct.pack(f"<{'QI' * len(COLUMNS)}", *self.rows[key]))
+        # A single rename keeps readers consistent: an open mmap keeps the old index alive.
+        os.replace(tmp, os.path.join(self.path, "index.bin"))
+        self.meta["records"] = len(keys)
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(self.meta, f, indent=2)
+        if self.fresh:
+            old = f"{self.target}.old"
+            shutil.rmtree(old, ignore_errors=True)
+            if os.path.exists(self.target):
+                os.replace(self.target, old)
+            os.replace(self.path, self.target)
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def _read_meta(path: str) -> dict:
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"feeds": {}}
+
+
+def _read_rows(path: str) -> Dict[bytes, Tuple[int, ...]]:
+    if not os.path.exists(os.path.join(path, "index.bin")):
+        return {}
+    index = NvdIndex(path)
+    try:
+        row = struct.Struct(f"<{'QI' * len(COLUMNS)}")
+        return {
+            index._key(i): row.unpack_from(index._index, index._rows_base + i * ROW_WIDTH)
+            for i in range(index.count)
+        }
+    finally:
+        index.close()
+
+
+def ingest(feed_paths: Iterable[str], path: Optional[str] = None) -> int:
+    """Build a fresh index from full (yearly) feeds."""
+    writer = NvdIndexWriter(path or index_dir(), fresh=True)
+    for feed in feed_paths:
+        print(f"Ingesting {feed} ...")
+        writer.add_feed(feed)
+    writer.close()
+    return writer.added
+
+
+def update(feed_paths: Iterable[str], path: Optional[str] = None) -> int:
+    """Apply the `modified`/`recent` feeds on top of an existing index."""
+    writer = NvdIndexWriter(path or index_dir())
+    for feed in feed_paths:
+        print(f"Applying {feed} ...")
+        writer.add_feed(feed)
+    writer.close()
+    return writer.added
+
+
+def compact(path: Optional[str] = None) -> int:
+    """Rewrite the column files without the values superseded by updates."""
+    path = path or index_dir()
+    index = NvdIndex(path)
+    records = [(cve_id, index.get(cve_id)) for cve_id in index.ids()]
+    index.close()
+    meta = _read_meta(path)
+    writer = NvdIndexWriter(path, fresh=True)
+    writer.meta = meta
+    for cve_id, record in records:
+        writer.add(cve_id, record)
+    writer.close()
+    return len(records)
+
+
+# -------------------- Reader --------------------
+class NvdIndex:
+    """Read-only view of the index; lookups are a binary search over mmap'd keys."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or index_dir()
+        index_path = os.path.join(self.path, "index.bin")
+        with open(index_path, "rb") as f:
+            self._stat = os.fstat(f.fileno())
+            self._index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, ncols = HEADER.unpack_from(self._index, 0)
+        if magic != MAGIC or ncols != len(COLUMNS):
+            raise ValueError(f"{index_path} is not a compatible NVD index")
+        self._keys_base = HEADER.size
+        self._rows_base = self._keys_base + self.count * KEY_WIDTH
+        self._columns = {}
+        for col in COLUMNS:
+            with open(os.path.join(self.path, f"{col}.dat"), "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                self._columns[col] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def _key(self, i: int) -> bytes:
+        start = self._keys_base + i * KEY_WIDTH
+        return self._index[start:start + KEY_WIDTH]
+
+    def _find(self, key: bytes) -> int:
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self.count and self._key(lo) == key else -1
+
+    def is_stale(self) -> bool:
+        try:
+            st = os.stat(os.path.join(self.path, "index.bin"))
+        except FileNotFoundError:
+            return True
+        return (st.st_ino, st.st_mtime_ns) != (self._stat.st_ino, self._stat.st_mtime_ns)
+
+    def get(self, cve_id: str) -> Optional[dict]:
+        try:
+            key = _encode_key(cve_id)
+        except ValueError:  # longer than any key in the index (IDs the model made up), so not in it
+            return None
+        row = self._find(key)
+        if row < 0:
+            return None
+        base = self._rows_base + row * ROW_WIDTH
+        record = {"cve_id": _normalize_id(cve_id)}
+        for n, col in enumerate(COLUMNS):
+            offset, length = POINTER.unpack_from(self._index, base + n * POINTER.size)
+            value = self._columns[col][offset:offset + length].decode("utf-8")
+            record[col] = [v for v in value.split("\n") if v] if col in LIST_COLUMNS else value
+        return record
+
+    def ids(self) -> Iterator[str]:
+        for i in range(self.count):
+            yield self._key(i).rstrip(b"\0").decode("ascii")
+
+    def close(self) -> None:
+        self._index.close()
+        for m in self._columns.values():
+            if isinstance(m, mmap.mmap):
+                m.close()
+
+
+_index: Optional[NvdIndex] = None
+
+
+def get_index() -> NvdIndex:
+    """Return the process-wide index, reopening it after `update` replaced index.bin."""
+    global _index
+    if _index is None or _index.is_stale():
+        _index = NvdIndex()
+    return _index
+
+
+# -------------------- Agent tool --------------------
+def lookup_cve(cve_ids: list[str], tool_context: ToolContext) -> dict:
+    """Look up authoritative NVD metadata (description, CVSS vector/score, severity, CWEs, CPEs, dates) for one or more CVE IDs from the local NVD index."""
+    print(f"--- Tool: lookup_cve called for {cve_ids} ---")
+    try:
+        index = get_index()
+    except (FileNotFoundError, ValueError) as e:
+        return {
+            "status": "error",
+            "message": f"Local NVD index unavailable ({e}). Build it with `python -m common.nvd_index ingest <feeds>`.",
+        }
+
+    records, missing = {}, []
+    for cve_id in cve_ids:
+        record = index.get(cve_id)
+        if record is None:
+            missing.append(cve_id)
+        else:
+            records[record["cve_id"]] = record
+    return {"status": "success", "source": "NVD (local index)", "records": records, "missing": missing}
+
+
+# -------------------- CLI --------------------
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build and query the local NVD CVE index.")
+    parser.add_argument("--index", default=None, help=f"index directory (default: $NVD_INDEX_DIR or {DEFAULT_INDEX_DIR})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("ingest", help="build a fresh index from full feeds").add_argument("feeds", nargs="+")
+    sub.add_parser("update", help="apply modified/recent feeds").add_argument("feeds", nargs="+")
+    sub.add_parser("lookup", help="print records").add_argument("cve_ids", nargs="+")
+    sub.add_parser("compact", help="drop superseded values from the column files")
+    args = parser.parse_args(argv)
+    path = args.index or index_dir()
+
+    start = time.perf_counter()
+    if args.command == "ingest":
+        print(f"Indexed {ingest(args.feeds, path)} records into {path}")
+    elif args.command == "update":
+        print(f"Applied {update(args.feeds, path)} updated records to {path}")
+    elif args.command == "compact":
+        print(f"Compacted {compact(path)} records in {path}")
+    else:
+        index = NvdIndex(path)
+        for cve_id in args.cve_ids:
+            t0 = time.perf_counter()
+            record = index.get(cve_id)
+            print(json.dumps(record, indent=2) if record else f"{cve_id}: not found")
+            print(f"(lookup took {(time.perf_counter() - t0) * 1e6:.1f} us)")
+    print(f"Done in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Local numeric risk model for threat chains.
+
+Scores the chains common.threat_chains enumerates for a path, so the risk
+assessor only has to write the narrative. Inputs, all local:
+
+- CVSS base score of the path's CVEs from the NVD index (common.nvd_index);
+  without one, the CAPEC typical severity stands in.
+- Exploit likelihood from an EPSS scores file (FIRST's daily CSV, optionally
+  gzipped: `cve,epss,percentile`) at $EPSS_PATH; without one, the CAPEC
+  likelihood of attack stands in.
+- Membership in CISA's Known Exploited Vulnerabilities catalog (the JSON
+  feed or its CSV export) at $KEV_PATH. A KEV CVE is exploited in the wild,
+  so its likelihood is raised to at least KEV_LIKELIHOOD.
+- Tactic depth: how far along the ATT&CK matrix a chain reaches (Impact is
+  deeper than Credential Access).
+
+    risk = 10 * (W_CVSS * cvss / 10 + W_EXPLOIT * likelihood + W_DEPTH * depth)
+              * (CONFIDENCE_FLOOR + (1 - CONFIDENCE_FLOOR) * confidence)
+
+where confidence is the mean relevance of the chain's steps to the path.
+The EPSS and KEV files are parsed once and reloaded when they change;
+assessments are memoized per normalized path and input file versions.
+
+    python -m common.risk "CVE-2021-44228 > CWE-502 > CAPEC-248 > T1059"
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from google.adk.tools.tool_context import ToolContext
+
+from common.mitre_kb import MitreKB, get_kb
+from common.threat_chains import cached_chains, kb_unavailable, no_chains, parse_path
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "agentic_ai")
+DEFAULT_EPSS_PATH = os.path.join(CACHE_DIR, "epss_scores-current.csv.gz")
+DEFAULT_KEV_PATH = os.path.join(CACHE_DIR, "known_exploited_vulnerabilities.json")
+
+W_CVSS = 0.4
+W_EXPLOIT = 0.35
+W_DEPTH = 0.25
+CONFIDENCE_FLOOR = 0.6
+KEV_LIKELIHOOD = 0.9
+DEFAULT_CVSS = 5.0
+DEFAULT_LIKELIHOOD = 0.1
+BANDS = ((8.0, "critical"), (6.0, "high"), (4.0, "medium"), (0.0, "low"))
+# Stand-ins when the path has no CVE data: CAPEC Typical_Severity and Likelihood_Of_Attack.
+CAPEC_SEVERITY = {"very high": 9.5, "high": 8.0, "medium": 5.5, "low": 3.0, "very low": 1.5}
+CAPEC_LIKELIHOOD = {"high": 0.5, "medium": 0.2, "low": 0.05}
+MITIGATIONS_LIMIT = 10
+CACHE_SIZE = 256
+
+_tables: Dict[str, Tuple[tuple, dict]] = {}
+_tables_lock = threading.Lock()
+_cache: "OrderedDict[tuple, dict]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def epss_path() -> str:
+    return os.environ.get("EPSS_PATH", DEFAULT_EPSS_PATH)
+
+
+def kev_path() -> str:
+    return os.environ.get("KEV_PATH", DEFAULT_KEV_PATH)
+
+
+def _read_text(path: str) -> str:
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:2] == b"\x1f\x8b":
+        data = gzip.decompress(data)
+    return data.decode("utf-8-sig")
+
+
+def parse_epss(text: str) -> Dict[str, Tuple[float, float]]:
+    """FIRST EPSS CSV (a '#model_version...' comment line, then cve,epss,percentile) -> {cve: (epss, percentile)}."""
+    lines = [line for line in text.splitlines() if line and not line.startswith("#")]
+    scores = {}
+    for row in csv.DictReader(lines):
+        try:
+            scores[row["cve"].strip().upper()] = (float(row["epss"]), float(row.get("percentile") or 0.0))
+        except (KeyError, ValueError, AttributeError):
+            continue
+    return scores
+
+
+def parse_kev(text: str) -> Dict[str, dict]:
+    """CISA KEV catalog, JSON feed or CSV export -> {cve: {date_added, ransomware}}."""
+    if text.lstrip().startswith("{"):
+        rows = json.loads(text).get("vulnerabilities", [])
+    else:
+        rows = list(csv.DictReader(io.StringIO(text)))
+    return {
+        row["cveID"].strip().upper(): {
+            "date_added": row.get("dateAdded", ""),
+            "ransomware": (row.get("knownRansomwareCampaignUse") or "").lower() == "known",
+        }
+        for row in rows if row.get("cveID")
+    }
+
+
+def _table(path: str, parser: Callable[[str], dict]) -> Tuple[tuple, dict]:
+    """(version stamp, parsed table) for a data file, reparsed only when the file changes; missing -> empty."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (), {}
+    stamp = (path, st.st_mtime_ns, st.st_size)
+    with _tables_lock:
+        cached = _tables.get(path)
+        if cached and cached[0] == stamp:
+            return cached
+    table = (stamp, parser(_read_text(path)))
+    with _tables_lock:
+        _tables[path] = table
+    return table
+
+
+def _cvss(cves: List[str]) -> Dict[str, float]:
+    if not cves:
+        return {}
+    from common.nvd_index import get_index
+
+    try:
+        index = get_index()
+    except (FileNotFoundError, ValueError):
+        return {}
+    scores = {}
+    for cve in cves:
+        try:
+            scores[cve] = float((index.get(cve) or {}).get("cvss_score") or "")
+        except ValueError:
+            continue
+    return scores
+
+
+def band(score: float) -> str:
+    return next(label for threshold, label in BANDS if score >= threshold)
+
+
+def path_inputs(kb: MitreKB, threat_path: str) -> dict:
+    """Severity and exploit likelihood of the path itself, with where each number came from."""
+    path = parse_path(threat_path)
+    cvss = _cvss(list(path.cves))
+    _, epss = _table(epss_path(), parse_epss)
+    _, kev = _table(kev_path(), parse_kev)
+    cves = {
+        cve: {
+            "cvss": cvss.get(cve),
+            "epss": epss[cve][0] if cve in epss else None,
+            "epss_percentile": epss[cve][1] if cve in epss else None,
+            "kev": cve in kev,
+            **({"kev_date_added": kev[cve]["date_added"], "ransomware": kev[cve]["ransomware"]} if cve in kev else {}),
+        }
+        for cve in path.cves
+    }
+    capecs = [kb.entries[c] for c in path.capecs if c in kb.entries]
+
+    if cvss:
+        severity, severity_source = max(cvss.values()), "NVD CVSS"
+    else:
+        capec_scores = [CAPEC_SEVERITY[c["severity"].lower()] for c in capecs if c["severity"].lower() in CAPEC_SEVERITY]
+        severity, severity_source = (max(capec_scores), "CAPEC severity") if capec_scores else (DEFAULT_CVSS, "default")
+
+    likelihoods = [v["epss"] for v in cves.values() if v["epss"] is not None]
+    if likelihoods:
+        likelihood, likelihood_source = max(likelihoods), "EPSS"
+    else:
+        capec_likelihoods = [CAPEC_LIKELIHOOD[c["likelihood"].lower()] for c in capecs
+                             if c["likelihood"].lower() in CAPEC_LIKELIHOOD]
+        likelihood, likelihood_source = (max(capec_likelihoods), "CAPEC likelihood") if capec_likelihoods \
+            else (DEFAULT_LIKELIHOOD, "default")
+    in_kev = any(v["kev"] for v in cves.values())
+    if in_kev and likelihood < KEV_LIKELIHOOD:
+        likelihood, likelihood_source = KEV_LIKELIHOOD, "CISA KEV"
+    return {
+        "cves": cves,
+        "cvss": severity,
+        "cvss_source": severity_source,
+        "exploit_likelihood": round(likelihood, 4),
+        "exploit_likelihood_source": likelihood_source,
+        "kev": in_kev,
+    }
+
+
+def score_chain(kb: MitreKB, chain: dict, inputs: dict) -> dict:
+    """Risk score (0-10), band and components for one chain record from threat_chains."""
+    order = kb.tactic_order
+    reached = max(order.index(kb.tactic(s["tactic"])) for s in chain["steps"] if kb.tactic(s["tactic"]) in order)
+    depth = (reached + 1) / len(order)
+    confidence = sum(s["relevance"] for s in chain["steps"]) / len(chain["steps"])
+    base = W_CVSS * inputs["cvss"] / 10 + W_EXPLOIT * inputs["exploit_likelihood"] + W_DEPTH * depth
+    score = round(10 * base * (CONFIDENCE_FLOOR + (1 - CONFIDENCE_FLOOR) * confidence), 2)
+    return {
+        "score": score,
+        "band": band(score),
+        "components": {
+            "cvss": inputs["cvss"],
+            "exploit_likelihood": inputs["exploit_likelihood"],
+            "tactic_depth": round(depth, 3),
+            "confidence": round(confidence, 3),
+        },
+    }
+
+
+def _mitigations(kb: MitreKB, chains: List[dict]) -> List[dict]:
+    """Mitigations that cover the most chain steps first."""
+    covers: Dict[str, List[str]] = {}
+    for chain in chains:
+        for step in chain["steps"]:
+            for m in kb.entries[step["technique"]]["mitigations"]:
+                if step["technique"] not in covers.setdefault(m, []):
+                    covers[m].append(step["technique"])
+    ranked = sorted(covers.items(), key=lambda kv: (-len(kv[1]), kv[0]))[:MITIGATIONS_LIMIT]
+    return [{"id": m, "name": kb.entries[m]["name"] if m in kb.entries else "", "covers": techniques}
+            for m, techniques in ranked]
+
+
+def assess(threat_path: str, kb: MitreKB) -> dict:
+    """Chains for the path (shared with threat_generator) with a risk score each, memoized."""
+    stamps = (_table(epss_path(), parse_epss)[0], _table(kev_path(), parse_kev)[0])
+    key = (parse_path(threat_path).key(), id(kb), stamps)
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is not None:
+            _cache.move_to_end(key)
+            return {**hit, "chains_cached": True, "scores_cached": True}
+
+    chains = cached_chains(threat_path, kb)
+    inputs = path_inputs(kb, threat_path)
+    scored = sorted(
+        ({**chain, "risk": score_chain(kb, chain, inputs)} for chain in chains["chains"]),
+        key=lambda c: -c["risk"]["score"],
+    )
+    overall = scored[0]["risk"]["score"] if scored else 0.0
+    result = {
+        "path": chains["path"],
+        "anchors": chains["anchors"],
+        "inputs": inputs,
+        "overall_risk": {"score": overall, "band": band(overall)},
+        "chains": scored,
+        "mitigations": _mitigations(kb, scored),
+    }
+    with _cache_lock:
+        _cache[key] = result
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return {**result, "chains_cached": chains["cached"], "scores_cached": False}
+
+
+# -------------------- Agent tool --------------------
+def assess_threat_risk(threat_path: str, tool_context: ToolContext) -> dict:
+    """Score the threat chains through a CVE-CWE-CAPEC-TTP-MITIGATION path: CVSS, EPSS exploit likelihood, CISA KEV membership and ATT&CK tactic depth, plus the mitigations covering the most steps."""
+    print(f"--- Tool: assess_threat_risk called for path: {threat_path} ---")
+    from common.blackboard import lookup, publish, state_key
+
+    source = "local risk model (NVD, EPSS, CISA KEV, MITRE ATT&CK)"
+    entry = lookup(tool_context.state, "risk", threat_path)
+    if entry is not None:
+        return {"status": "success", "source": source, **entry["data"], "from_blackboard": True}
+    try:
+        kb = get_kb()
+    except (OSError, ValueError) as e:
+        return kb_unavailable(e)
+    result = assess(threat_path, kb)
+    if not result["anchors"]:
+        return no_chains(result)
+    # The risk entry carries everything the tool returns; chains and mitigations are also published
+    # on their own so threat_generator and incident_response_agent find them without a risk model run.
+    state, agent = tool_context.state, tool_context.agent_name
+    data = {k: v for k, v in result.items() if k not in ("chains_cached", "scores_cached")}
+    publish(state, "risk", threat_path, data, producer=agent)
+    publish(state, "mitigations", threat_path, {"path": data["path"], "mitigations": data["mitigations"]}, producer=agent)
+    if state.get(state_key("threat_chains", threat_path)) is None:
+        chains = [{k: v for k, v in chain.items() if k != "risk"} for chain in data["chains"]]
+        publish(state, "threat_chains", threat_path, {"path": data["path"], "anchors": data["anchors"], "chains": chains},
+                producer=agent)
+    return {"status": "success", "source": source, **result, "from_blackboard": False}
+
+
+# -------------------- CLI --------------------
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Score the threat chains through a CVE-CWE-CAPEC-TTP path.")
+    parser.add_argument("path")
+    args = parser.parse_args(argv)
+    print(json.dumps(assess(args.path, get_kb()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
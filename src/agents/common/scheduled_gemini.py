@@ -0,0 +1,52 @@
+"""
+ADK's Gemini model, sent through the process-wide LLM scheduler.
+
+Importing this module registers ScheduledGemini for ADK's "gemini-*" model
+names, so every agent declared with `model="gemini-2.0-flash"` is rate
+limited, prioritized and coalesced by common.llm_scheduler without changing
+the agent. Each root agent imports it first thing.
+"""
+
+import json
+from typing import AsyncGenerator, List
+
+from google.adk.models import Gemini, LlmRequest, LlmResponse
+from google.adk.models.registry import LLMRegistry
+
+from common.llm_scheduler import CHARS_PER_TOKEN, estimate_tokens, get_scheduler, request_key
+
+
+class ScheduledGemini(Gemini):
+    """ADK's Gemini model with every call sent through the scheduler."""
+
+    async def generate_content_async(self, llm_request: LlmRequest,
+                                     stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        scheduler = get_scheduler()
+        payload = llm_request.model_dump_json(include={"model", "contents", "config"}, exclude_none=True)
+        tokens = estimate_tokens(payload)
+
+        def usage(responses: List[LlmResponse]) -> int:
+            # LlmResponse carries no usage metadata here; count the answer like the prompt.
+            text = "".join(json.dumps(r.content.model_dump(exclude_none=True)) for r in responses if r.content)
+            return len(payload) // CHARS_PER_TOKEN + len(text) // CHARS_PER_TOKEN
+
+        if stream:
+            # Partial responses can't be shared between callers; queued and retried, never coalesced.
+            async for response in scheduler.call_stream(
+                    self.model, lambda: Gemini.generate_content_async(self, llm_request, stream=True),
+                    tokens=tokens, usage=usage):
+                yield response
+            return
+
+        async def send() -> List[LlmResponse]:
+            return [r async for r in Gemini.generate_content_async(self, llm_request, stream=False)]
+
+        responses = await scheduler.call_async(self.model, send, tokens=tokens, key=request_key(self.model, payload),
+                                               usage=usage)
+        for response in responses:
+            # Coalesced callers share the list; each gets its own copies to turn into events
+            yield response.model_copy(deep=True)
+
+
+LLMRegistry.register(ScheduledGemini)
+LLMRegistry.resolve.cache_clear()
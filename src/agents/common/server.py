@@ -0,0 +1,417 @@
+"""
+Multi-worker HTTP server for the root agents.
+
+Serves every root agent in common.sessions.ROOT_AGENTS (manager,
+cve_pipeline, CVSS_Metrics, Neo4j_Information, sequential_pipeline_agent)
+with the request shapes of `adk api_server`, so existing clients work:
+
+    GET  /list-apps
+    POST /apps/{app}/users/{user}/sessions[/{session_id}]   create a session
+    GET  /apps/{app}/users/{user}/sessions/{session_id}     read it back
+    POST /run       {app_name, user_id, session_id, new_message}  -> [events]
+    POST /run_sse   same body -> text/event-stream, one `data:` line per event
+    GET  /health    queue depth, running jobs; 503 while the queue is full
+    GET  /metrics   Prometheus text format
+
+Each run is a job on a bounded queue, served by a pool of JOB_WORKERS
+threads (one per core by default). Agent tools are synchronous and would
+stall an event loop, so every job runs its agent on its own loop in a pool
+thread, and its events are handed back to the request's loop as they come.
+Admission is checked before queueing:
+
+- queue full (JOB_QUEUE_SIZE) -> 429 with Retry-After,
+- the tenant (X-Tenant-ID header, else user_id) already has
+  TENANT_CONCURRENCY jobs queued or running -> 429,
+- the session already has a job -> 409 (two runs on one session would
+  interleave their events). With SESSION_DB_URL the check spans processes:
+  a run holds a lease on its session in the database for its duration
+  (BatchedSessionService.acquire_lease); without it, only this process's
+  runs are seen.
+
+For several processes, run with --processes N and a shared SESSION_DB_URL
+(common.sessions), so any process can continue any session. Set
+AGENT_MODEL_BACKEND=fake to answer with common.fake_llm instead of Gemini
+for offline load tests. The manager's model calls are scheduled ahead of
+the pipelines' (APP_PRIORITY); /metrics includes the LLM scheduler's
+queue depth and waits.
+
+    python -m common.server --port 8000 --processes 4
+    curl -N localhost:8000/run_sse -d '{"app_name": "manager", "user_id": "u", "session_id": "s1",
+        "new_message": {"role": "user", "parts": [{"text": "hi"}]}}'
+"""
+
+import argparse
+import asyncio
+import inspect
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from google.adk.runners import Runner
+from google.genai import types
+from pydantic import BaseModel
+
+from common import llm_scheduler
+from common.sessions import ROOT_AGENTS, BatchedSessionService, make_runner
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS") or os.cpu_count() or 4)
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", "256"))
+TENANT_CONCURRENCY = int(os.environ.get("TENANT_CONCURRENCY", "4"))
+RETRY_AFTER_S = 2
+# Importing ADK and every root agent takes several seconds; uvicorn's default worker health check allows 5.
+WORKER_STARTUP_S = 60
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+DONE = object()
+# Scheduling priority of each app's model calls (common.llm_scheduler); others run at NORMAL.
+APP_PRIORITY = {"manager": llm_scheduler.INTERACTIVE}
+
+
+class AgentRunRequest(BaseModel):
+    app_name: str
+    user_id: str
+    session_id: str
+    new_message: types.Content
+    streaming: bool = False
+
+
+class CreateSessionRequest(BaseModel):
+    state: Optional[Dict[str, Any]] = None
+
+
+class Rejected(Exception):
+    def __init__(self, status: int, reason: str, message: str):
+        super().__init__(message)
+        self.status, self.reason = status, reason
+
+
+# -------------------- Metrics --------------------
+class Metrics:
+    """Counters and latency histograms, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.jobs = Counter()  # (app, outcome)
+        self.rejected = Counter()  # reason
+        self.events = Counter()  # app
+        self.latency = {}  # (name, app) -> [bucket counts..., sum, count]
+
+    def observe(self, name: str, app: str, seconds: float) -> None:
+        with self._lock:
+            row = self.latency.setdefault((name, app), [0] * (len(LATENCY_BUCKETS) + 2))
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    row[i] += 1
+            row[-2] += seconds
+            row[-1] += 1
+
+    def count(self, counter: Counter, key, n: int = 1) -> None:
+        with self._lock:
+            counter[key] += n
+
+    def render(self, gauges: Dict[str, float]) -> str:
+        lines = []
+        with self._lock:
+            lines.append("# TYPE agent_jobs_total counter")
+            lines += [f'agent_jobs_total{{app="{app}",outcome="{outcome}"}} {n}'
+                      for (app, outcome), n in sorted(self.jobs.items())]
+            lines.append("# TYPE agent_rejected_total counter")
+            lines += [f'agent_rejected_total{{reason="{reason}"}} {n}' for reason, n in sorted(self.rejected.items())]
+            lines.append("# TYPE agent_events_total counter")
+            lines += [f'agent_events_total{{app="{app}"}} {n}' for app, n in sorted(self.events.items())]
+            typed = set()
+            for (name, app), row in sorted(self.latency.items()):
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE agent_{name}_seconds histogram")
+                lines += [f'agent_{name}_seconds_bucket{{app="{app}",le="{bound}"}} {row[i]}'
+                          for i, bound in enumerate(LATENCY_BUCKETS)]
+                lines.append(f'agent_{name}_seconds_bucket{{app="{app}",le="+Inf"}} {row[-1]}')
+                lines.append(f'agent_{name}_seconds_sum{{app="{app}"}} {row[-2]:.6f}')
+                lines.append(f'agent_{name}_seconds_count{{app="{app}"}} {row[-1]}')
+        typed = set()
+        for name, value in gauges.items():
+            # name may carry labels: llm_queued{model="...",priority="..."}
+            base = name.split("{", 1)[0]
+            if base not in typed:
+                typed.add(base)
+                lines.append(f"# TYPE agent_{base} gauge")
+            lines.append(f"agent_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# -------------------- Job queue --------------------
+class Job:
+    """One agent run; its events arrive on `events`, ending with DONE."""
+
+    def __init__(self, runner: Runner, request: AgentRunRequest, tenant: str):
+        self.runner, self.request, self.tenant = runner, request, tenant
+        self.events: asyncio.Queue = asyncio.Queue()
+        self.loop = asyncio.get_running_loop()
+        self.enqueued = time.monotonic()
+        self.error: Optional[Exception] = None
+        self.id = uuid.uuid4().hex  # owner of the session lease
+
+    def emit(self, item) -> None:
+        self.loop.call_soon_threadsafe(self.events.put_nowait, item)
+
+
+class JobQueue:
+    """Bounded queue of agent runs with per-tenant and per-session admission, served by a thread pool."""
+
+    def __init__(self, workers: int = JOB_WORKERS, size: int = JOB_QUEUE_SIZE,
+                 tenant_limit: int = TENANT_CONCURRENCY, metrics: Optional[Metrics] = None):
+        self.workers, self.size, self.tenant_limit = workers, size, tenant_limit
+        self.metrics = metrics or Metrics()
+        self.queue: Optional[asyncio.Queue] = None
+        self.pool: Optional[ThreadPoolExecutor] = None
+        self.tasks: List[asyncio.Task] = []
+        self.tenants: Counter = Counter()
+        self.sessions: set = set()
+        self.running = 0
+
+    async def start(self) -> None:
+        self.queue = asyncio.Queue(self.size)
+        self.pool = ThreadPoolExecutor(self.workers, thread_name_prefix="agent-job")
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, job: Job) -> None:
+        """Queue a job or raise Rejected; never waits."""
+        req = job.request
+        session = (req.app_name, req.user_id, req.session_id)
+        if session in self.sessions:
+            raise Rejected(409, "session_busy", f"Session {req.session_id} already has a run in progress.")
+        if self.tenants[job.tenant] >= self.tenant_limit:
+            raise Rejected(429, "tenant_limit", f"Tenant {job.tenant} has {self.tenant_limit} runs in progress.")
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise Rejected(429, "queue_full", f"Run queue is full ({self.size} waiting).") from None
+        self.tenants[job.tenant] += 1
+        self.sessions.add(session)
+
+    def _release(self, job: Job) -> None:
+        req = job.request
+        self.tenants[job.tenant] -= 1
+        if self.tenants[job.tenant] <= 0:
+            del self.tenants[job.tenant]
+        self.sessions.discard((req.app_name, req.user_id, req.session_id))
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            app = job.request.app_name
+            self.metrics.observe("queue_wait", app, time.monotonic() - job.enqueued)
+            self.running += 1
+            started = time.monotonic()
+            try:
+                await loop.run_in_executor(self.pool, _run_job, job)
+                outcome = "error" if job.error else "ok"
+            finally:
+                self.running -= 1
+                self._release(job)
+                job.emit(DONE)
+                self.queue.task_done()
+            self.metrics.observe("run", app, time.monotonic() - started)
+            self.metrics.count(self.metrics.jobs, (app, outcome))
+
+    def health(self) -> dict:
+        waiting = self.queue.qsize() if self.queue else 0
+        return {
+            "status": "saturated" if waiting >= self.size else "ok",
+            "workers": self.workers,
+            "running": self.running,
+            "queued": waiting,
+            "queue_size": self.size,
+            "tenants": len(self.tenants),
+        }
+
+
+def _run_job(job: Job) -> None:
+    """Run the agent on this pool thread's own event loop, handing each event back as it is produced."""
+    req = job.request
+
+    async def consume() -> None:
+        async for event in job.runner.run_async(user_id=req.user_id, session_id=req.session_id,
+                                                new_message=req.new_message):
+            job.emit(event)
+
+    try:
+        with llm_scheduler.priority(APP_PRIORITY.get(req.app_name, llm_scheduler.NORMAL)):
+            asyncio.run(consume())
+    except Exception as e:  # reported to the client as the stream's last event
+        job.error = e
+    finally:
+        _release_lease(job)
+
+
+def _acquire_lease(job: Job) -> bool:
+    service, req = job.runner.session_service, job.request
+    if not isinstance(service, BatchedSessionService):
+        return True  # in-memory sessions live in this process only
+    return service.acquire_lease(req.app_name, req.user_id, req.session_id, job.id)
+
+
+def _release_lease(job: Job) -> None:
+    service, req = job.runner.session_service, job.request
+    if isinstance(service, BatchedSessionService):
+        service.release_lease(req.app_name, req.user_id, req.session_id, job.id)
+
+
+# -------------------- App --------------------
+def create_app(agents: tuple = ROOT_AGENTS, workers: int = JOB_WORKERS, queue_size: int = JOB_QUEUE_SIZE,
+               tenant_limit: int = TENANT_CONCURRENCY) -> FastAPI:
+    jobs = JobQueue(workers, queue_size, tenant_limit)
+    runners: Dict[str, Runner] = {}
+    runners_lock = threading.Lock()
+
+    async def lifespan(app: FastAPI):
+        await jobs.start()
+        yield
+        await jobs.stop()
+
+    app = FastAPI(title="Agentic AI agents", lifespan=lifespan)
+    app.state.jobs = jobs
+
+    def runner(name: str) -> Runner:
+        if name not in agents:
+            raise HTTPException(404, f"Unknown app {name!r}; expected one of {', '.join(agents)}.")
+        with runners_lock:
+            if name not in runners:
+                runners[name] = make_runner(name)
+                if os.environ.get("AGENT_MODEL_BACKEND") == "fake":
+                    from common.fake_llm import FakeLlm, use_model
+
+                    use_model(runners[name].agent, FakeLlm())
+            return runners[name]
+
+    async def admit(request: Request, req: AgentRunRequest) -> Job:
+        # Building a runner imports its agent and the session lookup hits the database: keep both off the loop.
+        target = await run_in_threadpool(runner, req.app_name)
+        session = await run_in_threadpool(target.session_service.get_session, app_name=req.app_name,
+                                          user_id=req.user_id, session_id=req.session_id)
+        if session is None:
+            raise HTTPException(404, "Session not found")
+        job = Job(target, req, request.headers.get("x-tenant-id") or req.user_id)
+        try:
+            if not await run_in_threadpool(_acquire_lease, job):
+                raise Rejected(409, "session_busy", f"Session {req.session_id} already has a run in progress.")
+            try:
+                jobs.submit(job)
+            except Rejected:
+                await run_in_threadpool(_release_lease, job)
+                raise
+        except Rejected as e:
+            jobs.metrics.count(jobs.metrics.rejected, e.reason)
+            headers = {"Retry-After": str(RETRY_AFTER_S)} if e.status == 429 else None
+            raise HTTPException(e.status, str(e), headers=headers) from None
+        return job
+
+    async def drain(job: Job) -> AsyncIterator[Any]:
+        while True:
+            item = await job.events.get()
+            if item is DONE:
+                return
+            jobs.metrics.count(jobs.metrics.events, job.request.app_name)
+            yield item
+
+    @app.get("/list-apps")
+    def list_apps() -> List[str]:
+        return list(agents)
+
+    @app.post("/apps/{app_name}/users/{user_id}/sessions")
+    @app.post("/apps/{app_name}/users/{user_id}/sessions/{session_id}")
+    def create_session(app_name: str, user_id: str, session_id: Optional[str] = None,
+                       body: Optional[CreateSessionRequest] = None):
+        service = runner(app_name).session_service
+        if session_id and service.get_session(app_name=app_name, user_id=user_id, session_id=session_id):
+            raise HTTPException(400, f"Session already exists: {session_id}")
+        return service.create_session(app_name=app_name, user_id=user_id, state=body.state if body else None,
+                                      session_id=session_id or str(uuid.uuid4()))
+
+    @app.get("/apps/{app_name}/users/{user_id}/sessions/{session_id}")
+    def get_session(app_name: str, user_id: str, session_id: str):
+        session = runner(app_name).session_service.get_session(app_name=app_name, user_id=user_id,
+                                                               session_id=session_id)
+        if session is None:
+            raise HTTPException(404, "Session not found")
+        return session
+
+    @app.post("/run")
+    async def run(request: Request, req: AgentRunRequest):
+        job = await admit(request, req)
+        events = [event async for event in drain(job)]
+        if job.error:
+            raise HTTPException(500, f"Agent run failed: {job.error}")
+        return events
+
+    @app.post("/run_sse")
+    async def run_sse(request: Request, req: AgentRunRequest) -> StreamingResponse:
+        job = await admit(request, req)
+
+        async def stream() -> AsyncIterator[str]:
+            async for event in drain(job):
+                yield f"data: {event.model_dump_json(exclude_none=True, by_alias=True)}\n\n"
+            if job.error:
+                yield f'data: {{"error": "{type(job.error).__name__}: {job.error}"}}\n\n'
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.get("/health")
+    def health():
+        # 503 while saturated, so a load balancer sends new runs to another process
+        h = jobs.health()
+        return JSONResponse(h, status_code=503 if h["status"] == "saturated" else 200)
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    def metrics() -> str:
+        h = jobs.health()
+        gauges = {"jobs_running": h["running"], "jobs_queued": h["queued"],
+                  "job_workers": h["workers"], "job_queue_size": h["queue_size"]}
+        for model, entry in llm_scheduler.stats()["models"].items():
+            for level, depth in entry["queued"].items():
+                gauges[f'llm_queued{{model="{model}",priority="{level}"}}'] = depth
+                gauges[f'llm_wait_mean_seconds{{model="{model}",priority="{level}"}}'] = entry["wait_mean_s"][level]
+            gauges[f'llm_coalesced{{model="{model}"}}'] = entry["coalesced"]
+            gauges[f'llm_throttled{{model="{model}"}}'] = entry["throttled"]
+        return jobs.metrics.render(gauges)
+
+    return app
+
+
+app = create_app()
+
+
+# -------------------- CLI --------------------
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve the root agents over HTTP with SSE streaming.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--processes", type=int, default=1, help="server processes; share SESSION_DB_URL across them")
+    parser.add_argument("--fake-model", action="store_true", help="answer with common.fake_llm (offline load tests)")
+    args = parser.parse_args(argv)
+    import uvicorn
+
+    if args.fake_model:
+        os.environ["AGENT_MODEL_BACKEND"] = "fake"
+    options = {}
+    if "timeout_worker_healthcheck" in inspect.signature(uvicorn.Config).parameters:
+        options["timeout_worker_healthcheck"] = WORKER_STARTUP_S
+    uvicorn.run("common.server:app", host=args.host, port=args.port, workers=args.processes, **options)
+
+
+if __name__ == "__main__":
+    main()
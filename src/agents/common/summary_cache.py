@@ -0,0 +1,177 @@
+"""
+Persistent summary cache shared by article_summarizer and the research app.
+
+Entries are keyed by canonical URL and carry the hash of the content they
+were computed from: the extracted text, the extractive summary and, once
+the model has written one, the LLM summary. A lookup with a different
+content hash is a miss (and drops the stale entry), so re-summarizing a
+known article costs one conditional GET and no model call as long as the
+page has not changed.
+
+The cache is one SQLite file (SUMMARY_CACHE_PATH, default
+~/.cache/agentic_ai/summaries.sqlite) bounded to SUMMARY_CACHE_MAX_MB
+(default 256); least recently used entries are evicted first. Several
+processes (the server's workers, the research app) may share the file, so
+the size is always read from the table, never kept in memory.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+CACHE_PATH = os.environ.get("SUMMARY_CACHE_PATH", os.path.expanduser("~/.cache/agentic_ai/summaries.sqlite"))
+MAX_BYTES = int(os.environ.get("SUMMARY_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid", "ref", "ref_src", "_hsenc", "_hsmi", "igshid")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    url TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    extracted_text TEXT,
+    extractive_summary TEXT,
+    llm_summary TEXT,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS summaries_accessed ON summaries (accessed);
+"""
+
+
+def canonical_url(url: str) -> str:
+    """Normalize a URL so that trivially different links share one cache entry.
+
+    Lower-cases scheme and host, drops default ports, fragments and tracking
+    parameters (utm_*, fbclid, ...), sorts the query and strips a trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(TRACKING_PARAMS)
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def content_hash(content) -> str:
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+
+class SummaryCache:
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def get(self, url: str, content_hash: str, max_age: Optional[float] = None) -> Optional[dict]:
+        """Return the entry for url if it was computed from content with this hash.
+
+        With `max_age`, entries written more than that many seconds ago are a miss too.
+        """
+        key = canonical_url(url)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT content_hash, extracted_text, extractive_summary, llm_summary, created FROM summaries WHERE url = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            if max_age is not None and time.time() - row[4] > max_age:
+                return None
+            if row[0] != content_hash:
+                self._db.execute("DELETE FROM summaries WHERE url = ?", (key,))
+                return None
+            self._db.execute("UPDATE summaries SET accessed = ? WHERE url = ?", (time.time(), key))
+        return {
+            "url": key,
+            "content_hash": row[0],
+            "extracted_text": row[1],
+            "extractive_summary": row[2],
+            "llm_summary": row[3],
+        }
+
+    def put(
+        self,
+        url: str,
+        content_hash: str,
+        extracted_text: Optional[str] = None,
+        extractive_summary: Optional[str] = None,
+        llm_summary: Optional[str] = None,
+    ) -> None:
+        """Store an entry; fields left as None keep their cached value if the content hash is unchanged."""
+        key = canonical_url(url)
+        now = time.time()
+        with self._lock:
+            # One write transaction, so the size check sees other processes' writes and evictions
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT content_hash, extracted_text, extractive_summary, llm_summary FROM summaries WHERE url = ?",
+                    (key,),
+                ).fetchone()
+                if row is not None and row[0] == content_hash:
+                    extracted_text = row[1] if extracted_text is None else extracted_text
+                    extractive_summary = row[2] if extractive_summary is None else extractive_summary
+                    llm_summary = row[3] if llm_summary is None else llm_summary
+                size = sum(len(f.encode("utf-8")) for f in (extracted_text, extractive_summary, llm_summary) if f)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, content_hash, extracted_text, extractive_summary, llm_summary, size, now, now),
+                )
+                total = self._total()
+                if total > self.max_bytes:
+                    self._evict(total)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _total(self) -> int:
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM summaries").fetchone()[0]
+
+    def _evict(self, total: int) -> None:
+        # Drop least recently used entries until the cache is back under 90% of its budget.
+        excess = total - int(self.max_bytes * 0.9)
+        doomed, freed = [], 0
+        for url, size in self._db.execute("SELECT url, size FROM summaries ORDER BY accessed"):
+            doomed.append((url,))
+            freed += size
+            if freed >= excess:
+                break
+        self._db.executemany("DELETE FROM summaries WHERE url = ?", doomed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summaries").fetchone()
+        return {"path": self.path, "entries": entries, "bytes": size, "max_bytes": self.max_bytes}
+
+
+_cache: Optional[SummaryCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> SummaryCache:
+    """Return the process-wide cache, opening the database on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SummaryCache()
+    return _cache
@@ -0,0 +1,408 @@
+"""
+Deterministic threat-chain enumeration over ATT&CK.
+
+Given a threat path such as "CVE-2021-44228 > CWE-502 > CAPEC-248 > T1059 >
+M1038", this module lists the most plausible attack chains through it from
+the local MITRE knowledge base (common.mitre_kb) instead of asking a model
+to invent them:
+
+1. Every technique gets a relevance score from its relation to the path:
+   named in it, mapped from its CAPEC, reached through its CWE (or the
+   CVE's CWEs in the local NVD index), linked to it in the Neo4j graph,
+   mitigated by its mitigation, or a sibling of a named technique.
+2. A chain is a sequence of techniques whose tactics strictly follow the
+   ATT&CK matrix order, starting at Initial Access (or at a path
+   technique), skipping at most MAX_TACTIC_GAP tactics per step, ending at
+   a goal tactic (Impact, Exfiltration, ...), at most MAX_STEPS long and
+   containing at least one anchor technique from the path.
+3. Only the BEAM most relevant techniques per tactic are expanded, and the
+   best continuations from each (tactic, technique, anchored) state are
+   memoized, so the search is a small dynamic program over a DAG and the
+   top-k chains come back in milliseconds, identically on every run.
+   Chains that differ only in steps unrelated to the path are reported once.
+
+A chain's score is the sum of its steps' relevance minus a per-step cost,
+plus bonuses for consecutive techniques that share a CAPEC pattern or parent
+technique and for the goal reached, minus a penalty per skipped tactic.
+
+    python -m common.threat_chains "CVE-2021-44228 > CWE-502 > CAPEC-248 > T1059"
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from google.adk.tools.tool_context import ToolContext
+
+from common.mitre_kb import MitreKB, get_kb, normalize_id
+
+ID_RE = re.compile(r"\b(CVE-\d{4}-\d{4,}|CWE-\d+|CAPEC-\d+|T\d{4}(?:\.\d{3})?|M\d{4})\b", re.IGNORECASE)
+
+# Pre-compromise tactics are not part of a chain unless the path names one of their techniques.
+PRE_TACTICS = ("reconnaissance", "resource-development")
+START_TACTICS = ("initial-access",)
+# Goal tactics, the end goal they stand for, and the score bonus for reaching them.
+GOALS = {
+    "impact": ("disruption or destruction (e.g. ransomware, wiping, denial of service)", 0.3),
+    "exfiltration": ("data exfiltration", 0.3),
+    "credential-access": ("credential theft", 0.2),
+    "collection": ("data collection", 0.15),
+    "privilege-escalation": ("privilege escalation", 0.1),
+}
+
+TOP_K = 5
+MAX_STEPS = 6
+MAX_TACTIC_GAP = 3
+BEAM = 8
+CACHE_SIZE = 256
+
+STEP_COST = 0.3
+GAP_PENALTY = 0.05
+LINK_BONUS = 0.15  # consecutive techniques share a CAPEC pattern
+SIBLING_BONUS = 0.1  # consecutive techniques share a parent technique
+
+# Relevance by relation to the threat path; the strongest relation wins.
+RELEVANCE = {
+    "path": 1.0,
+    "capec": 0.8,
+    "cwe": 0.6,
+    "graph": 0.6,
+    "cve": 0.5,
+    "mitigation": 0.5,
+    "sibling": 0.5,
+    "shared_capec": 0.4,
+}
+BASE_RELEVANCE = 0.1
+DOCUMENTED_BONUS = 0.05  # techniques with CAPEC mappings are better understood attack steps
+FILLER_RELEVANCE = BASE_RELEVANCE + DOCUMENTED_BONUS  # steps unrelated to the path
+PLATFORM_MISMATCH = 0.5  # factor for techniques on none of the path techniques' platforms
+
+
+class ThreatPath(NamedTuple):
+    cves: Tuple[str, ...]
+    cwes: Tuple[str, ...]
+    capecs: Tuple[str, ...]
+    techniques: Tuple[str, ...]
+    mitigations: Tuple[str, ...]
+
+    def key(self) -> str:
+        """Order-independent normal form, e.g. for cache keys."""
+        return " > ".join(",".join(sorted(ids)) for ids in self)
+
+
+class Step(NamedTuple):
+    technique: str
+    tactic: str
+    relevance: float
+    reason: str
+
+
+def parse_path(text: str) -> ThreatPath:
+    """Pick the CVE, CWE, CAPEC, technique and mitigation IDs out of a free-form path."""
+    found = defaultdict(list)
+    for match in ID_RE.findall(text):
+        value = normalize_id(match)
+        kind = value.split("-", 1)[0] if "-" in value else value[0]
+        bucket = found[{"T": "techniques", "M": "mitigations"}.get(kind, kind.lower() + "s")]
+        if value not in bucket:
+            bucket.append(value)
+    return ThreatPath(*(tuple(found[f]) for f in ThreatPath._fields))
+
+
+def _parent(technique: str) -> str:
+    return technique.split(".", 1)[0]
+
+
+def _cve_cwes(cves: Iterable[str]) -> List[str]:
+    if not cves:
+        return []
+    from common.nvd_index import get_index
+
+    try:
+        index = get_index()
+    except (FileNotFoundError, ValueError):
+        return []
+    cwes = []
+    for cve in cves:
+        record = index.get(cve)
+        cwes += [c for c in (record or {}).get("cwes", []) if c.startswith("CWE-") and c not in cwes]
+    return cwes
+
+
+def graph_neighbours(path: ThreatPath) -> List[str]:
+    """Technique IDs linked to the path's techniques and CAPECs in the Neo4j graph; empty if it is unreachable."""
+    from common.graph import lookup_nodes
+
+    related = []
+    for label, ids in (("TTP", path.techniques), ("CAPEC", path.capecs)):
+        if not ids:
+            continue
+        try:
+            nodes = lookup_nodes(label, ids)
+        except Exception:
+            return related
+        for node in nodes.values():
+            for r in (node or {}).get("related", []):
+                if r.get("label") == "TTP" and r["id"] not in related:
+                    related.append(str(r["id"]).upper())
+    return related
+
+
+def relevance(kb: MitreKB, path: ThreatPath, related: Iterable[str] = ()) -> Dict[str, Tuple[float, str]]:
+    """Score every ATT&CK technique by its strongest relation to the path: {technique: (score, reason)}."""
+    techniques = {i: e for i, e in kb.entries.items() if e["type"] == "technique"}
+    scores: Dict[str, Tuple[float, str]] = {}
+
+    def bump(technique: str, kind: str, reason: str) -> None:
+        if technique in techniques and RELEVANCE[kind] > scores.get(technique, (0.0, ""))[0]:
+            scores[technique] = (RELEVANCE[kind], reason)
+
+    for t in path.techniques:
+        bump(t, "path", "named in the threat path")
+    for capec_id in path.capecs:
+        for t in (kb.entries.get(capec_id) or {}).get("techniques", []):
+            bump(t, "capec", f"{capec_id} maps to it")
+    for kind, cwes in (("cwe", path.cwes), ("cve", _cve_cwes(path.cves))):
+        for cwe_id in cwes:
+            for capec_id in (kb.entries.get(cwe_id) or {}).get("capecs", []):
+                for t in (kb.entries.get(capec_id) or {}).get("techniques", []):
+                    bump(t, kind, f"{cwe_id} via {capec_id}" if kind == "cwe" else f"CVE weakness {cwe_id} via {capec_id}")
+    for t in related:
+        bump(t, "graph", "linked to the path in the Neo4j graph")
+    mitigations = set(path.mitigations)
+    seeds = [t for t in path.techniques if t in techniques]
+    seed_capecs = {c: s for s in seeds for c in techniques[s]["capecs"]}
+    seed_parents = {_parent(s): s for s in seeds}
+    platforms = {p for s in seeds for p in techniques[s]["platforms"]}
+    for t, entry in techniques.items():
+        for m in mitigations.intersection(entry["mitigations"]):
+            bump(t, "mitigation", f"mitigated by {m}")
+        if _parent(t) in seed_parents:
+            bump(t, "sibling", f"same technique family as {seed_parents[_parent(t)]}")
+        shared = next((c for c in entry["capecs"] if c in seed_capecs), None)
+        if shared:
+            bump(t, "shared_capec", f"shares {shared} with {seed_capecs[shared]}")
+        if t not in scores:
+            scores[t] = (BASE_RELEVANCE + (DOCUMENTED_BONUS if entry["capecs"] else 0.0), "")
+        if platforms and entry["platforms"] and not platforms.intersection(entry["platforms"]) and t not in seeds:
+            score, reason = scores[t]
+            scores[t] = (score * PLATFORM_MISMATCH, reason)
+    return scores
+
+
+class ChainSearch:
+    """Top-k chains by memoized search over (tactic, technique) states in matrix order."""
+
+    def __init__(self, kb: MitreKB, scores: Dict[str, Tuple[float, str]], anchors: Iterable[str],
+                 top_k: int = TOP_K, max_steps: int = MAX_STEPS, beam: int = BEAM):
+        self.kb = kb
+        self.scores = scores
+        self.anchors = frozenset(anchors)
+        self.top_k = top_k
+        self.max_steps = max_steps
+        anchor_tactics = {tactic for a in self.anchors for tactic in kb.entries[a]["tactics"]}
+        self.order = [t for t in kb.tactic_order if t not in PRE_TACTICS or t in anchor_tactics]
+        goals = [t for t in self.order if t in GOALS]
+        self.goals = set(goals or self.order[-1:])
+        self.starts = set(t for t in self.order if t in START_TACTICS) or set(self.order[:1])
+        # A chain starts at a start tactic, or at an anchor no later than one
+        self._last_start = max(i for i, t in enumerate(self.order) if t in self.starts)
+        # Anchors are always candidates; the rest of each tactic is cut to the beam.
+        self.candidates: List[List[str]] = []
+        for tactic in self.order:
+            members = kb.tactic_techniques.get(tactic, [])
+            ranked = sorted(members, key=lambda t: (-scores.get(t, (0.0, ""))[0], t))
+            self.candidates.append(sorted(set(ranked[:beam]) | (self.anchors & set(members))))
+        self._capecs = {t: set(kb.entries[t]["capecs"]) for c in self.candidates for t in c}
+        self._multi_tactic = {t for t in self._capecs if len(kb.entries[t]["tactics"]) > 1}
+        self._memo: Dict[tuple, list] = {}
+        # Keep a few extra continuations per state: some are dropped later for length or repeats.
+        self._width = top_k + 2
+
+    def _link(self, a: str, b: str) -> float:
+        bonus = LINK_BONUS if self._capecs[a] & self._capecs[b] else 0.0
+        return bonus + (SIBLING_BONUS if _parent(a) == _parent(b) else 0.0)
+
+    def _suffixes(self, i: int, technique: str, anchored: bool) -> list:
+        """Best (score, nodes, shape) continuations from this state, best first; nodes[0] is (i, technique)."""
+        key = (i, technique, anchored)
+        cached = self._memo.get(key)
+        if cached is not None:
+            return cached
+        anchored = anchored or technique in self.anchors
+        own = self.scores[technique][0] - STEP_COST
+        node = (i, technique)
+        # Continuations that differ only in filler steps (unrelated to the path) share a shape
+        mark = technique if self.scores[technique][0] > FILLER_RELEVANCE else None
+        repeats = technique in self._multi_tactic
+        found = []
+        if anchored and self.order[i] in self.goals:
+            found.append((own + GOALS.get(self.order[i], ("", 0.3))[1], (node,), (mark,)))
+        for j in range(i + 1, min(len(self.order), i + 2 + MAX_TACTIC_GAP)):
+            gap = GAP_PENALTY * (j - i - 1)
+            for nxt in self.candidates[j]:
+                if nxt == technique:
+                    continue
+                step = own + self._link(technique, nxt) - gap
+                for score, rest, shape in self._suffixes(j, nxt, anchored):
+                    if len(rest) >= self.max_steps or (repeats and any(t == technique for _, t in rest)):
+                        continue
+                    found.append((step + score, (node,) + rest, (mark,) + shape))
+        found.sort(key=lambda c: (-c[0], c[1]))
+        best, seen = [], set()
+        for entry in found:
+            if entry[2] not in seen:
+                seen.add(entry[2])
+                best.append(entry)
+                if len(best) == self._width:
+                    break
+        self._memo[key] = best
+        return best
+
+    def run(self) -> List[Tuple[float, List[Step]]]:
+        found = []
+        for i, tactic in enumerate(self.order):
+            for technique in self.candidates[i]:
+                if tactic in self.starts or (technique in self.anchors and i <= self._last_start):
+                    found += self._suffixes(i, technique, False)
+        seen, chains = set(), []
+        for score, nodes, shape in sorted(found, key=lambda c: (-c[0], c[1])):
+            if shape in seen:
+                continue
+            seen.add(shape)
+            steps = [Step(t, self.order[i], self.scores[t][0], self.scores[t][1]) for i, t in nodes]
+            chains.append((score, steps))
+            if len(chains) == self.top_k:
+                break
+        return chains
+
+    @property
+    def states(self) -> int:
+        return len(self._memo)
+
+
+def _anchors(path: ThreatPath, scores: Dict[str, Tuple[float, str]]) -> List[str]:
+    """The techniques a chain must pass through: the strongest tier of relation the path has."""
+    for threshold in (RELEVANCE["path"], RELEVANCE["capec"], RELEVANCE["cwe"], RELEVANCE["cve"]):
+        tier = sorted(t for t, (score, _) in scores.items() if score >= threshold)
+        if tier:
+            return tier
+    return []
+
+
+def chain_record(kb: MitreKB, score: float, steps: List[Step]) -> dict:
+    last = steps[-1].tactic
+    return {
+        "score": round(score, 3),
+        "goal": GOALS.get(last, (kb.tactics.get(last, {}).get("name", last), 0))[0],
+        "ttp_ids": [s.technique for s in steps],
+        "steps": [
+            {
+                "technique": s.technique,
+                "name": kb.entries[s.technique]["name"],
+                "tactic": kb.tactics.get(s.tactic, {}).get("name", s.tactic),
+                "relevance": round(s.relevance, 2),
+                "why": s.reason,
+            }
+            for s in steps
+        ],
+    }
+
+
+def enumerate_chains(threat_path: str, kb: Optional[MitreKB] = None, related: Iterable[str] = (),
+                     top_k: int = TOP_K, max_steps: int = MAX_STEPS) -> dict:
+    """Parse the path, score techniques and return the top-k chains with search statistics."""
+    start = time.perf_counter()
+    kb = kb or get_kb()
+    path = parse_path(threat_path)
+    scores = relevance(kb, path, related)
+    anchors = _anchors(path, scores)
+    result = {"path": {k: list(v) for k, v in path._asdict().items()}, "anchors": anchors, "chains": []}
+    if anchors:
+        search = ChainSearch(kb, scores, anchors, top_k, max_steps)
+        result["chains"] = [chain_record(kb, score, steps) for score, steps in search.run()]
+        result["search"] = {"states": search.states, "candidates": sum(map(len, search.candidates))}
+    result["milliseconds"] = round((time.perf_counter() - start) * 1000, 2)
+    return result
+
+
+_cache: "OrderedDict[tuple, dict]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def cached_chains(threat_path: str, kb: MitreKB) -> dict:
+    """enumerate_chains with Neo4j neighbours, memoized per normalized path.
+
+    threat_generator and attack_risk_assessor often expand the same path in one
+    session; the second caller gets the first caller's chains. "cached" tells
+    which happened.
+    """
+    path = parse_path(threat_path)
+    key = (path.key(), id(kb))
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is not None:
+            _cache.move_to_end(key)
+            return {**hit, "cached": True}
+    result = enumerate_chains(threat_path, kb, graph_neighbours(path))
+    with _cache_lock:
+        _cache[key] = result
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return {**result, "cached": False}
+
+
+def kb_unavailable(e: Exception) -> dict:
+    return {
+        "status": "error",
+        "message": f"Local MITRE knowledge base unavailable ({e}). Build it with `python -m common.mitre_kb build ...`.",
+    }
+
+
+def no_chains(result: dict) -> dict:
+    return {"status": "error", "message": "No ATT&CK technique in the local knowledge base is reachable from this path.",
+            "path": result["path"]}
+
+
+# -------------------- Agent tool --------------------
+def enumerate_threat_chains(threat_path: str, tool_context: ToolContext) -> dict:
+    """Enumerate the top-ranked ATT&CK threat chains through a CVE-CWE-CAPEC-TTP-MITIGATION path from the local MITRE knowledge base (deterministic)."""
+    print(f"--- Tool: enumerate_threat_chains called for path: {threat_path} ---")
+    from common.blackboard import lookup, publish
+
+    source = "MITRE ATT&CK (local KB)"
+    entry = lookup(tool_context.state, "threat_chains", threat_path)
+    if entry is not None:
+        return {"status": "success", "source": source, **entry["data"], "from_blackboard": True}
+    try:
+        kb = get_kb()
+    except (OSError, ValueError) as e:
+        return kb_unavailable(e)
+    result = cached_chains(threat_path, kb)
+    if not result["anchors"]:
+        return no_chains(result)
+    publish(tool_context.state, "threat_chains", threat_path, {k: v for k, v in result.items() if k != "cached"},
+            producer=tool_context.agent_name)
+    return {"status": "success", "source": source, **result, "from_blackboard": False}
+
+
+# -------------------- CLI --------------------
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Enumerate ATT&CK threat chains through a CVE-CWE-CAPEC-TTP path.")
+    parser.add_argument("path")
+    parser.add_argument("--kb", default=None, help="MITRE KB index file (default: $MITRE_KB_PATH)")
+    parser.add_argument("-k", "--top", type=int, default=TOP_K)
+    parser.add_argument("--max-steps", type=int, default=MAX_STEPS)
+    parser.add_argument("--graph", action="store_true", help="also use technique links from Neo4j")
+    args = parser.parse_args(argv)
+    kb = MitreKB.load(args.kb) if args.kb else get_kb()
+    related = graph_neighbours(parse_path(args.path)) if args.graph else ()
+    print(json.dumps(enumerate_chains(args.path, kb, related, args.top, args.max_steps), indent=2))
+
+
+if __name__ == "__main__":
+    main()
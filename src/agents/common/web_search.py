@@ -0,0 +1,19 @@
+from google.adk.agents import Agent
+from google.adk.tools import google_search
+from google.adk.tools.agent_tool import AgentTool
+
+# Gemini 2.x does not allow the built-in google_search tool to be combined with
+# function tools on the same agent, so agents that need both call search through
+# this small wrapper agent instead.
+web_search_agent = Agent(
+    name="web_search",
+    model="gemini-2.0-flash",
+    description="Searches the web with Google Search and returns the relevant findings with source links.",
+    instruction="""
+    You are a web search assistant. Use the google_search tool to answer the request you are given.
+    Return only the relevant findings, each with its source title and link.
+    """,
+    tools=[google_search],
+)
+
+web_search = AgentTool(agent=web_search_agent)
@@ -3,6 +3,11 @@ from google.adk.tools.tool_context import ToolContext
 from google.adk.tools import google_search
 import re
 
+from common.mitre_kb import mitre_cwe_chain, mitre_lookup, mitre_search, mitre_techniques_for_tactic
+from common.nvd_index import lookup_cve
+from common.web_search import web_search
+import common.scheduled_gemini  # noqa: F401  (gemini-* models go through the shared LLM scheduler)
+
 # ------------------------------------------------------------------
 # CVE-focused multi-agent research & synthesis pipeline (complete)
 # Produces a professional blog-style CVE report with extensive TI fields
@@ -37,9 +42,10 @@ REQUIREMENTS:
 3) If sources disagree, list discrepancies with attribution.
 4) Output as a JSON-like markdown block under top-level key "cve_core".
 
-TOOLS: Use google_search and bias queries with site: filters (e.g., site:nvd.nist.gov).
+TOOLS: Call lookup_cve first; its NVD record is authoritative for the description, CVSS vector/score, severity, CWEs, affected CPEs and dates.
+Use web_search only for what the NVD record lacks (exploitability, vendor advisories, references) and bias queries with site: filters (e.g., site:cisa.gov).
     ''',
-    tools=[google_search],
+    tools=[lookup_cve, web_search],
     output_key="cve_core"
 )
 
@@ -135,10 +141,12 @@ mitre_lookup_agent = LlmAgent(
     description="Automatically searches MITRE ATT&CK and mapping resources to identify candidate techniques.",
     instruction='''
 Using CVE core and open-source findings, search for MITRE ATT&CK techniques that map to this CVE's behaviour (e.g., RCE -> T1059, privilege escalation -> T1068).
+Resolve candidates against the local MITRE knowledge base: mitre_cwe_chain for the CVE's CWEs (CWE -> CAPEC -> technique),
+mitre_search for behaviour keywords, and mitre_lookup to confirm technique names and tactics. Use web_search only for mappings the knowledge base cannot provide.
 For each technique include: Technique ID, Name, Tactic, short rationale, and a detection idea (log source + what to look for).
 Output as a JSON-like structure under key "mitre_techniques".
     ''',
-    tools=[google_search],
+    tools=[mitre_cwe_chain, mitre_search, mitre_lookup, web_search],
     output_key="mitre_techniques"
 )
 
@@ -147,12 +155,13 @@ ttp_mapping_agent = LlmAgent(
     model="gemini-2.0-flash",
     description="Prioritizes MITRE techniques into probable attack chains and provides detection priorities.",
     instruction='''
-Consume mitre_techniques and other OSINT. Produce:
+Consume mitre_techniques and other OSINT. Use mitre_lookup and mitre_techniques_for_tactic to check technique IDs, names and tactics. Produce:
 1) Technique table (ID | Name | Tactic | Confidence | Rationale)
 2) 3 likely attack chains (ordered list of technique IDs with brief explanation)
 3) Top 5 prioritized detection recommendations (log source + rule idea)
 Output under key "ttp_map" as markdown or JSON-like text.
     ''',
+    tools=[mitre_lookup, mitre_techniques_for_tactic],
     output_key="ttp_map"
 )
 
@@ -1,6 +1,8 @@
 from google.adk.agents import Agent
 from google.adk.tools.agent_tool import AgentTool
 
+from common.blackboard import blackboard_status, count_llm_call
+import common.scheduled_gemini  # noqa: F401  (gemini-* models go through the shared LLM scheduler)
 from manager.sub_agents.cypher_query_generator.agent import cypher_query_generator
 from manager.sub_agents.log_summarizer.agent import log_summarizer
 from manager.sub_agents.neo4j_open_connect.agent import neo4j_open_connect
@@ -9,6 +11,7 @@ from manager.sub_agents.bdsa_cve_mitigation_agent.agent import bdsa_cve_mitigati
 from manager.sub_agents.article_summarizer.agent import article_summarizer
 from manager.sub_agents.youtube_summarizer.agent import youtube_summarizer
 from manager.sub_agents.flame_graph_summarizer.agent import flame_graph_summarizer
+from manager.sub_agents.image_summarizer.agent import image_summarizer
 from manager.sub_agents.cypher_query_executor.agent import cypher_query_executor
 from manager.sub_agents.threat_generator.agent import threat_generator
 from manager.sub_agents.attack_risk_assessor.agent import attack_risk_assessor
@@ -57,6 +60,11 @@ Mitigation Handling
 If the user request involves mitigation, use the tool:
 mitigation_finder.
 
+Session Blackboard
+The threat specialists (i, j, l, m) share the threat chains, risk scores, mitigations and indicators they produce
+within the session. If the user asks what has been produced so far or how much work was reused, use the tool
+blackboard_status.
+
 
     """,
     sub_agents=[
@@ -78,7 +86,9 @@ mitigation_finder.
     tools=[
         AgentTool(mitigation_finder),
         AgentTool(bdsa_cve_mitigation_agent),
+        blackboard_status,
     ],
+    before_model_callback=count_llm_call,
 )
 
 def aggregate_agent_outputs(input_data):
@@ -1,80 +1,151 @@
 from google.adk.agents import Agent
+from google.adk.agents.callback_context import CallbackContext
 from google.adk.tools.tool_context import ToolContext
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize, sent_tokenize
-from nltk.stem import PorterStemmer
-from bs4 import BeautifulSoup
-import requests
+from google.genai import types
+import re
+import time
+from typing import Optional
+from common.extractive import summarize
+from common.html_extract import extract, extract_many
+from common.http_fetch import fetch_many, fetch_url
+from common.summary_cache import content_hash, get_cache
+
+URL_RE = re.compile(r"https?://[^\s<>\"')\]]+")
+# Besides its URLs, a plain summary request holds nothing but these words
+PLAIN_REQUEST_WORDS = frozenset(
+    "please can could would you summarize summarise summary of the this these that article articles blog post "
+    "posts page link links url urls and a an give me for".split()
+)
+
+def html_to_text(content: bytes) -> str:
+    # Main article text only: nav bars, cookie banners, sidebars and footers are dropped (see common/html_extract.py)
+    return extract(content).text
+
+
+def _summarize_fetched(result, text: str = None, state=None) -> dict:
+    if not result.ok:
+        return {"status": "error", "url": result.url, "message": result.error or f"HTTP {result.status_code}"}
+    start = time.perf_counter()
+    digest = content_hash(result.content)
+    if state is not None:
+        # Lets the after-agent callback file the model's summary under the content it was written from
+        state["article_hashes"] = {**(state.get("article_hashes") or {}), result.url: digest}
+    # Unchanged content (typically a 304) reuses the stored extraction and summary; see common/summary_cache.py
+    cached = get_cache().get(result.url, digest)
+    if cached and cached["extractive_summary"]:
+        summary_text = cached["extractive_summary"]
+    else:
+        if text is None:
+            text = html_to_text(result.content)
+        # Pick the top 5 sentences (TextRank) and keep them as written, in article order
+        summary_text = ' '.join(summarize(text, num_sentences=5))
+        get_cache().put(result.url, digest, extracted_text=text, extractive_summary=summary_text)
+    timing = {k: round(v, 3) for k, v in result.timing.items()}
+    timing["summarize"] = round(time.perf_counter() - start, 3)
+    article = {
+        "status": "success",
+        "summary": summary_text,
+        "url": result.url,
+        "from_cache": result.from_cache,
+        "summary_cached": bool(cached),
+        "truncated": result.truncated,
+        "timing_s": timing,
+    }
+    if cached and cached["llm_summary"]:
+        article["previous_llm_summary"] = cached["llm_summary"]
+    return article
+
 
 def article_summarizer(url: str, tool_context: ToolContext) -> dict:
     try:
-        # Send a GET request to the URL
-        response = requests.get(url)
-
-        # Parse the HTML content using BeautifulSoup
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        # Remove all script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-
-        # Get the text from the HTML content
-        text = soup.get_text()
-
-        # Break the text into lines and remove leading and trailing space on each
-        lines = (line.strip() for line in text.splitlines())
-
-        # Break multi-headlines into a line each
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-
-        # Remove special characters and digits
-        text = ' '.join(chunk for chunk in chunks if chunk)
-
-        # Tokenize the text into sentences
-        sentences = sent_tokenize(text)
-
-        # Remove stopwords and stem the words
-        stop_words = set(stopwords.words('english'))
-        stemmer = PorterStemmer()
-        stemmed_sentences = []
-        for sentence in sentences:
-            words = word_tokenize(sentence)
-            stemmed_words = [stemmer.stem(word) for word in words if word.lower() not in stop_words]
-            stemmed_sentences.append(' '.join(stemmed_words))
-
-        # Calculate the frequency of each word
-        word_freq = {}
-        for sentence in stemmed_sentences:
-            words = sentence.split()
-            for word in words:
-                if word not in word_freq:
-                    word_freq[word] = 1
-                else:
-                    word_freq[word] += 1
-
-        # Rank the sentences based on the frequency of their words
-        ranked_sentences = []
-        for sentence in stemmed_sentences:
-            words = sentence.split()
-            score = sum(word_freq[word] for word in words)
-            ranked_sentences.append((sentence, score))
-
-        # Sort the sentences based on their score
-        ranked_sentences.sort(key=lambda x: x[1], reverse=True)
-
-        # Select the top 5 sentences as the summary
-        summary = []
-        for sentence, score in ranked_sentences[:5]:
-            summary.append(sentence)
-
-        # Join the summary sentences into a single string
-        summary_text = ' '.join(summary)
-
-        return {"status": "success", "summary": summary_text, "url": url}
+        # Shared pooled session with timeouts, a size cap and conditional GETs; see common/http_fetch.py
+        return _summarize_fetched(fetch_url(url), state=tool_context.state)
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+
+def summarize_articles(urls: list[str], tool_context: ToolContext) -> dict:
+    """Fetch many article URLs concurrently and return an extractive summary of each."""
+    print(f"--- Tool: summarize_articles called for {len(urls)} URLs ---")
+    start = time.perf_counter()
+    results = fetch_many(urls)
+    fetched = time.perf_counter() - start
+    # HTML parsing is CPU-bound, so large batches are extracted in a process pool; pages whose
+    # summary is already cached for this content are not extracted at all
+    pages = [
+        r for r in {r.url: r for r in results if r.ok}.values()
+        if not (get_cache().get(r.url, content_hash(r.content)) or {}).get("extractive_summary")
+    ]
+    try:
+        texts = dict(zip((r.url for r in pages), (e.text for e in extract_many(r.content for r in pages))))
+    except Exception:
+        texts = {}  # fall back to extracting page by page, so one bad page only fails itself
+    articles = []
+    for result in results:
+        try:
+            articles.append(_summarize_fetched(result, texts.get(result.url), tool_context.state))
+        except Exception as e:
+            articles.append({"status": "error", "url": result.url, "message": str(e)})
+    return {
+        "status": "success",
+        "articles": articles,
+        "failed": sum(1 for a in articles if a["status"] != "success"),
+        "fetch_wall_s": round(fetched, 3),
+        "total_s": round(time.perf_counter() - start, 3),
+    }
+
+
+def _user_text(callback_context: CallbackContext) -> str:
+    content = callback_context.user_content
+    if not content or not content.parts:
+        return ""
+    return " ".join(part.text for part in content.parts if part.text)
+
+
+def _plain_request(text: str) -> list:
+    """Return the URLs of a request that asks for nothing but their summary, else []."""
+    urls = list(dict.fromkeys(u.rstrip(".,;:!?") for u in URL_RE.findall(text)))
+    words = re.findall(r"[a-z]+", URL_RE.sub(" ", text).lower())
+    return urls if all(w in PLAIN_REQUEST_WORDS for w in words) else []
+
+
+def reuse_cached_summary(callback_context: CallbackContext) -> Optional[types.Content]:
+    """Skip the model when every requested article is unchanged and already has a stored summary.
+
+    Only plain requests qualify: "summarize <url> focusing on the exploit" needs the model.
+    """
+    callback_context.state["article_hashes"] = {}
+    urls = _plain_request(_user_text(callback_context))
+    if not urls:
+        return None
+    summaries = []
+    for result in fetch_many(urls):
+        if not result.ok:
+            return None
+        digest = content_hash(result.content)
+        cached = get_cache().get(result.url, digest)
+        if not cached or not cached["llm_summary"]:
+            if len(urls) == 1:
+                callback_context.state["article_hashes"] = {result.url: digest}
+            return None
+        summaries.append(cached["llm_summary"] if len(urls) == 1 else f"{result.url}\n{cached['llm_summary']}")
+    print(f"--- article_summarizer: {len(urls)} unchanged article(s) answered from the summary cache ---")
+    text = "\n\n".join(summaries)
+    callback_context.state["article_summary"] = text
+    return types.Content(role="model", parts=[types.Part(text=text)])
+
+
+def store_llm_summary(callback_context: CallbackContext) -> Optional[types.Content]:
+    """Store the model's summary of a single article for the next request of the same, unchanged URL."""
+    hashes = callback_context.state.get("article_hashes") or {}
+    summary = callback_context.state.get("article_summary")
+    # A summary covering several articles cannot be filed under any one of them, and one
+    # written to a more specific request would be the wrong answer to a plain one
+    if len(_plain_request(_user_text(callback_context))) == 1 and len(hashes) == 1 and summary:
+        (url, digest), = hashes.items()
+        get_cache().put(url, digest, llm_summary=summary)
+    return None
+
 # Create the Article Summarizer Agent
 article_summarizer = Agent(
     name="article_summarizer",
@@ -82,9 +153,14 @@ article_summarizer = Agent(
     description="An agent that summarizes articles or blog posts.",
     instruction=""" 
 You are an agent that summarizes articles or blog posts. Given a URL, you should:
+(If you are given several URLs, call summarize_articles once with all of them instead of article_summarizer per URL,
+and summarize each article in turn; mention any URL that could not be fetched.)
 1. Read the article carefully.
 2. Provide a summary in 10-15 lines with all the key points highlighted.
 
 """,
-    tools=[article_summarizer],
+    tools=[article_summarizer, summarize_articles],
+    before_agent_callback=reuse_cached_summary,
+    after_agent_callback=store_llm_summary,
+    output_key="article_summary",
 )
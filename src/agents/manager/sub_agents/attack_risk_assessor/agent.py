@@ -1,15 +1,24 @@
 from google.adk.agents import Agent
-from google.adk.tools.agent_tool import AgentTool
-from manager.sub_agents.threat_generator.agent import threat_generator
+from common.blackboard import count_llm_call, reset_llm_calls
+from common.risk import assess_threat_risk
 
 attack_risk_assessor = Agent(
     name="attack_risk_assessor",
     model="gemini-2.0-flash",
     description="Analyzes threat chains for criticality, future risk, and provides prevention steps.",
     instruction="""
-    When given a threat path, use the threat_generator tool to get threat chains.
-    Then, analyze the chains for criticality, future risk, and prevention steps.
+    When given a threat path, call assess_threat_risk with the path exactly as given. It returns the threat chains
+    for the path (the same ones threat_generator narrates, reused when already computed) with a numeric risk score
+    each, the inputs behind the scores (CVSS, EPSS exploit likelihood, CISA KEV membership, tactic depth) and the
+    mitigations that cover the most chain steps.
+    Then, analyze the chains for criticality, future risk, and prevention steps, using the returned numbers as they
+    are: quote overall_risk and each chain's risk score and band, explain which components drive them, and do not
+    compute or invent other scores. Base prevention steps on the returned mitigations first.
+    If the tool returns an error, say so and give a qualitative assessment, clearly marked as not scored.
     Present your analysis in a structured format.
     """,
-    tools=[AgentTool(threat_generator)],
-)
\ No newline at end of file
+    tools=[assess_threat_risk],
+    before_agent_callback=reset_llm_calls,
+    before_model_callback=count_llm_call,
+    output_key="risk_assessment",
+)
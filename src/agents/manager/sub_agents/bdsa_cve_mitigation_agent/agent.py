@@ -1,5 +1,6 @@
 from google.adk.agents import Agent
-from google.adk.tools import google_search
+from common.nvd_index import lookup_cve
+from common.web_search import web_search
 
 bdsa_cve_mitigation_agent = Agent(
     name="bdsa_cve_mitigation_agent",
@@ -9,10 +10,11 @@ bdsa_cve_mitigation_agent = Agent(
 You are an assistant that converts a BDSA advisory ID into its corresponding CVE ID and then finds an actionable mitigation strategy.
 
 When given a BDSA ID:
-1. Use the google_search tool to find the exact CVE ID associated with the BDSA advisory.
+1. Use the web_search tool to find the exact CVE ID associated with the BDSA advisory.
    - Prefer authoritative sources such as the BDSA advisory page, vendor security advisories, NIST/NVD, MITRE, or CISA.
    - If multiple CVEs appear, determine the best match and explain the choice.
-2. Once the CVE ID is identified, search for mitigation guidance specific to that CVE.
+2. Once the CVE ID is identified, call lookup_cve to get its authoritative NVD record (description, CVSS, CWEs, affected CPEs),
+   then use web_search for mitigation guidance specific to that CVE.
    - Prioritize official vendor patches, configuration hardening, workarounds, and detection guidance.
    - Provide a concise, clear, and actionable mitigation plan with steps.
 3. Return the result in a structured way with:
@@ -24,6 +26,6 @@ When given a BDSA ID:
 
 If you cannot locate a CVE for the exact BDSA ID, state that clearly and provide the best available evidence found.
     """,
-    tools=[google_search],
+    tools=[web_search, lookup_cve],
     output_key="bdsa_cve_mitigation",
 )
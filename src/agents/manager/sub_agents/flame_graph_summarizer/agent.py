@@ -1,12 +1,81 @@
 from google.adk.agents import Agent
+from google.adk.tools.tool_context import ToolContext
+import os
+import time
+from manager.sub_agents.flame_graph_summarizer.diff import diff_profiles, render_svg
+from manager.sub_agents.flame_graph_summarizer.profiles import load_profile, summarize
+
+
+def analyze_profile(file_path: str, baseline_path: str, tool_context: ToolContext) -> dict:
+    """Summarize a raw profile (folded stacks, perf script, speedscope JSON or pprof) into a few numbers.
+
+    baseline_path may be empty; if given, the result also includes the regressions against it.
+    """
+    print(f"--- Tool: analyze_profile called for {file_path} (baseline: {baseline_path or 'none'}) ---")
+    start = time.perf_counter()
+    try:
+        # Call tree, self/total time, hot paths and recursion are computed locally; see profiles.py
+        tree = load_profile(file_path)
+        if not tree.total:
+            return {"status": "error", "message": f"No stacks could be parsed from {file_path}"}
+        summary = summarize(tree)
+        if baseline_path:
+            summary["diff"] = diff_profiles(baseline_path, file_path).summary()
+    except FileNotFoundError as e:
+        return {"status": "error", "message": f"File not found: {e.filename}"}
+    except Exception as e:
+        return {"status": "error", "message": f"Could not parse profile: {e}"}
+    return {"status": "success", **summary, "analysis_seconds": round(time.perf_counter() - start, 3)}
+
+
+def compare_profiles(baseline_path: str, candidate_path: str, svg_path: str, tool_context: ToolContext) -> dict:
+    """Compare two raw profiles: significant regressions and improvements, plus a red/blue differential flame graph.
+
+    svg_path may be empty, in which case the graph is written next to the candidate as <name>.diff.svg.
+    """
+    print(f"--- Tool: compare_profiles called for {baseline_path} -> {candidate_path} ---")
+    start = time.perf_counter()
+    svg_path = svg_path or os.path.splitext(candidate_path)[0] + ".diff.svg"
+    try:
+        # Deltas and z-scores are computed locally; see diff.py
+        tree = diff_profiles(baseline_path, candidate_path)
+        summary = tree.summary()
+        svg = render_svg(tree, f"{os.path.basename(baseline_path)} -> {os.path.basename(candidate_path)}")
+    except FileNotFoundError as e:
+        return {"status": "error", "message": f"File not found: {e.filename}"}
+    except OSError as e:
+        return {"status": "error", "message": f"Could not read {e.filename}: {e.strerror}"}
+    except Exception as e:
+        return {"status": "error", "message": f"Could not parse profile: {e}"}
+    try:
+        with open(svg_path, "w", encoding="utf-8") as f:
+            f.write(svg)
+    except OSError as e:
+        return {"status": "error", "message": f"Could not write {svg_path}: {e}"}
+    return {"status": "success", **summary, "svg_path": svg_path,
+            "analysis_seconds": round(time.perf_counter() - start, 3)}
+
 
 flame_graph_summarizer = Agent(
     name="flame_graph_summarizer",
     model="gemini-2.0-flash",
-    description="Analyzes a flame graph image, summarizes key points, detects anomalies and threats, and provides an in-depth summary.",
+    description="Analyzes a flame graph image or raw profile data, summarizes key points, detects anomalies and threats, and provides an in-depth summary.",
     instruction="""
 You are an expert in performance profiling and threat analysis.
 
+If you are given a profile file (folded stacks, `perf script` output, speedscope/py-spy JSON or pprof) rather than
+an image, call analyze_profile with its path (and a baseline profile path if one is given, otherwise an empty string),
+and base every finding on the returned numbers: top_self and top_total are percentages of total_weight, hot_paths are
+the heaviest stacks, critical_path is the heaviest chain from the root, and recursion gives self-nesting depths.
+
+If you are asked to compare two profiles (before/after, baseline/candidate), call compare_profiles with both paths
+(and an SVG output path if one is given, otherwise an empty string). Explain the top entries of regressions one by one
+from the returned numbers only: which stack, its self share in the baseline and the candidate, the change in
+percentage points and its z-score (if significance says there was no test, say the ranking is by size of the change
+only). Mention the functions_grew totals, new_stacks and removed_stacks, summarize the
+improvements briefly, and tell the user where the differential flame graph was written (svg_path; red frames grew,
+blue frames shrank). Do not call anything a regression that is not in the regressions list.
+
 Given a flame graph image:
 1. Identify and list the key functions or code paths that consume the most resources (the widest frames).
 2. Detect and bullet-point any abnormalities or anomalies, such as:
@@ -29,5 +98,5 @@ Given a flame graph image:
 ## In-Depth Summary
 [Detailed analysis, recommendations, and threat mitigation based on the flame graph]
 """,
-    tools=[],
+    tools=[analyze_profile, compare_profiles],
 )
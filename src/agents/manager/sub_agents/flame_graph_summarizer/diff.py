@@ -0,0 +1,287 @@
+"""
+Differential profiles: what moved between a baseline and a candidate.
+
+Both profiles are read into one frame table and their stacks merged into a
+single call tree carrying two weight columns. Every node (a frame in its
+calling context) gets its share of each profile's total, in self and
+inclusive terms, and the change in percentage points. Profiles of different
+length are comparable because only shares are compared.
+
+Significance is a two-proportion z-test per node on sample counts: with
+10k samples a 0.5 point shift is noise, with 10M it is not. The counts are
+not the weights when those are time (pprof nanoseconds, time-weighted
+speedscope); read_stacks supplies them from a count column, the sampling
+period or one per sample entry. When either profile has no counts (evented
+speedscope), there is no test and nodes are ranked by delta alone.
+Regressions are the nodes whose self share grew the most among those with
+|z| >= Z_THRESHOLD.
+
+render_svg draws the candidate as a flame graph (width = candidate
+inclusive share) coloured by the change in inclusive share: red grew, blue
+shrank, white is unchanged or not significant. Like Brendan Gregg's
+differential flame graphs, stacks that disappeared entirely have no width;
+they are listed in the summary instead.
+
+    python -m manager.sub_agents.flame_graph_summarizer.diff base.folded new.folded -o diff.svg
+"""
+
+import argparse
+import html
+import json
+from typing import List, Optional
+
+import numpy as np
+
+from manager.sub_agents.flame_graph_summarizer.profiles import (
+    PATH_FRAMES, TOP_N, FrameTable, Stacks, prefix_tree, read_stacks, subtree_totals,
+)
+
+Z_THRESHOLD = 3.0
+MIN_DELTA_PCT = 0.1  # smaller shifts are not worth reporting even when significant
+SVG_WIDTH = 1200
+FRAME_HEIGHT = 16
+MIN_FRAME_PX = 0.3
+CHAR_PX = 6.5
+
+
+def _z(b: np.ndarray, c: np.ndarray, base_sum: float, cand_sum: float) -> np.ndarray:
+    if not base_sum or not cand_sum:
+        return np.zeros_like(b)
+    pooled = (b + c) / (base_sum + cand_sum)
+    se = np.sqrt(pooled * (1 - pooled) * (1 / base_sum + 1 / cand_sum))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (c / cand_sum - b / base_sum) / se
+    return np.where(se > 0, z, 0.0)
+
+
+def _significant(delta: np.ndarray, z: Optional[np.ndarray]) -> np.ndarray:
+    mask = np.abs(delta) >= MIN_DELTA_PCT
+    if z is not None:
+        mask &= np.abs(z) >= Z_THRESHOLD
+    mask[0] = False
+    return mask
+
+
+class DiffTree:
+    """Merged call tree of two profiles; arrays are indexed by node, node 0 is the root.
+
+    base_count/cand_count are the sample counts per node (self), if both
+    profiles have them; the z arrays are None otherwise.
+    """
+
+    def __init__(self, names, parent, frame, depth, base_self, cand_self, unit, base_count=None, cand_count=None):
+        self.names = names
+        self.parent = parent
+        self.frame = frame
+        self.depth = depth
+        self.unit = unit
+        self.base_self, self.cand_self = base_self, cand_self
+        self.base_total = subtree_totals(parent, depth, base_self)
+        self.cand_total = subtree_totals(parent, depth, cand_self)
+        self.base_sum, self.cand_sum = float(self.base_total[0]), float(self.cand_total[0])
+        self.formats = ("", "")
+
+        def share(weights, total):
+            return weights * (100.0 / total) if total else np.zeros_like(weights)
+
+        self.self_delta = share(cand_self, self.cand_sum) - share(base_self, self.base_sum)
+        self.total_delta = share(self.cand_total, self.cand_sum) - share(self.base_total, self.base_sum)
+        self.self_z = self.total_z = None
+        if base_count is not None and cand_count is not None:
+            base_count_total = subtree_totals(parent, depth, base_count)
+            cand_count_total = subtree_totals(parent, depth, cand_count)
+            base_n, cand_n = float(base_count_total[0]), float(cand_count_total[0])
+            self.self_z = _z(base_count, cand_count, base_n, cand_n)
+            self.total_z = _z(base_count_total, cand_count_total, base_n, cand_n)
+
+    @classmethod
+    def build(cls, baseline: Stacks, candidate: Stacks, names: List[str], unit: str = "samples",
+              base_counts: Optional[Stacks] = None, cand_counts: Optional[Stacks] = None) -> "DiffTree":
+        keys = sorted(baseline.keys() | candidate.keys())
+        parent, frame, depth, _, _, leaves = prefix_tree(keys)
+
+        def column(stacks):
+            if stacks is None:
+                return None
+            weights = np.zeros(len(parent))
+            np.add.at(weights, leaves, np.fromiter((stacks.get(k, 0.0) for k in keys), np.float64, len(keys)))
+            return weights
+
+        return cls(names, parent, frame, depth, column(baseline), column(candidate), unit,
+                   column(base_counts), column(cand_counts))
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def path(self, node: int) -> List[str]:
+        names = []
+        while node > 0:
+            names.append(self.names[self.frame[node]])
+            node = self.parent[node]
+        return names[::-1]
+
+    def _node(self, node: int) -> dict:
+        path = self.path(node)
+        base_pct = 100.0 * self.base_self[node] / self.base_sum if self.base_sum else 0.0
+        cand_pct = 100.0 * self.cand_self[node] / self.cand_sum if self.cand_sum else 0.0
+        return {
+            "function": path[-1],
+            "stack": ("... > " if len(path) > PATH_FRAMES else "") + " > ".join(path[-PATH_FRAMES:]),
+            "baseline_self_pct": round(base_pct, 2),
+            "candidate_self_pct": round(cand_pct, 2),
+            "self_pct_delta": round(float(self.self_delta[node]), 2),
+            "total_pct_delta": round(float(self.total_delta[node]), 2),
+            "z": round(float(self.self_z[node]), 1) if self.self_z is not None else None,
+        }
+
+    def significant(self) -> np.ndarray:
+        """Nodes whose self share moved by at least MIN_DELTA_PCT, and significantly when counts are known."""
+        return _significant(self.self_delta, self.self_z)
+
+    def total_significant(self) -> np.ndarray:
+        return _significant(self.total_delta, self.total_z)
+
+    def summary(self, top_n: int = TOP_N) -> dict:
+        significant = self.significant()
+        grew = np.flatnonzero(significant & (self.self_delta > 0))
+        shrank = np.flatnonzero(significant & (self.self_delta < 0))
+        grew = grew[np.argsort(-self.self_delta[grew], kind="stable")][:top_n]
+        shrank = shrank[np.argsort(self.self_delta[shrank], kind="stable")][:top_n]
+
+        # The same function can regress in several call sites; sum its self deltas over the tree
+        by_function = np.bincount(self.frame[1:], weights=self.self_delta[1:], minlength=len(self.names))
+        order = np.argsort(-by_function, kind="stable")
+        only_base = np.flatnonzero((self.cand_total == 0) & (self.base_total > 0))
+        only_cand = np.flatnonzero((self.base_total == 0) & (self.cand_total > 0))
+        # Report only the topmost node of a stack that appeared or disappeared; the root always
+        # exists, so against an empty profile every top-level stack counts
+        only_base = only_base[only_base > 0]
+        only_cand = only_cand[only_cand > 0]
+        only_base = only_base[(self.parent[only_base] == 0) | (self.cand_total[self.parent[only_base]] > 0)]
+        only_cand = only_cand[(self.parent[only_cand] == 0) | (self.base_total[self.parent[only_cand]] > 0)]
+        return {
+            "unit": self.unit,
+            "formats": list(self.formats),
+            "baseline_total_weight": self.base_sum,
+            "candidate_total_weight": self.cand_sum,
+            "call_tree_nodes": len(self) - 1,
+            "significant_nodes": int(significant.sum()),
+            "significance": (f"two-proportion z-test on sample counts, |z| >= {Z_THRESHOLD:g}"
+                             if self.self_z is not None else
+                             "none: a profile records no sample counts, so nodes are ranked by delta alone"),
+            "regressions": [self._node(n) for n in grew],
+            "improvements": [self._node(n) for n in shrank],
+            "functions_grew": [
+                {"function": self.names[f], "self_pct_delta": round(float(by_function[f]), 2)}
+                for f in order[:top_n] if by_function[f] >= MIN_DELTA_PCT
+            ],
+            "functions_shrank": [
+                {"function": self.names[f], "self_pct_delta": round(float(by_function[f]), 2)}
+                for f in order[::-1][:top_n] if by_function[f] <= -MIN_DELTA_PCT
+            ],
+            "new_stacks_pct": round(100.0 * self.cand_total[only_cand].sum() / self.cand_sum, 2) if self.cand_sum else 0.0,
+            "removed_stacks_pct": round(100.0 * self.base_total[only_base].sum() / self.base_sum, 2) if self.base_sum else 0.0,
+            "new_stacks": [" > ".join(self.path(n)[-PATH_FRAMES:]) for n in
+                           only_cand[np.argsort(-self.cand_total[only_cand], kind="stable")][:5]],
+            "removed_stacks": [" > ".join(self.path(n)[-PATH_FRAMES:]) for n in
+                               only_base[np.argsort(-self.base_total[only_base], kind="stable")][:5]],
+        }
+
+
+def diff_profiles(baseline_path: str, candidate_path: str, profile_format: str = "") -> DiffTree:
+    """Read two profiles (any format profiles.py reads) into one DiffTree."""
+    frames = FrameTable()
+    baseline, base_unit, base_format, base_counts = read_stacks(baseline_path, profile_format, frames)
+    candidate, cand_unit, cand_format, cand_counts = read_stacks(candidate_path, profile_format, frames)
+    unit = cand_unit if cand_unit == base_unit else f"{base_unit} vs {cand_unit}"
+    tree = DiffTree.build(baseline, candidate, frames.names, unit, base_counts, cand_counts)
+    tree.formats = (base_format, cand_format)
+    return tree
+
+
+# -------------------- SVG --------------------
+def _color(delta: float, scale: float, significant: bool) -> str:
+    if not significant or not scale:
+        return "rgb(245,245,245)"
+    intensity = min(1.0, abs(delta) / scale)
+    fade = int(235 - 195 * intensity)
+    return f"rgb(255,{fade},{fade})" if delta > 0 else f"rgb({fade},{fade},255)"
+
+
+def render_svg(tree: DiffTree, title: str = "Differential flame graph", width: int = SVG_WIDTH) -> str:
+    """A self-contained SVG: candidate widths, red/blue by change in inclusive share (hover for numbers)."""
+    if not tree.cand_sum:
+        return f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="40"><text x="10" y="24">empty candidate profile</text></svg>'
+    widths = tree.cand_total * (width / tree.cand_sum)
+    # Children sorted by name under their parent, as flame graphs are
+    name_rank = np.argsort(np.argsort(np.asarray(tree.names, dtype=object), kind="stable"), kind="stable")
+    frame_rank = np.where(tree.frame >= 0, name_rank[np.maximum(tree.frame, 0)], -1)
+    order = np.lexsort((frame_rank, tree.parent))
+    sorted_widths = widths[order]
+    before = np.cumsum(sorted_widths) - sorted_widths
+    first = np.r_[True, tree.parent[order][1:] != tree.parent[order][:-1]]
+    group_start = np.maximum.accumulate(np.where(first, np.arange(len(order)), 0))
+    offset = np.empty_like(widths)
+    offset[order] = before - before[group_start]
+    x = np.zeros_like(widths)
+    by_depth = np.argsort(tree.depth, kind="stable")
+    level_ends = np.searchsorted(tree.depth[by_depth], np.arange(1, int(tree.depth.max()) + 2))
+    for lo, hi in zip(level_ends[:-1], level_ends[1:]):
+        level = by_depth[lo:hi]
+        x[level] = x[tree.parent[level]] + offset[level]
+
+    visible = np.flatnonzero(widths >= MIN_FRAME_PX)
+    max_depth = int(tree.depth[visible].max()) if len(visible) else 0
+    height = (max_depth + 1) * FRAME_HEIGHT + 60
+    significant = tree.significant()
+    scale = float(np.abs(tree.total_delta[visible][significant[visible]]).max()) if significant[visible].any() else 0.0
+    total_significant = tree.total_significant()
+    if total_significant[visible].any():
+        scale = max(scale, float(np.abs(tree.total_delta[visible][total_significant[visible]]).max()))
+
+    out = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="Verdana,sans-serif" font-size="11">',
+        f'<rect width="100%" height="100%" fill="white"/>',
+        f'<text x="{width / 2}" y="20" text-anchor="middle" font-size="15">{html.escape(title)}</text>',
+        f'<text x="10" y="38" fill="#555">red: larger share than baseline, blue: smaller; width: candidate '
+        f'({tree.cand_sum:g} {html.escape(tree.unit)}); baseline {tree.base_sum:g}</text>',
+    ]
+    for node in visible:
+        y = height - (int(tree.depth[node]) + 1) * FRAME_HEIGHT
+        name = "all" if node == 0 else tree.names[tree.frame[node]]
+        base_pct = 100.0 * tree.base_total[node] / tree.base_sum if tree.base_sum else 0.0
+        cand_pct = 100.0 * tree.cand_total[node] / tree.cand_sum
+        delta = float(tree.total_delta[node])
+        z = f", z={tree.total_z[node]:.1f}" if tree.total_z is not None else ""
+        tip = f"{name}: {cand_pct:.2f}% (baseline {base_pct:.2f}%, {delta:+.2f} pts{z})"
+        out.append(
+            f'<g><title>{html.escape(tip)}</title>'
+            f'<rect x="{x[node]:.2f}" y="{y}" width="{widths[node]:.2f}" height="{FRAME_HEIGHT - 1}" '
+            f'fill="{_color(delta, scale, bool(total_significant[node]))}" stroke="#ddd" stroke-width="0.5"/>'
+        )
+        chars = int((widths[node] - 6) / CHAR_PX)
+        if chars >= 3:
+            label = name if len(name) <= chars else name[:chars - 2] + ".."
+            out.append(f'<text x="{x[node] + 3:.2f}" y="{y + FRAME_HEIGHT - 4}">{html.escape(label)}</text>')
+        out.append("</g>")
+    out.append("</svg>")
+    return "\n".join(out)
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare two profiles and draw a differential flame graph.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("-o", "--svg", help="write the differential flame graph here")
+    parser.add_argument("--format", default="")
+    args = parser.parse_args(argv)
+    tree = diff_profiles(args.baseline, args.candidate, args.format)
+    print(json.dumps(tree.summary(), indent=2))
+    if args.svg:
+        with open(args.svg, "w", encoding="utf-8") as f:
+            f.write(render_svg(tree, f"{args.baseline} -> {args.candidate}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,766 @@
+"""
+Profile ingestion and call-tree analysis for flame_graph_summarizer.
+
+Reads the data a flame graph is drawn from instead of the picture:
+
+    folded      Brendan Gregg collapsed stacks ("main;parse;read 42")
+    perf        `perf script` output (stacks are prefixed with the command)
+    speedscope  speedscope JSON, as written by py-spy (sampled and evented)
+    pprof       pprof protobuf, optionally gzipped (decoded here; no
+                protobuf dependency)
+
+Every parser reduces the profile to unique stacks with summed weights, so
+tree building is proportional to distinct stacks, not samples. Formats that
+store every sample (perf script, sampled speedscope) still have to read each
+one: perf samples are counted as raw bytes before any frame is parsed, but
+both run at roughly 0.1-0.2M samples/s, against millions per second for
+folded and pprof input. The stacks are then
+sorted and inserted into a prefix tree: in sorted order every stack shares
+its prefix with the previous one, so each tree node is created exactly once
+without any child lookups. Node totals and per-function aggregates are
+numpy reductions over the node arrays.
+
+Self-check and benchmark (10M samples folded; perf script and sampled
+speedscope at up to RAW_BENCH_SAMPLES):
+    python -m manager.sub_agents.flame_graph_summarizer.profiles --bench 10000000
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional; speedscope files with millions of samples parse several times faster
+    orjson = None
+
+_loads = orjson.loads if orjson else json.loads
+
+FORMATS = ("folded", "perf", "speedscope", "pprof")
+TOP_N = 15
+HOT_PATHS = 5
+# Frames kept from the leaf end of a stack when it is shown to the model.
+PATH_FRAMES = 8
+READ_CHUNK = 1 << 24  # bytes of perf script output per read
+# perf script and sampled speedscope files hold every sample; cap them in --bench (~1 GB of perf text)
+RAW_BENCH_SAMPLES = 1_000_000
+
+Stacks = Dict[Tuple[int, ...], float]  # root-first frame IDs -> summed weight
+COUNT_UNITS = ("", "none", "samples", "count")  # speedscope/pprof units whose weights are sample counts
+
+
+class FrameTable:
+    """Interns frame names to dense integer IDs."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+
+    def id(self, name: str) -> int:
+        frame = self.ids.get(name)
+        if frame is None:
+            frame = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return frame
+
+
+# -------------------- Parsers --------------------
+def parse_folded(lines: Iterable[str], frames: FrameTable) -> Stacks:
+    stacks: Stacks = defaultdict(float)
+    intern = frames.id
+    for line in lines:
+        stack, _, count = line.rstrip("\n").rpartition(" ")
+        if not stack:
+            continue
+        try:
+            weight = float(count)
+        except ValueError:
+            continue
+        stacks[tuple(intern(f) for f in stack.split(";"))] += weight
+    return stacks
+
+
+def _perf_symbol(line: str) -> str:
+    # "\t ffffffff8105e8f6 native_safe_halt+0x6 ([kernel.kallsyms])"
+    parts = line.split(None, 1)
+    rest = parts[1] if len(parts) > 1 else parts[0]
+    symbol, _, dso = rest.rpartition(" (")
+    symbol = symbol or rest
+    offset = symbol.rfind("+0x")
+    if offset > 0:
+        symbol = symbol[:offset]
+    if symbol == "[unknown]" and dso:
+        symbol = f"[{os.path.basename(dso.rstrip(')'))}]"
+    return symbol
+
+
+def _perf_blocks(chunks: Iterable[bytes]) -> Counter:
+    """Count identical samples, (command, frame lines) -> samples, before anything is decoded.
+
+    Samples are separated by blank lines; the rest of the header line (pid,
+    time, period) differs between samples and is dropped.
+    """
+    blocks, tail = Counter(), b""
+
+    def add(block):
+        header, _, body = block.lstrip(b"\n").partition(b"\n")
+        if header.startswith(b"#"):
+            # Comments before the first sample: keep the block whole
+            blocks[b"", block] += 1
+        elif header.strip():
+            blocks[header.split(None, 1)[0], body] += 1
+
+    for chunk in chunks:
+        parts = (tail + chunk).split(b"\n\n")
+        tail = parts.pop()
+        for block in parts:
+            add(block)
+    add(tail)
+    return blocks
+
+
+def _perf_samples(command: str, body: str):
+    """Yield (command, frame lines leaf first) for each sample in a block.
+
+    Usually one; a block holds several when perf recorded no call graphs.
+    """
+    command, stack = command or None, []
+    for line in body.split("\n"):
+        if not line.strip():
+            if command is not None:
+                yield command, stack
+            command, stack = None, []
+        elif line[0] in " \t":
+            if command is not None:
+                stack.append(line)
+        elif not line.startswith("#"):
+            if command is not None:
+                yield command, stack
+            command, stack = line.split(None, 1)[0], []
+    if command is not None:
+        yield command, stack
+
+
+def parse_perf(chunks: Iterable[bytes], frames: FrameTable) -> Stacks:
+    """perf script output: a header line per sample, then one frame per line, leaf first.
+
+    `chunks` is the raw output in pieces of any size (a binary file's lines,
+    or large reads). Identical samples are counted as raw bytes first, so each
+    distinct stack is decoded, parsed and interned once.
+    """
+    stacks: Stacks = defaultdict(float)
+    intern = frames.id
+    symbols: Dict[str, int] = {}
+    for (command, body), count in _perf_blocks(chunks).items():
+        for command, lines in _perf_samples(command.decode("utf-8", "replace"), body.decode("utf-8", "replace")):
+            stack = [intern(command)]
+            for line in reversed(lines):
+                frame = symbols.get(line)
+                if frame is None:
+                    frame = symbols[line] = intern(_perf_symbol(line.strip()))
+                stack.append(frame)
+            stacks[tuple(stack)] += count
+    return stacks
+
+
+def parse_speedscope(data: bytes, frames: FrameTable) -> Tuple[Stacks, str, Optional[Stacks]]:
+    """Returns (stacks, unit, sample counts per stack); counts are None for evented profiles."""
+    document = _loads(data)
+    shared = document.get("shared", {}).get("frames", [])
+    names = []
+    for frame in shared:
+        name = frame.get("name", "?")
+        if frame.get("file"):
+            name += f" ({os.path.basename(frame['file'])}" + (f":{frame['line']})" if frame.get("line") else ")")
+        names.append(frames.id(name))
+    stacks: Stacks = defaultdict(float)
+    counts: Optional[Stacks] = defaultdict(float)
+    unit = "samples"
+    for profile in document.get("profiles", []):
+        unit = profile.get("unit", unit)
+        if profile.get("type") == "sampled":
+            samples = profile.get("samples", [])
+            weights = profile.get("weights")
+            if weights is None or all(w == 1 for w in weights):
+                counted = occurrences = Counter(map(tuple, samples))
+            else:
+                counted = defaultdict(float)
+                for sample, weight in zip(samples, weights):
+                    counted[tuple(sample)] += weight
+                # Weights in a count unit are pre-aggregated samples; in time units each entry is one sample
+                occurrences = counted if unit in COUNT_UNITS else Counter(map(tuple, samples))
+            for sample, weight in counted.items():
+                stack = tuple(names[i] for i in sample)
+                stacks[stack] += weight
+                if counts is not None:
+                    counts[stack] += occurrences[sample]
+        elif profile.get("type") == "evented":
+            counts = None
+            open_frames, last = [], profile.get("startValue", 0)
+            for event in profile.get("events", []):
+                at = event["at"]
+                if open_frames and at > last:
+                    stacks[tuple(names[i] for i in open_frames)] += at - last
+                last = at
+                if event["type"] == "O":
+                    open_frames.append(event["frame"])
+                elif open_frames:
+                    # Close the innermost frame with this index (well-formed files close in order)
+                    index = len(open_frames) - 1 - open_frames[::-1].index(event["frame"])
+                    del open_frames[index:]
+    return stacks, unit, counts
+
+
+def _varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _fields(buf: bytes):
+    """Yield (field number, wire type, value) for each field of a protobuf message."""
+    pos, end = 0, len(buf)
+    while pos < end:
+        key, pos = _varint(buf, pos)
+        wire = key & 7
+        if wire == 0:
+            value, pos = _varint(buf, pos)
+        elif wire == 2:
+            length, pos = _varint(buf, pos)
+            value = buf[pos:pos + length]
+            pos += length
+        elif wire == 1:
+            value, pos = buf[pos:pos + 8], pos + 8
+        elif wire == 5:
+            value, pos = buf[pos:pos + 4], pos + 4
+        else:
+            raise ValueError(f"unsupported protobuf wire type {wire}")
+        yield key >> 3, wire, value
+
+
+def _ints(wire: int, value) -> List[int]:
+    # Repeated scalars may be packed (one length-delimited field) or not.
+    if wire == 0:
+        return [value]
+    out, pos = [], 0
+    while pos < len(value):
+        number, pos = _varint(value, pos)
+        out.append(number)
+    return out
+
+
+def _signed(value: int) -> int:
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def parse_pprof(data: bytes, frames: FrameTable,
+                value_index: Optional[int] = None) -> Tuple[Stacks, str, Optional[Stacks]]:
+    """Decode a pprof Profile message (profile.proto), gzipped or not.
+
+    The sample value used is value_index, else default_sample_type, else the
+    last sample type (pprof's own default). Sample counts per stack come from
+    a count-unit sample type ("samples/count") if there is one, else from the
+    value divided by the sampling period when both are in the same unit; else
+    they are None.
+    """
+    if data[:2] == b"\x1f\x8b":
+        data = gzip.decompress(data)
+    data = memoryview(data)
+    sample_types, samples, locations, functions, strings = [], [], {}, {}, []
+    default_type = period = 0
+    period_type = {}
+    for field, wire, value in _fields(data):
+        if field == 1:
+            sample_types.append({f: v for f, _, v in _fields(value)})
+        elif field == 2:
+            location_ids, values = [], []
+            for f, w, v in _fields(value):
+                if f == 1:
+                    location_ids.extend(_ints(w, v))
+                elif f == 2:
+                    values.extend(_signed(x) for x in _ints(w, v))
+            samples.append((location_ids, values))
+        elif field == 4:
+            location_id, function_ids = 0, []
+            for f, w, v in _fields(value):
+                if f == 1:
+                    location_id = v
+                elif f == 4:
+                    function_ids.append(next((fv for ff, _, fv in _fields(v) if ff == 1), 0))
+            locations[location_id] = function_ids
+        elif field == 5:
+            function = {f: v for f, _, v in _fields(value)}
+            functions[function.get(1, 0)] = function.get(2, 0)
+        elif field == 6:
+            strings.append(bytes(value).decode("utf-8", "replace"))
+        elif field == 11:
+            period_type = {f: v for f, _, v in _fields(value)}
+        elif field == 12:
+            period = value
+        elif field == 14:
+            default_type = value
+
+    if value_index is None:
+        value_index = len(sample_types) - 1
+        for i, sample_type in enumerate(sample_types):
+            if default_type and sample_type.get(1) == default_type:
+                value_index = i
+    unit = "samples"
+    count_index, per_sample = None, 0
+    if sample_types:
+        kind = strings[sample_types[value_index].get(1, 0)]
+        value_unit = strings[sample_types[value_index].get(2, 0)]
+        unit = f"{kind} ({value_unit})"
+        units = [strings[t.get(2, 0)] for t in sample_types]
+        if value_unit in COUNT_UNITS:
+            count_index = value_index
+        elif "count" in units:
+            count_index = units.index("count")
+        elif period > 0 and strings[period_type.get(2, 0)] == value_unit:
+            per_sample = period
+
+    # A location lists its inlined functions innermost first; stacks are root first.
+    location_frames = {
+        location_id: tuple(frames.id(strings[functions.get(f, 0)] or f"0x{location_id:x}") for f in reversed(fids))
+        for location_id, fids in locations.items()
+    }
+    stacks: Stacks = defaultdict(float)
+    counts: Optional[Stacks] = defaultdict(float) if count_index is not None or per_sample else None
+    for location_ids, values in samples:
+        if value_index >= len(values) or not values[value_index]:
+            continue
+        stack = ()
+        for location_id in reversed(location_ids):
+            stack += location_frames.get(location_id, ())
+        stacks[stack] += values[value_index]
+        if count_index is not None:
+            counts[stack] += values[count_index] if count_index < len(values) else 0
+        elif per_sample:
+            counts[stack] += values[value_index] / per_sample
+    return stacks, unit, counts
+
+
+def detect_format(head: bytes) -> str:
+    if head[:2] == b"\x1f\x8b":
+        return "pprof"
+    text = head.lstrip()
+    if text[:1] == b"{":
+        return "speedscope"
+    try:
+        lines = text.decode("utf-8").splitlines()
+    except UnicodeDecodeError:
+        return "pprof"
+    if any(line[:1] in (" ", "\t") and line.strip() for line in lines[1:10]):
+        return "perf"
+    return "folded"
+
+
+def read_stacks(path: str, profile_format: str, frames: FrameTable) -> Tuple[Stacks, str, str, Optional[Stacks]]:
+    """Parse a profile file into (stacks, unit, format, sample counts); the format is auto-detected unless given.
+
+    The counts are the number of samples behind each stack, for significance
+    tests; they are `stacks` itself when the weights are sample counts, and
+    None when the profile does not record them.
+    """
+    with open(path, "rb") as f:
+        head = f.read(4096)
+    profile_format = profile_format or detect_format(head)
+    unit = "samples"
+    if profile_format == "folded":
+        with open(path, encoding="utf-8", errors="replace") as f:
+            stacks = counts = parse_folded(f, frames)
+    elif profile_format == "perf":
+        with open(path, "rb") as f:
+            stacks = counts = parse_perf(iter(lambda: f.read(READ_CHUNK), b""), frames)
+    elif profile_format in ("speedscope", "pprof"):
+        with open(path, "rb") as f:
+            data = f.read()
+        parse = parse_speedscope if profile_format == "speedscope" else parse_pprof
+        stacks, unit, counts = parse(data, frames)
+    else:
+        raise ValueError(f"Unknown profile format {profile_format!r}; expected one of {', '.join(FORMATS)}")
+    return stacks, unit, profile_format, counts
+
+
+def load_profile(path: str, profile_format: str = "") -> "CallTree":
+    """Parse a profile file (format auto-detected unless given) into a CallTree."""
+    frames = FrameTable()
+    stacks, unit, profile_format, _ = read_stacks(path, profile_format, frames)
+    tree = CallTree.build(stacks, frames.names, unit)
+    tree.format = profile_format
+    return tree
+
+
+# -------------------- Call tree --------------------
+def prefix_tree(keys: List[Tuple[int, ...]]):
+    """Insert sorted stacks into a prefix tree.
+
+    Returns node arrays (parent, frame, depth, recursive), the deepest
+    self-nesting of every recursive frame, and the node each stack ends at.
+    """
+    parent, frame, depth, recursive, leaves = [-1], [-1], [0], [False], []
+    path_frames, path_nodes = [], [0]
+    on_path = defaultdict(int)
+    recursion = {}
+    for stack in keys:
+        # Sorted order: the shared prefix with the previous stack already exists, the rest is new.
+        k, limit = 0, min(len(stack), len(path_frames))
+        while k < limit and stack[k] == path_frames[k]:
+            k += 1
+        for f in path_frames[k:]:
+            on_path[f] -= 1
+        del path_frames[k:]
+        del path_nodes[k + 1:]
+        node = path_nodes[-1]
+        for f in stack[k:]:
+            seen = on_path[f]
+            node_parent, node = node, len(parent)
+            parent.append(node_parent)
+            frame.append(f)
+            depth.append(len(path_frames) + 1)
+            recursive.append(seen > 0)
+            if seen and seen >= recursion.get(f, 0):
+                recursion[f] = seen + 1
+            on_path[f] = seen + 1
+            path_frames.append(f)
+            path_nodes.append(node)
+        leaves.append(node)
+    return (
+        np.asarray(parent, dtype=np.int64),
+        np.asarray(frame, dtype=np.int64),
+        np.asarray(depth, dtype=np.int32),
+        np.asarray(recursive, dtype=bool),
+        recursion,
+        np.asarray(leaves, dtype=np.int64),
+    )
+
+
+def subtree_totals(parent: np.ndarray, depth: np.ndarray, self_weight: np.ndarray) -> np.ndarray:
+    """Inclusive weight of every node: its own weight plus all descendants'."""
+    total = self_weight.copy()
+    order = np.argsort(depth, kind="stable")
+    bounds = np.searchsorted(depth[order], np.arange(depth.max() + 2))
+    # Deepest level first: each level adds its totals to its parents.
+    for level in range(depth.max(), 0, -1):
+        nodes = order[bounds[level]:bounds[level + 1]]
+        np.add.at(total, parent[nodes], total[nodes])
+    return total
+
+
+class CallTree:
+    """Prefix tree of stacks as parallel numpy arrays; node 0 is the root.
+
+    parent[i], frame[i] (index into names), depth[i], self_weight[i] and
+    total_weight[i] describe node i; recursive[i] is set when frame[i] also
+    appears among the node's ancestors.
+    """
+
+    def __init__(self, names, parent, frame, depth, self_weight, recursive, unit, recursion=None):
+        self.names = names
+        self.parent = parent
+        self.frame = frame
+        self.depth = depth
+        self.self_weight = self_weight
+        self.recursive = recursive
+        self.unit = unit
+        self.recursion = recursion or {}  # frame -> deepest self-nesting, filled in by build()
+        self.format = ""
+        self.total_weight = self._totals()
+
+    @classmethod
+    def build(cls, stacks: Stacks, names: List[str], unit: str = "samples") -> "CallTree":
+        keys = sorted(stacks)
+        parent, frame, depth, recursive, recursion, leaves = prefix_tree(keys)
+        self_weight = np.zeros(len(parent))
+        np.add.at(self_weight, leaves, np.fromiter((stacks[k] for k in keys), dtype=np.float64, count=len(keys)))
+        return cls(names, parent, frame, depth, self_weight, recursive, unit, recursion)
+
+    def _totals(self) -> np.ndarray:
+        return subtree_totals(self.parent, self.depth, self.self_weight)
+
+    @property
+    def total(self) -> float:
+        return float(self.total_weight[0])
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def path(self, node: int) -> List[str]:
+        names = []
+        while node > 0:
+            names.append(self.names[self.frame[node]])
+            node = self.parent[node]
+        return names[::-1]
+
+    def function_self(self) -> np.ndarray:
+        return np.bincount(self.frame[1:], weights=self.self_weight[1:], minlength=len(self.names))
+
+    def function_total(self) -> np.ndarray:
+        """Inclusive weight per function, counting recursive calls once."""
+        outermost = ~self.recursive
+        outermost[0] = False
+        return np.bincount(self.frame[outermost], weights=self.total_weight[outermost], minlength=len(self.names))
+
+    def recursion_depths(self) -> Dict[str, int]:
+        """Deepest self-nesting of every recursive function (2 = calls itself once)."""
+        return {self.names[f]: depth for f, depth in self.recursion.items()}
+
+    def hot_paths(self, n: int = HOT_PATHS) -> List[Tuple[List[str], float]]:
+        """The n stacks with the most self weight."""
+        top = np.argsort(-self.self_weight, kind="stable")[:n]
+        return [(self.path(node), float(self.self_weight[node])) for node in top if self.self_weight[node] > 0]
+
+    def critical_path(self, min_share: float = 0.05) -> List[Tuple[str, float]]:
+        """Follow the heaviest child from the root while it carries at least min_share of the total."""
+        order = np.argsort(self.parent, kind="stable")
+        starts = np.searchsorted(self.parent[order], np.arange(len(self)))
+        ends = np.searchsorted(self.parent[order], np.arange(len(self)), side="right")
+        path, node = [], 0
+        while True:
+            children = order[starts[node]:ends[node]]
+            if not len(children):
+                break
+            child = children[np.argmax(self.total_weight[children])]
+            if self.total_weight[child] < min_share * self.total:
+                break
+            path.append((self.names[self.frame[child]], float(self.total_weight[child])))
+            node = child
+        return path
+
+
+# -------------------- Summaries --------------------
+def _share(value: float, total: float) -> float:
+    return round(100.0 * value / total, 2) if total else 0.0
+
+
+def _short(path: List[str]) -> str:
+    shown = path[-PATH_FRAMES:]
+    return ("... > " if len(path) > PATH_FRAMES else "") + " > ".join(shown)
+
+
+def _top(values: np.ndarray, names: List[str], n: int) -> List[int]:
+    # Largest first; ties broken by name so the answer does not depend on file order
+    candidates = np.argsort(-values, kind="stable")[: n * 4]
+    return sorted((int(i) for i in candidates if values[i] > 0), key=lambda i: (-values[i], names[i]))[:n]
+
+
+def summarize(tree: CallTree, top_n: int = TOP_N) -> dict:
+    """A small numeric summary of the profile (percentages of total weight)."""
+    total = tree.total
+    self_by_function = tree.function_self()
+    total_by_function = tree.function_total()
+    weighted_depth = float((tree.depth * tree.self_weight).sum() / total) if total else 0.0
+    return {
+        "format": tree.format,
+        "unit": tree.unit,
+        "total_weight": total,
+        "functions": len(tree.names),
+        "call_tree_nodes": len(tree) - 1,
+        "max_stack_depth": int(tree.depth.max()),
+        "mean_stack_depth": round(weighted_depth, 1),
+        "top_self": [
+            {"function": tree.names[f], "self_pct": _share(self_by_function[f], total)}
+            for f in _top(self_by_function, tree.names, top_n)
+        ],
+        "top_total": [
+            {"function": tree.names[f], "total_pct": _share(total_by_function[f], total)}
+            for f in _top(total_by_function, tree.names, top_n)
+        ],
+        "hot_paths": [{"stack": _short(path), "self_pct": _share(w, total)} for path, w in tree.hot_paths()],
+        "critical_path": [{"function": name, "total_pct": _share(w, total)} for name, w in tree.critical_path()],
+        "recursion": dict(sorted(tree.recursion_depths().items(), key=lambda kv: (-kv[1], kv[0]))[:top_n]),
+    }
+
+
+# -------------------- Self-check and benchmark --------------------
+def _synthetic_stacks(samples: int, unique: int = 50_000, seed: int = 7) -> Dict[Tuple[str, ...], int]:
+    rng = random.Random(seed)
+    modules = [f"mod{i}" for i in range(60)]
+    functions = [f"{rng.choice(modules)}.fn{i}" for i in range(4000)]
+    stacks = Counter()
+    shapes = []
+    for _ in range(unique):
+        depth = rng.randint(4, 48)
+        stack = ["main", rng.choice(functions[:8])]
+        while len(stack) < depth:
+            stack.append(rng.choice(functions) if rng.random() > 0.05 else stack[-1])  # some recursion
+        shapes.append(tuple(stack))
+    weights = [1.0 / (i + 1) ** 1.1 for i in range(unique)]
+    scale = samples / sum(weights)
+    for shape, weight in zip(shapes, weights):
+        stacks[shape] += max(1, round(weight * scale))
+    return stacks
+
+
+def _encode_varint(value: int) -> bytes:
+    out = bytearray()
+    value &= (1 << 64) - 1
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _encode_field(field: int, value) -> bytes:
+    if isinstance(value, int):
+        return _encode_varint(field << 3) + _encode_varint(value)
+    return _encode_varint(field << 3 | 2) + _encode_varint(len(value)) + value
+
+
+def _write_pprof(stacks: Dict[Tuple[str, ...], int]) -> bytes:
+    strings = {"": 0}
+
+    def s(text):
+        return strings.setdefault(text, len(strings))
+
+    function_ids = {}
+    out = bytearray(_encode_field(1, _encode_field(1, s("samples")) + _encode_field(2, s("count"))))
+    for stack, count in stacks.items():
+        ids = [function_ids.setdefault(name, len(function_ids) + 1) for name in reversed(stack)]
+        packed = b"".join(_encode_varint(i) for i in ids)
+        out += _encode_field(2, _encode_field(1, packed) + _encode_field(2, _encode_varint(count)))
+    for name, fid in function_ids.items():
+        out += _encode_field(4, _encode_field(1, fid) + _encode_field(4, _encode_field(1, fid)))
+        out += _encode_field(5, _encode_field(1, fid) + _encode_field(2, s(name)))
+    for text in strings:
+        out += _encode_field(6, text.encode())
+    return gzip.compress(bytes(out))
+
+
+def _self_check(directory: str) -> None:
+    stacks = _synthetic_stacks(200_000, unique=2_000)
+    folded = os.path.join(directory, "p.folded")
+    with open(folded, "w") as f:
+        f.writelines(f"{';'.join(stack)} {count}\n" for stack, count in stacks.items())
+    perf = os.path.join(directory, "p.perf")
+    with open(perf, "w") as f:
+        for stack, count in list(stacks.items())[:300]:
+            for _ in range(min(count, 20)):
+                f.write(f"{stack[0]} 1234 [000] 1.000: 1 cpu-clock:\n")
+                f.writelines(f"\t ffff{i:04x} {name}+0x1{i} (/usr/bin/app)\n" for i, name in enumerate(reversed(stack[1:])))
+                f.write("\n")
+    speedscope = os.path.join(directory, "p.speedscope.json")
+    names = sorted({name for stack in stacks for name in stack})
+    index = {name: i for i, name in enumerate(names)}
+    with open(speedscope, "w") as f:
+        json.dump({
+            "shared": {"frames": [{"name": n} for n in names]},
+            "profiles": [{"type": "sampled", "unit": "none",
+                          "samples": [[index[n] for n in stack] for stack in stacks],
+                          "weights": list(stacks.values())}],
+        }, f)
+    pprof = os.path.join(directory, "p.pb.gz")
+    with open(pprof, "wb") as f:
+        f.write(_write_pprof(stacks))
+
+    reference = summarize(load_profile(folded))
+    for path in (speedscope, pprof):
+        tree = load_profile(path)
+        got = summarize(tree)
+        assert got["total_weight"] == reference["total_weight"], (tree.format, got["total_weight"])
+        for key in ("top_self", "top_total", "recursion", "max_stack_depth", "hot_paths", "critical_path"):
+            assert got[key] == reference[key], (tree.format, key)
+        print(f"ok: {tree.format} matches folded ({len(tree) - 1:,} nodes)")
+    perf_tree = load_profile(perf)
+    expected = sum(min(count, 20) for count in list(stacks.values())[:300])
+    assert perf_tree.format == "perf" and perf_tree.total == expected, (perf_tree.format, perf_tree.total)
+    print(f"ok: perf script, {expected:,} samples")
+
+
+def _write_perf(path: str, stacks: Dict[Tuple[str, ...], int]) -> None:
+    # One block per sample, as `perf record -g` + `perf script` writes them
+    with open(path, "w") as f:
+        for n, (stack, count) in enumerate(stacks.items()):
+            frames = "".join(f"\t {0xffff0000 + i:x} {name}+0x{i:x} (/usr/bin/app)\n"
+                             for i, name in enumerate(reversed(stack[1:])))
+            for k in range(count):
+                f.write(f"{stack[0]} {1000 + n % 97} [000] {k}.{n:06d}: 10101 cpu-clock:\n{frames}\n")
+
+
+def _write_speedscope_samples(path: str, stacks: Dict[Tuple[str, ...], int]) -> None:
+    # One entry per sample and no weights, as py-spy writes sampled profiles
+    names = sorted({name for stack in stacks for name in stack})
+    index = {name: i for i, name in enumerate(names)}
+    samples = [[index[n] for n in stack] for stack, count in stacks.items() for _ in range(count)]
+    with open(path, "w") as f:
+        json.dump({"shared": {"frames": [{"name": n} for n in names]},
+                   "profiles": [{"type": "sampled", "unit": "none", "samples": samples}]}, f)
+
+
+def _bench_one(path: str, label: str) -> None:
+    start = time.perf_counter()
+    tree = load_profile(path)
+    loaded = time.perf_counter() - start
+    summary = summarize(tree)
+    elapsed = time.perf_counter() - start
+    print(f"{label}: {tree.total:,.0f} samples, {os.path.getsize(path) / 1e6:,.0f} MB, "
+          f"{len(tree) - 1:,} call-tree nodes")
+    print(f"  parse + build: {loaded:.2f}s, summary: {elapsed - loaded:.2f}s, total {elapsed:.2f}s "
+          f"({tree.total / elapsed / 1e6:.2f}M samples/s)")
+    print(f"  summary size: {len(json.dumps(summary)):,} bytes of JSON")
+
+
+def benchmark(samples: int, directory: str) -> None:
+    """Folded input at `samples`; perf script and sampled speedscope (one record per
+    sample, so files grow with the count) at up to RAW_BENCH_SAMPLES."""
+    stacks = _synthetic_stacks(samples)
+    print(f"{len(stacks):,} unique stacks")
+    folded = os.path.join(directory, "bench.folded")
+    with open(folded, "w") as f:
+        f.writelines(f"{';'.join(stack)} {count}\n" for stack, count in stacks.items())
+    _bench_one(folded, "folded")
+    os.remove(folded)
+
+    raw = _synthetic_stacks(min(samples, RAW_BENCH_SAMPLES))
+    perf = os.path.join(directory, "bench.perf")
+    _write_perf(perf, raw)
+    _bench_one(perf, "perf script")
+    os.remove(perf)
+    speedscope = os.path.join(directory, "bench.speedscope.json")
+    _write_speedscope_samples(speedscope, raw)
+    _bench_one(speedscope, "speedscope (sampled)")
+
+
+def main(argv: Optional[list] = None) -> None:
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Summarize a profile (folded, perf script, speedscope, pprof).")
+    parser.add_argument("path", nargs="?")
+    parser.add_argument("--baseline", help="profile to compare against")
+    parser.add_argument("--format", default="", choices=[""] + list(FORMATS))
+    parser.add_argument("--bench", type=int, nargs="?", const=10_000_000, metavar="SAMPLES")
+    args = parser.parse_args(argv)
+    if args.bench:
+        with tempfile.TemporaryDirectory() as directory:
+            _self_check(directory)
+            benchmark(args.bench, directory)
+    elif args.path:
+        tree = load_profile(args.path, args.format)
+        report = summarize(tree)
+        if args.baseline:
+            from manager.sub_agents.flame_graph_summarizer.diff import diff_profiles
+
+            report["diff"] = diff_profiles(args.baseline, args.path).summary()
+        print(json.dumps(report, indent=2))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,52 @@
 from google.adk.agents import Agent
 from google.adk.tools import google_search
+from google.adk.tools.tool_context import ToolContext
+from common.image_batch import caption_directory
+
+# Captions beyond this many are left in the JSONL cache rather than returned to the model
+MAX_RETURNED_CAPTIONS = 200
+
+
+def caption_image_directory(directory: str, tool_context: ToolContext) -> dict:
+    """Caption every image under a directory (e.g. an incident screenshot dump).
+
+    Near-duplicate screenshots are captioned once, and images captioned on an
+    earlier run come from the cache; see common/image_batch.py.
+    """
+    print(f"--- Tool: caption_image_directory called for {directory} ---")
+    try:
+        report = caption_directory(directory)
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+    results = report.pop("results")
+    # Duplicates repeat their representative's caption, so list each caption once with its file count
+    grouped = {}
+    for result in results:
+        if result["status"] != "success":
+            continue
+        key = result.get("duplicate_of", result["sha256"])
+        entry = grouped.setdefault(key, {"caption": result["caption"], "paths": []})
+        entry["paths"].append(result["path"])
+    captions = [
+        {"path": g["paths"][0], "similar_images": len(g["paths"]) - 1, "caption": g["caption"]}
+        for g in grouped.values()
+    ]
+    return {
+        "status": "success",
+        **report,
+        "captions": captions[:MAX_RETURNED_CAPTIONS],
+        "captions_omitted": max(0, len(captions) - MAX_RETURNED_CAPTIONS),
+        "errors": [{"path": r["path"], "error": r["error"]} for r in results if r["status"] == "error"][:20],
+    }
+
 
 image_summarizer = Agent(
     name="image_summarizer",
     model="gemini-2.0-flash",
-    description="Image Summarizer for given image",
-    instruction="""Generate an image summary for the given image in 5-10 sentences.""",
-    tools=[],
+    description="Image Summarizer for given image, or for every image in a directory of screenshots",
+    instruction="""Generate an image summary for the given image in 5-10 sentences.
+If you are given a directory path instead of an image, call caption_image_directory with it, then summarize
+what the images show as a whole (group similar screenshots, call out anything security-relevant), and
+mention how many images were captioned, cached, duplicates or failed.""",
+    tools=[caption_image_directory],
 )
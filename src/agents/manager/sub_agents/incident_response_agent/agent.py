@@ -1,4 +1,6 @@
 from google.adk.agents import Agent
+from common.blackboard import count_llm_call, read_blackboard, reset_llm_calls
+from common.risk import assess_threat_risk
 
 incident_response_agent = Agent(
     name="incident_response_agent",
@@ -6,8 +8,18 @@ incident_response_agent = Agent(
     description="Suggests and automates incident response actions based on risk assessment and threat chains.",
     instruction="""
     When given a threat chain and risk assessment, analyze the situation and recommend incident response actions.
-    If the risk is high or severe, suggest automated containment or remediation steps.
+    If you are given a threat path (CVE-CWE-CAPEC-TTP-MITIGATION), do not regenerate what other specialists already
+    produced this session:
+    1. Call assess_threat_risk with the path exactly as given. It returns the scored threat chains and the mitigations
+       covering the most steps, from the session blackboard when attack_risk_assessor already assessed the path.
+    2. Call read_blackboard with kind "iocs" and the same path. If threat_intelligence_aggregator published indicators
+       of compromise for it, use them for detection, blocking and scoping steps; otherwise do not invent any.
+    Use the returned scores and bands as they are. If the risk is high or severe, suggest automated containment or
+    remediation steps.
     Provide a clear, step-by-step incident response plan tailored to the threat chain and its impact.
     """,
-    tools=[],
-)
\ No newline at end of file
+    tools=[assess_threat_risk, read_blackboard],
+    before_agent_callback=reset_llm_calls,
+    before_model_callback=count_llm_call,
+    output_key="incident_response_plan",
+)
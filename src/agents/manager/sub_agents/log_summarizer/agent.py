@@ -1,46 +1,77 @@
+import time
+
 from google.adk.agents import Agent
 from google.adk.tools.tool_context import ToolContext
+from manager.sub_agents.log_summarizer.anomaly import scan_anomalies
+from manager.sub_agents.log_summarizer.parsers import parse_entry, parse_file
 
 def summarize_threat_log(log_entry: str, tool_context: ToolContext) -> dict:
     """Summarize a cyber threat log entry, extracting key information like attack type, affected system, and timestamp."""
     print(f"--- Tool: summarize_threat_log called for log_entry: {log_entry} ---")
 
-    attack_types = ["malware", "phishing", "sql injection", "ddos", "ransomware"]
-    affected_systems = ["server", "database", "network", "workstation", "cloud"]
-    
-    # Default response in case we cannot extract key details
+    # The entry may be JSON, CEF, LEEF, RFC5424 syslog, EVTX XML or the bracketed format; see parsers.py.
+    event = parse_entry(log_entry)
+    attack_type, affected_system, timestamp = event.attack_type, event.affected_system, event.timestamp
     summary = {
-        "attack_type": "unknown",
-        "affected_system": "unknown",
-        "timestamp": "unknown",
-        "log_entry": log_entry,
-        "summary": "",
-        "detailed_summary": ""
+        "format": event.format,
+        "attack_type": attack_type,
+        "affected_system": affected_system,
+        "timestamp": timestamp,
+        "host": event.host,
+        "source_ip": event.src_ip,
+        "destination_ip": event.dst_ip,
+        "iocs": {"ips": event.ips, "domains": event.domains, "hashes": event.hashes, "users": event.users},
+        "summary": f"Attack Type: {attack_type}\nAffected System: {affected_system}\nTimestamp: {timestamp}",
     }
-    
-    # Find attack type
-    for attack in attack_types:
-        if attack in log_entry.lower():
-            summary["attack_type"] = attack
-    
-    # Find affected system
-    for system in affected_systems:
-        if system in log_entry.lower():
-            summary["affected_system"] = system
-    
-    # Extract timestamp (a simplified example, assuming timestamp is included in the format [YYYY-MM-DD HH:MM:SS])
-    import re
-    timestamp_match = re.search(r"\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\]", log_entry)
-    if timestamp_match:
-        summary["timestamp"] = timestamp_match.group(1)
-
-    # Generate a detailed summary
-    summary["summary"] = f"Attack Type: {summary['attack_type']}\nAffected System: {summary['affected_system']}\nTimestamp: {summary['timestamp']}"
-    summary["detailed_summary"] = f"{summary['summary']}\n\nDetailed Log Entry:\n{log_entry}"
+    # The raw entry is returned once, at the top level, rather than echoed into every field.
+    summary["detailed_summary"] = f"{summary['summary']}\n\nDetailed Log Entry: see log_entry"
 
     return {"status": "success", "summary": summary, "log_entry": log_entry}
 
 
+def summarize_threat_log_file(file_path: str, bucket: str, tool_context: ToolContext) -> dict:
+    """Parse a whole threat log file and roll its events up into incidents.
+
+    The log format is detected from the start of the file. Events are grouped by attack
+    type, affected system, source IP and time bucket ("minute", "hour" or "day"), and the
+    most frequent IPs, domains, hashes and users are counted (for legacy and plain-text logs,
+    the source IPs of attack lines); only this compact summary is returned, never raw lines.
+    """
+    print(f"--- Tool: summarize_threat_log_file called for file: {file_path} (bucket={bucket}) ---")
+    try:
+        start = time.perf_counter()
+        log_format, summary = parse_file(file_path, "", bucket or "hour")
+        elapsed = time.perf_counter() - start
+    except (OSError, ValueError) as e:
+        return {"status": "error", "message": str(e)}
+
+    return {
+        "status": "success",
+        "file": file_path,
+        "format": log_format,
+        **summary.to_dict(),
+        "parse_seconds": round(elapsed, 3),
+    }
+
+
+def find_log_anomalies(file_path: str, top_n: int, tool_context: ToolContext) -> dict:
+    """Score a log file locally and return only its top_n most anomalous time windows.
+
+    Each window (per host or user, else source IP or affected system) carries its event
+    count against the usual rate, new IPs, rare tokens, attack events and a few sample
+    events, so the rest of the log never has to be read by the model.
+    """
+    print(f"--- Tool: find_log_anomalies called for file: {file_path} (top_n={top_n}) ---")
+    try:
+        start = time.perf_counter()
+        result = scan_anomalies(file_path, top_n=top_n or 20)
+        elapsed = time.perf_counter() - start
+    except (OSError, ValueError) as e:
+        return {"status": "error", "message": str(e)}
+
+    return {"status": "success", "file": file_path, **result, "scan_seconds": round(elapsed, 3)}
+
+
 # Create the Cyber Threat Log Summarizing Agent
 log_summarizer = Agent(
     name="log_summarizer",
@@ -48,6 +79,13 @@ log_summarizer = Agent(
     description="An agent that summarizes cyber threat logs, extracting key details like attack type, affected system, timestamp and all the details.",
     instruction=""" 
 You are an agent that summarizes cyber threat logs. Given a log entry, you should:
+(If you are given a path to a log file instead of a single entry, call summarize_threat_log_file once for the whole file with bucket "hour",
+or "minute"/"day" if the user asks for that granularity. It returns the detected log format, the most frequent IOCs (IPs, domains, hashes, users) and hosts, and an incident
+rollup under "incidents": event counts per attack type and affected system, distinct source IPs, the largest incident
+groups with first/last seen, and the most active source IPs. Summarize the incidents and IOCs from it.)
+To find what is unusual in a large log, call find_log_anomalies (top_n 20 unless the user asks otherwise) and summarize
+only the windows it returns: explain why each one scored high (event rate vs. expected, new IPs, rare tokens, attacks).
+Log entries may be JSON, CEF, LEEF, RFC5424 syslog, Windows event XML or bracketed text; the tools detect the format.
 1. Extract key details such as the attack type, affected system, timestamp and all the details.
 2. Return a summary containing these details.
 3. The Summary should be structured and detailed enough with sections like Attacker, Affected System, Timestamp, commands used to perform an attack with a simple exaplanation and what the command does, how does it affect the target and so on.
@@ -69,5 +107,5 @@ Detailed Summary:
  At [2023-08-01 14:30:00] a phishing attack was detected on cloud system: Suspicious email activity reported from IP 192.168.1.1.
  
 """,
-    tools=[summarize_threat_log],
+    tools=[summarize_threat_log, summarize_threat_log_file, find_log_anomalies],
 )
@@ -0,0 +1,345 @@
+"""
+Streaming anomaly pre-filter in front of the log_summarizer LLM.
+
+Events (parsers.Event) are counted per entity (host and user; source IP, or
+else affected system, for events that name neither) in fixed time windows.
+When an entity's window closes it is scored against that entity's own
+history and the whole stream so far:
+
+    rate     z-score of the window's event count against a per-entity EWMA
+             of counts per window (mean and variance)
+    new_ips  source/destination IPs never seen before, from a Bloom filter
+    rarity   surprisal (bits) of the rarest token in the window - message
+             template, domains, hashes, users - from a Count-Min sketch
+    attacks  events the parser already classified as an attack
+
+Only the `top_n` highest scoring windows, with a few sample events each,
+are kept and handed to the agent. All state is bounded: the entity table
+is an LRU of `max_entities`, the sketches have fixed size.
+
+Replay benchmark:
+    python -m manager.sub_agents.log_summarizer.anomaly --bench 50000000
+"""
+
+import argparse
+import calendar
+import functools
+import heapq
+import json
+import math
+import random
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+
+from manager.sub_agents.log_summarizer.parsers import Event, iter_events
+from manager.sub_agents.log_summarizer.rollup import BloomFilter, CountMinSketch
+
+WINDOW_SECONDS = 300
+EWMA_ALPHA = 0.1
+MIN_HISTORY = 6  # windows an entity needs before its rate z-score counts
+WARMUP_EVENTS = 10_000  # no new-IP or rarity signal until the sketches have seen this many events
+RARE_BITS = 14.0  # tokens seen less often than 1 in 2**14 events count as rare
+SAMPLES_PER_WINDOW = 5
+WEIGHTS = {"rate": 1.0, "new_ips": 2.0, "rarity": 0.5, "attacks": 3.0}
+_TEMPLATE_TABLE = str.maketrans("0123456789", "##########")
+
+
+@functools.lru_cache(maxsize=1 << 14)
+def _minute_epoch(prefix: str) -> int:
+    # prefix is "YYYY-MM-DD HH:MM"; events of the same minute share one strptime.
+    return calendar.timegm(time.strptime(prefix, "%Y-%m-%d %H:%M"))
+
+
+def event_epoch(timestamp: str) -> Optional[int]:
+    """Seconds since the epoch for a parsers.Event timestamp, or None if it is unknown."""
+    if len(timestamp) < 19 or timestamp[4] != "-":
+        return None
+    try:
+        return _minute_epoch(timestamp[:16]) + int(timestamp[17:19])
+    except ValueError:
+        return None
+
+
+def event_tokens(event: Event) -> List[str]:
+    """Tokens whose rarity is tracked: the message template (digits masked) and the IOCs."""
+    tokens = ["m:" + event.message[:80].translate(_TEMPLATE_TABLE)]
+    tokens.extend("d:" + d for d in event.domains)
+    tokens.extend("h:" + h for h in event.hashes)
+    tokens.extend("u:" + u for u in event.users)
+    return tokens
+
+
+class _Entity:
+    __slots__ = ("window", "count", "new_ips", "rarity", "attacks", "samples", "mean", "var", "history")
+
+    def __init__(self, window: int):
+        self.mean = 0.0
+        self.var = 0.0
+        self.history = 0
+        self._open(window)
+
+    def _open(self, window: int) -> None:
+        self.window = window
+        self.count = 0
+        self.new_ips = 0
+        self.rarity = 0.0
+        self.attacks = 0
+        self.samples = []
+
+    def update_baseline(self, count: float) -> None:
+        diff = count - self.mean
+        self.mean += EWMA_ALPHA * diff
+        self.var = (1 - EWMA_ALPHA) * (self.var + EWMA_ALPHA * diff * diff)
+        self.history += 1
+
+
+class AnomalyFilter:
+    def __init__(
+        self,
+        top_n: int = 20,
+        window_seconds: int = WINDOW_SECONDS,
+        max_entities: int = 200_000,
+    ):
+        self.top_n = top_n
+        self.window_seconds = window_seconds
+        self.max_entities = max_entities
+        self.entities: "OrderedDict[str, _Entity]" = OrderedDict()
+        self.seen_ips = BloomFilter()
+        self.tokens = CountMinSketch(width=1 << 16, depth=4)
+        self.events = 0
+        self.windows_scored = 0
+        self._top: list = []  # min-heap of (score, seq, window)
+        self._seq = 0
+
+    # ---- scoring ----
+    def _score(self, entity: _Entity) -> tuple:
+        """Return (score, rate z-score) for the entity's current window."""
+        rate_z = 0.0
+        if entity.history >= MIN_HISTORY:
+            rate_z = max(0.0, (entity.count - entity.mean) / math.sqrt(entity.var + 1.0))
+        rarity = max(0.0, entity.rarity - RARE_BITS)
+        return (
+            WEIGHTS["rate"] * min(rate_z, 20.0)
+            + WEIGHTS["new_ips"] * min(entity.new_ips, 10)
+            + WEIGHTS["rarity"] * rarity
+            + WEIGHTS["attacks"] * min(entity.attacks, 10)
+        ), rate_z
+
+    def _close(self, key: str, entity: _Entity) -> None:
+        self.windows_scored += 1
+        score, rate_z = self._score(entity)
+        expected = entity.mean
+        entity.update_baseline(entity.count)
+        if score <= 0 or (len(self._top) >= self.top_n and score <= self._top[0][0]):
+            return
+        kind, _, name = key.partition(":")
+        window = {
+            "entity_type": kind,
+            "entity": name,
+            "window_start": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(entity.window * self.window_seconds)),
+            "window_seconds": self.window_seconds,
+            "events": entity.count,
+            "score": round(score, 2),
+            "rate_zscore": round(rate_z, 2),
+            "expected_events": round(expected, 1),
+            "new_ips": entity.new_ips,
+            "rarest_token_bits": round(entity.rarity, 1),
+            "attack_events": entity.attacks,
+            "sample_events": entity.samples,
+        }
+        self._seq += 1
+        if len(self._top) < self.top_n:
+            heapq.heappush(self._top, (score, self._seq, window))
+        else:
+            heapq.heappushpop(self._top, (score, self._seq, window))
+
+    def _advance(self, key: str, window: int) -> _Entity:
+        entities = self.entities
+        entity = entities.get(key)
+        if entity is None:
+            entity = entities[key] = _Entity(window)
+            if len(entities) > self.max_entities:
+                old_key, old = entities.popitem(last=False)
+                self._close(old_key, old)
+            return entity
+        entities.move_to_end(key)
+        if window > entity.window:
+            self._close(key, entity)
+            # Quiet windows in between count as zero events (bounded, the EWMA forgets them anyway).
+            for _ in range(min(window - entity.window - 1, 50)):
+                entity.update_baseline(0.0)
+            entity._open(window)
+        return entity
+
+    # ---- input ----
+    def add(self, event: Event) -> None:
+        epoch = event_epoch(event.timestamp)
+        if epoch is None:
+            return
+        self.events += 1
+        warm = self.events > WARMUP_EVENTS
+
+        new_ips = 0
+        for ip in event.ips:
+            if not self.seen_ips.add(ip) and warm:
+                new_ips += 1
+        rarity = 0.0
+        tokens = self.tokens
+        for token in event_tokens(event):
+            seen = tokens.add(token)
+            if warm:
+                rarity = max(rarity, math.log2(self.events / seen))
+        attack = event.attack_type != "unknown"
+
+        window = epoch // self.window_seconds
+        keys = []
+        if event.host:
+            keys.append("host:" + event.host)
+        if event.users:
+            keys.append("user:" + event.users[0])
+        # Legacy lines rarely name a host or user; fall back to who attacked, then what was hit.
+        if not keys:
+            if event.src_ip:
+                keys.append("ip:" + event.src_ip)
+            elif event.affected_system != "unknown":
+                keys.append("system:" + event.affected_system)
+        for key in keys:
+            entity = self._advance(key, window)
+            entity.count += 1
+            entity.new_ips += new_ips
+            entity.attacks += attack
+            if rarity > entity.rarity:
+                entity.rarity = rarity
+            # Keep the events that made the window interesting, not just the first ones.
+            if len(entity.samples) < SAMPLES_PER_WINDOW and (new_ips or attack or rarity > RARE_BITS or not entity.samples):
+                entity.samples.append(_sample(event))
+
+    def add_events(self, events: Iterable[Event]) -> "AnomalyFilter":
+        add = self.add
+        for event in events:
+            add(event)
+        return self
+
+    def flush(self) -> None:
+        """Score every still-open window (call at end of input)."""
+        for key, entity in self.entities.items():
+            self._close(key, entity)
+            entity._open(entity.window + 1)
+
+    def top(self) -> List[dict]:
+        return [w for _, _, w in sorted(self._top, key=lambda t: -t[0])]
+
+    def to_dict(self) -> dict:
+        windows = self.top()
+        forwarded = sum(w["events"] for w in windows)
+        return {
+            "events": self.events,
+            "windows_scored": self.windows_scored,
+            "entities_tracked": len(self.entities),
+            "top_windows": windows,
+            # Host and user windows can overlap, so this is an upper bound.
+            "events_in_top_windows": forwarded,
+            "fraction_forwarded": round(forwarded / self.events, 6) if self.events else 0.0,
+        }
+
+
+def _sample(event: Event) -> dict:
+    return {
+        "timestamp": event.timestamp,
+        "attack_type": event.attack_type,
+        "src_ip": event.src_ip,
+        "dst_ip": event.dst_ip,
+        "users": list(event.users),
+        "domains": list(event.domains),
+        "message": event.message,
+    }
+
+
+def scan_anomalies(path: str, top_n: int = 20, window_seconds: int = WINDOW_SECONDS, log_format: str = "") -> dict:
+    """Parse a log file and return its top-N anomalous windows."""
+    detector = AnomalyFilter(top_n=top_n, window_seconds=window_seconds)
+    detector.add_events(iter_events(path, log_format))
+    detector.flush()
+    return detector.to_dict()
+
+
+# -------------------- Replay benchmark --------------------
+def _synthetic_events(n: int, hosts: int = 2000, seed: int = 11) -> Iterable[Event]:
+    """A steady stream from `hosts` hosts with a handful of injected anomalies.
+
+    Injected: a 40x burst on host-13, a never-seen IP on host-77 and a mimikatz
+    hash on host-501, each roughly two thirds into the stream.
+    """
+    rng = random.Random(seed)
+    start = 1_714_521_600  # 2024-05-01 00:00:00 UTC
+    per_second = 200
+    inject_at = int(n * 0.66)
+    messages = [
+        "Accepted publickey for deploy from {ip} port 52234",
+        "GET /api/v1/health HTTP/1.1 200 17 from {ip}",
+        "DNS query for updates.example.com from {ip}",
+        "Scheduled task backup completed on volume 3",
+    ]
+    base = [
+        Event("json", "", f"host-{h}", "unknown", "unknown", f"10.0.{h % 250}.{h % 200 + 1}", "10.1.0.1",
+              (f"10.0.{h % 250}.{h % 200 + 1}", "10.1.0.1"), ("updates.example.com",), (), (f"svc{h % 50}",),
+              rng.choice(messages).format(ip=f"10.0.{h % 250}.{h % 200 + 1}"))
+        for h in range(hosts)
+    ]
+    ts_cache = {}
+    for i in range(n):
+        second = start + i // per_second
+        ts = ts_cache.get(second)
+        if ts is None:
+            ts_cache.clear()
+            ts = ts_cache[second] = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(second))
+        if inject_at <= i < inject_at + 2000 and i % 2 == 0:
+            template = base[13]  # burst
+        else:
+            template = base[rng.randrange(hosts)]
+        event = template._replace(timestamp=ts)
+        if i == inject_at + 5:
+            event = base[77]._replace(timestamp=ts, ips=("203.0.113.66",), src_ip="203.0.113.66",
+                                      message="Accepted password for root from 203.0.113.66 port 4444")
+        elif i == inject_at + 9:
+            event = base[501]._replace(timestamp=ts, hashes=("61c0810a23580cf492a6ba4f7654566108331e7a4134c968c2d6a05261b2d8a1",),
+                                       message="Process created mimikatz.exe sekurlsa::logonpasswords")
+        yield event
+
+
+def benchmark(n: int, top_n: int = 20) -> None:
+    detector = AnomalyFilter(top_n=top_n)
+    start = time.perf_counter()
+    detector.add_events(_synthetic_events(n))
+    detector.flush()
+    elapsed = time.perf_counter() - start
+    result = detector.to_dict()
+    found = {w["entity"] for w in result["top_windows"]}
+    print(f"replayed {n:,} events in {elapsed:.1f}s -> {n / elapsed / 1e3:.0f}k events/s "
+          f"(includes synthetic event generation)")
+    print(f"{result['windows_scored']:,} windows scored, {len(result['top_windows'])} forwarded "
+          f"holding {result['events_in_top_windows']:,} events: the LLM never sees "
+          f"{1 - result['fraction_forwarded']:.4%} of the log")
+    print("injected anomalies in top windows:",
+          {name: name in found for name in ("host-13", "host-77", "host-501")})
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Find the most anomalous windows of a log, or benchmark the filter.")
+    parser.add_argument("path", nargs="?", help="log file to scan")
+    parser.add_argument("--top", type=int, default=20, help="windows to keep")
+    parser.add_argument("--window", type=int, default=WINDOW_SECONDS, help="window length in seconds")
+    parser.add_argument("--bench", type=int, nargs="?", const=50_000_000, metavar="EVENTS",
+                        help="replay a synthetic stream of EVENTS events (default 50M)")
+    args = parser.parse_args(argv)
+    if args.bench:
+        benchmark(args.bench, args.top)
+    elif args.path:
+        print(json.dumps(scan_anomalies(args.path, args.top, args.window), indent=2))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,703 @@
+"""
+Parser registry for the log formats our feeds deliver.
+
+Each format registers a `sniff` function (the share of sample lines it
+recognizes) and a `parse` function turning one record into an Event with
+typed IOC fields (IPs, domains, hashes, users). The format of a file is
+detected from its first few KB; lines the detected parser rejects are still
+scanned for IOCs by the plain-text parser.
+
+Registered formats: JSON lines (EDR exports), CEF, LEEF, RFC5424 syslog,
+Windows EVTX rendered as XML, and the bracketed "[YYYY-MM-DD HH:MM:SS] ..."
+lines summarize_threat_log always handled.
+
+Legacy and plain-text files skip the per-record parsers: stream.scan_file
+finds the lines with an attack or system keyword in large chunks, and only
+those lines (their source IP, attack type, system and timestamp) reach the
+summary. Large files in the structured formats are split into shards at
+record boundaries (newlines, or </Event> for EVTX) and parsed in a process
+pool; every worker returns a bounded LogSummary which the parent merges.
+
+    python -m manager.sub_agents.log_summarizer.parsers /var/log/edr.jsonl --workers 8
+"""
+
+import argparse
+import html
+import json
+import multiprocessing
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from manager.sub_agents.log_summarizer.rollup import IncidentRollup, TopK
+from manager.sub_agents.log_summarizer.stream import TIMESTAMP_RE, classify, scan_file
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib parser is several times slower on EDR exports
+    orjson = None
+
+_loads = orjson.loads if orjson else json.loads
+
+SNIFF_BYTES = 4096
+CHUNK_SIZE = 8 * 1024 * 1024
+# Files smaller than this are parsed in-process; pool start-up would cost more than it saves.
+MIN_PARALLEL_BYTES = 64 * 1024 * 1024
+IOC_KINDS = ("ips", "domains", "hashes", "users")
+# Formats summarized by stream.scan_file instead of their parse function.
+SCANNED_FORMATS = ("legacy", "plain")
+HASH_TYPES = {32: "md5", 40: "sha1", 64: "sha256"}
+
+
+class Event(NamedTuple):
+    format: str
+    timestamp: str  # "YYYY-MM-DD HH:MM:SS" as written in the log (no timezone conversion), or "unknown"
+    host: str
+    attack_type: str
+    affected_system: str
+    src_ip: str
+    dst_ip: str
+    ips: Tuple[str, ...]
+    domains: Tuple[str, ...]
+    hashes: Tuple[str, ...]  # see hash_type()
+    users: Tuple[str, ...]
+    message: str
+
+
+class LogFormat(NamedTuple):
+    name: str
+    sniff: Callable[[List[str]], float]
+    parse: Callable[[str], Optional[Event]]
+    delimiter: bytes
+
+
+FORMATS: Dict[str, LogFormat] = {}
+
+
+def register(name: str, sniff: Callable[[List[str]], float], delimiter: bytes = b"\n"):
+    """Register a parser. On equal sniff scores the format registered first wins."""
+
+    def decorator(parse: Callable[[str], Optional[Event]]):
+        FORMATS[name] = LogFormat(name, sniff, parse, delimiter)
+        return parse
+
+    return decorator
+
+
+# -------------------- IOC extraction --------------------
+HASH_RE = re.compile(r"\b[0-9a-fA-F]{32}(?:[0-9a-fA-F]{8}(?:[0-9a-fA-F]{24})?)?\b")
+IPV4_RE = re.compile(r"(?:25[0-5]|2[0-4]\d|1?\d?\d)(?:\.(?:25[0-5]|2[0-4]\d|1?\d?\d)){3}")
+SSH_USER_RE = re.compile(r"\bfor (?:invalid user )?([A-Za-z0-9._-]{1,64}) from\b")
+# Dotted names that are file names rather than domains.
+NOT_TLDS = frozenset(
+    "exe dll sys bat cmd ps1 vbs js py sh log txt tmp dat bin conf cfg ini xml json yaml yml html htm php asp aspx "
+    "jsp zip gz tar rar doc docx xls xlsx pdf png jpg gif so jar class".split()
+)
+USER_KEYS = frozenset(
+    ("user", "username", "user_name", "suser", "duser", "usrname", "account", "accountname",
+     "targetusername", "subjectusername")
+)
+HEX_DIGITS = frozenset("0123456789abcdefABCDEF")
+TOKEN_PUNCTUATION = "\"'<>()[]{},;|.:!?"
+NO_USER = frozenset(("-", "", "n/a", "null", "none", "system", "local service", "network service"))
+
+
+def hash_type(value: str) -> str:
+    """md5, sha1 or sha256, from the length of a hex digest."""
+    return HASH_TYPES.get(len(value), "unknown")
+
+
+def _unique(values) -> tuple:
+    return tuple(dict.fromkeys(v for v in values if v))
+
+
+def extract_iocs(text: str) -> dict:
+    """Return the IPv4 addresses, domains, hashes and user names found in free text.
+
+    Works on whitespace tokens with plain string tests: one str.split() plus a few checks
+    per candidate token is several times cheaper than running a regex per IOC kind
+    over every record.
+    """
+    ips, domains, hashes, users = [], [], [], []
+    for token in text.split():
+        if "." not in token and "=" not in token and len(token) < 32:
+            continue
+        if "=" in token:
+            key, _, token = token.partition("=")
+            if key.strip(TOKEN_PUNCTUATION).lower() in USER_KEYS:
+                users.append(token.strip(TOKEN_PUNCTUATION))
+                continue
+        token = token.strip(TOKEN_PUNCTUATION)
+        if "." in token:
+            if "://" in token:
+                token = token.split("/")[2]
+            token = token.rsplit("@", 1)[-1].split("/", 1)[0].split(":", 1)[0]
+            labels = token.split(".")
+            if len(labels) == 4 and all(l.isdigit() and len(l) < 4 and int(l) < 256 for l in labels):
+                ips.append(token)
+            elif all(labels) and labels[-1].isalpha() and 1 < len(labels[-1]) < 25 and labels[-1].lower() not in NOT_TLDS:
+                domains.append(token.lower())
+        elif len(token) in HASH_TYPES and HEX_DIGITS.issuperset(token):
+            hashes.append(token.lower())
+    if " from " in text:
+        users += SSH_USER_RE.findall(text)
+    return {
+        "ips": _unique(ips),
+        "domains": _unique(domains),
+        "hashes": _unique(hashes),
+        "users": _unique(u for u in users if u.lower() not in NO_USER),
+    }
+
+
+# -------------------- Classification --------------------
+# Structured feeds name techniques the legacy keywords never covered. Only used when
+# stream.classify finds none of its keywords.
+EXTRA_ATTACK_TYPES = (
+    ("brute force", ("brute force", "brute-force", "failed password", "logon failure", "authentication failure")),
+    ("port scan", ("port scan", "portscan", "nmap")),
+    ("credential access", ("mimikatz", "lsass", "credential dump")),
+    ("lateral movement", ("lateral movement", "psexec")),
+    ("command and control", ("command and control", "c2 beacon", "beacon")),
+    ("exfiltration", ("exfiltration", "data exfil")),
+)
+# Security/Sysmon event IDs that indicate an attack on their own.
+WINDOWS_EVENT_IDS = {
+    "4625": "brute force",
+    "4740": "brute force",
+    "4648": "lateral movement",
+    "1102": "log tampering",
+    "4720": "account manipulation",
+    "4732": "account manipulation",
+}
+
+
+def _classify(signals: str, timestamp: str = "unknown") -> Tuple[str, str, str]:
+    attack, system, ts = classify(signals)
+    if attack == "unknown":
+        lower = signals.lower()
+        for name, keywords in EXTRA_ATTACK_TYPES:
+            if any(k in lower for k in keywords):
+                attack = name
+                break
+    return attack, system, timestamp if timestamp != "unknown" else ts
+
+
+_ISO_TS_RE = re.compile(r"(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}:\d{2})")
+_MON_TS_RE = re.compile(r"\b([A-Z][a-z]{2}) +(\d{1,2}) (\d{4}) (\d{2}:\d{2}:\d{2})")
+_MONTHS = {m: i for i, m in enumerate("Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec".split(), 1)}
+
+
+def normalize_timestamp(value) -> str:
+    """Bring ISO 8601, epoch (s or ms) and CEF 'MMM dd yyyy HH:mm:ss' times to 'YYYY-MM-DD HH:MM:SS'."""
+    if value is None or value == "":
+        return "unknown"
+    text = str(value).strip()
+    if text.isdigit() and len(text) >= 9:
+        seconds = int(text) / (1000 if len(text) >= 12 else 1)
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(seconds))
+    m = _ISO_TS_RE.search(text)
+    if m:
+        return f"{m.group(1)} {m.group(2)}"
+    m = _MON_TS_RE.search(text)
+    if m and m.group(1) in _MONTHS:
+        return f"{m.group(3)}-{_MONTHS[m.group(1)]:02d}-{int(m.group(2)):02d} {m.group(4)}"
+    return "unknown"
+
+
+def _event(
+    fmt: str,
+    text: str,
+    signals: str,
+    timestamp: str = "unknown",
+    host: str = "",
+    src_ip: str = "",
+    dst_ip: str = "",
+    users: tuple = (),
+    hashes: tuple = (),
+) -> Event:
+    """Build an Event from the parsed fields plus whatever IOCs the record text contains."""
+    iocs = extract_iocs(text)
+    ips = _unique((src_ip, dst_ip) + iocs["ips"])
+    attack, system, timestamp = _classify(signals, timestamp)
+    return Event(
+        format=fmt,
+        timestamp=timestamp,
+        host=host or "",
+        attack_type=attack,
+        affected_system=system,
+        src_ip=src_ip or (ips[0] if ips else ""),
+        dst_ip=dst_ip or "",
+        ips=ips,
+        domains=iocs["domains"],
+        hashes=_unique(tuple(h.lower() for h in hashes) + iocs["hashes"]),
+        users=_unique(tuple(u for u in users if u and u.lower() not in NO_USER) + iocs["users"]),
+        message=signals[:300],
+    )
+
+
+def _line_ratio(lines: List[str], predicate) -> float:
+    return sum(1 for line in lines if predicate(line)) / len(lines) if lines else 0.0
+
+
+# -------------------- JSON lines --------------------
+JSON_FIELDS = {
+    "timestamp": ("@timestamp", "timestamp", "event.created", "time", "event_time", "eventtime", "ts", "date"),
+    "host": ("host.name", "hostname", "host", "computername", "device_name", "devicename", "computer"),
+    "user": ("user.name", "username", "user_name", "user", "accountname", "account", "targetusername"),
+    "src_ip": ("source.ip", "src_ip", "source_ip", "srcip", "src", "localaddress", "client_ip", "client.ip"),
+    "dst_ip": ("destination.ip", "dst_ip", "dest_ip", "destination_ip", "dstip", "dst", "remoteaddress"),
+    "signals": ("message", "msg", "event.action", "action", "event_type", "eventtype", "category",
+                "description", "rule.name", "threat.name", "tactic", "technique"),
+}
+
+
+def _flatten(obj, prefix: str, out: dict, strings: list) -> None:
+    # Leaf values are reachable both by their dotted path ("user.name") and their last key ("name").
+    for key, value in obj.items():
+        key = str(key).lower()
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            _flatten(value, path, out, strings)
+            continue
+        if isinstance(value, list):
+            value = " ".join(str(v) for v in value if not isinstance(v, (dict, list)))
+        out.setdefault(path, value)
+        out.setdefault(key, value)
+        if isinstance(value, str):
+            strings.append(value)
+
+
+def _json_field(flat: dict, name: str) -> str:
+    for key in JSON_FIELDS[name]:
+        value = flat.get(key)
+        if value not in (None, "", []) and not isinstance(value, dict):
+            return str(value)
+    return ""
+
+
+@register("json", lambda lines: _line_ratio(lines, lambda l: l.startswith("{") and l.endswith("}")))
+def parse_json(record: str) -> Optional[Event]:
+    try:
+        obj = _loads(record)
+    except ValueError:
+        return None
+    if not isinstance(obj, dict):
+        return None
+    flat, strings = {}, []
+    _flatten(obj, "", flat, strings)
+    signals = " ".join(dict.fromkeys(flat[k] for k in JSON_FIELDS["signals"] if isinstance(flat.get(k), str)))
+    src, dst = _json_field(flat, "src_ip"), _json_field(flat, "dst_ip")
+    return _event(
+        "json",
+        " ".join(strings),
+        signals or record,
+        timestamp=normalize_timestamp(_json_field(flat, "timestamp")),
+        host=_json_field(flat, "host"),
+        src_ip=src if IPV4_RE.fullmatch(src) else "",
+        dst_ip=dst if IPV4_RE.fullmatch(dst) else "",
+        users=(_json_field(flat, "user"),),
+    )
+
+
+# -------------------- CEF --------------------
+_CEF_RE = re.compile(r"CEF:\d+((?:\|(?:[^|\\]|\\.)*){6})\|(.*)")
+_CEF_KEY_RE = re.compile(r"(?:^|(?<= ))(\w+(?:\.\w+)?)=")
+CEF_TIME_KEYS = ("rt", "end", "start", "deviceReceiptTime")
+
+
+def _cef_extension(text: str) -> dict:
+    # Values may contain spaces, so each one runs up to the next " key=".
+    keys = list(_CEF_KEY_RE.finditer(text))
+    ext = {}
+    for key, following in zip(keys, keys[1:] + [None]):
+        value = text[key.end():following.start() if following else len(text)]
+        ext[key.group(1)] = value.replace("\\=", "=").strip()
+    return ext
+
+
+@register("cef", lambda lines: _line_ratio(lines, lambda l: "CEF:" in l[:200]))
+def parse_cef(record: str) -> Optional[Event]:
+    m = _CEF_RE.search(record)
+    if not m:
+        return None
+    vendor, product, _version, signature, name, severity = re.split(r"(?<!\\)\|", m.group(1)[1:])
+    ext = _cef_extension(m.group(2))
+    timestamp = next((normalize_timestamp(ext[k]) for k in CEF_TIME_KEYS if k in ext), "unknown")
+    if timestamp == "unknown":
+        timestamp = normalize_timestamp(record[:m.start()])  # syslog header in front of "CEF:"
+    signals = " ".join((name, signature, ext.get("cat", ""), ext.get("act", ""), ext.get("msg", ""), product))
+    return _event(
+        "cef",
+        " ".join(ext.values()),
+        signals,
+        timestamp=timestamp,
+        host=ext.get("dvchost") or ext.get("shost") or ext.get("dhost", ""),
+        src_ip=ext.get("src", ""),
+        dst_ip=ext.get("dst", ""),
+        users=(ext.get("suser", ""), ext.get("duser", "")),
+        hashes=tuple(v for k, v in ext.items() if k.lower().endswith("hash") and HASH_RE.fullmatch(v)),
+    )
+
+
+# -------------------- LEEF --------------------
+_LEEF_RE = re.compile(r"LEEF:(1\.0|2\.0)\|(.*)")
+
+
+def _leef_delimiter(value: str) -> str:
+    # LEEF 2.0 names the attribute delimiter in the header, either literally or as hex ("x09", "0x5E").
+    value = value.strip()
+    if not value:
+        return "\t"
+    if len(value) > 1 and value.lower().lstrip("0").startswith("x"):
+        return chr(int(value.lower().lstrip("0")[1:], 16))
+    return value
+
+
+@register("leef", lambda lines: _line_ratio(lines, lambda l: "LEEF:" in l[:200]))
+def parse_leef(record: str) -> Optional[Event]:
+    m = _LEEF_RE.search(record)
+    if not m:
+        return None
+    parts = m.group(2).split("|", 5 if m.group(1) == "2.0" else 4)
+    if len(parts) < 5:
+        return None
+    _vendor, product, _version, event_id = parts[:4]
+    if m.group(1) == "2.0" and len(parts) == 6:
+        delimiter, attributes = _leef_delimiter(parts[4]), parts[5]
+    else:
+        delimiter, attributes = "\t", parts[4]
+    ext = {}
+    for pair in attributes.split(delimiter):
+        key, sep, value = pair.partition("=")
+        if sep:
+            ext[key.strip()] = value.strip()
+    signals = " ".join((event_id, ext.get("cat", ""), ext.get("msg", ""), ext.get("reason", ""), product))
+    return _event(
+        "leef",
+        " ".join(ext.values()),
+        signals,
+        timestamp=normalize_timestamp(ext.get("devTime") or record[:m.start()]),
+        host=ext.get("identHostName") or ext.get("srcHostName", ""),
+        src_ip=ext.get("src", ""),
+        dst_ip=ext.get("dst", ""),
+        users=(ext.get("usrName", ""), ext.get("accountName", "")),
+    )
+
+
+# -------------------- RFC5424 syslog --------------------
+_SYSLOG_RE = re.compile(r"<(\d{1,3})>1 (\S+) (\S+) (\S+) (\S+) (\S+) (-|(?:\[(?:[^\]\"\\]|\\.|\"(?:[^\"\\]|\\.)*\")*\])+) ?(.*)")
+_SD_PARAM_RE = re.compile(r"(\w+)=\"((?:[^\"\\]|\\.)*)\"")
+
+
+@register("syslog", lambda lines: _line_ratio(lines, lambda l: _SYSLOG_RE.match(l) is not None))
+def parse_syslog(record: str) -> Optional[Event]:
+    m = _SYSLOG_RE.match(record)
+    if not m:
+        return None
+    _pri, ts, host, app, _procid, msgid, sd, msg = m.groups()
+    params = dict(_SD_PARAM_RE.findall(sd)) if sd != "-" else {}
+    text = f"{msg} {' '.join(params.values())}"
+    return _event(
+        "syslog",
+        text,
+        f"{app} {msgid} {msg}",
+        timestamp=normalize_timestamp(ts),
+        host="" if host == "-" else host,
+        src_ip=params.get("src") or params.get("srcip", ""),
+        dst_ip=params.get("dst") or params.get("dstip", ""),
+        users=(params.get("user", ""),),
+    )
+
+
+# -------------------- Windows EVTX (XML) --------------------
+_EVTX_EVENT_ID_RE = re.compile(r"<EventID[^>]*>(\d+)</EventID>")
+_EVTX_TIME_RE = re.compile(r"<TimeCreated SystemTime=[\"']([^\"']+)")
+_EVTX_COMPUTER_RE = re.compile(r"<Computer>([^<]*)</Computer>")
+_EVTX_PROVIDER_RE = re.compile(r"<Provider Name=[\"']([^\"']*)")
+_EVTX_DATA_RE = re.compile(r"<Data Name=[\"']([^\"']+)[\"']>([^<]*)</Data>")
+EVTX_USER_FIELDS = ("TargetUserName", "SubjectUserName", "User")
+EVTX_SRC_FIELDS = ("IpAddress", "SourceAddress", "SourceIp")
+EVTX_DST_FIELDS = ("DestAddress", "DestinationIp")
+
+
+def _first_field(data: dict, names) -> str:
+    return next((data[n] for n in names if data.get(n) not in (None, "", "-")), "")
+
+
+@register("evtx", lambda lines: 1.0 if any("<Event" in l for l in lines) and any("<System>" in l or "</Event>" in l for l in lines) else 0.0, b"</Event>")
+def parse_evtx(record: str) -> Optional[Event]:
+    if "<Event" not in record:
+        return None
+    data = {k: html.unescape(v) if "&" in v else v for k, v in _EVTX_DATA_RE.findall(record)}
+    event_id = _EVTX_EVENT_ID_RE.search(record)
+    event_id = event_id.group(1) if event_id else ""
+    provider = _EVTX_PROVIDER_RE.search(record)
+    computer = _EVTX_COMPUTER_RE.search(record)
+    created = _EVTX_TIME_RE.search(record)
+    # Sysmon puts all digests in one field: "SHA1=...,MD5=...,SHA256=...".
+    hashes = tuple(HASH_RE.findall(data.get("Hashes", "")))
+    signals = " ".join((WINDOWS_EVENT_IDS.get(event_id, ""), provider.group(1) if provider else "", data.get("CommandLine", ""), data.get("Image", "")))
+    src = _first_field(data, EVTX_SRC_FIELDS)
+    dst = _first_field(data, EVTX_DST_FIELDS)
+    return _event(
+        "evtx",
+        " ".join(data.values()),
+        signals.strip() or f"event {event_id}",
+        timestamp=normalize_timestamp(created.group(1) if created else ""),
+        host=computer.group(1) if computer else "",
+        src_ip=src if IPV4_RE.fullmatch(src) else "",
+        dst_ip=dst if IPV4_RE.fullmatch(dst) else "",
+        users=tuple(data.get(n, "") for n in EVTX_USER_FIELDS),
+        hashes=hashes,
+    )
+
+
+# -------------------- Legacy bracketed lines and plain text --------------------
+@register("legacy", lambda lines: _line_ratio(lines, lambda l: TIMESTAMP_RE.match(l) is not None))
+def parse_legacy(record: str) -> Optional[Event]:
+    return _event("legacy", record, record)
+
+
+@register("plain", lambda lines: 0.0)
+def parse_plain(record: str) -> Optional[Event]:
+    return _event("plain", record, record, timestamp=normalize_timestamp(record[:64]))
+
+
+def detect_format(sample: str) -> str:
+    """Pick the registered format that recognizes most of the sample's lines ("plain" if none fits)."""
+    lines = [line.strip() for line in sample.splitlines()[:50] if line.strip()]
+    best, best_score = "plain", 0.5
+    for fmt in FORMATS.values():
+        score = fmt.sniff(lines)
+        if score > best_score:
+            best, best_score = fmt.name, score
+    return best
+
+
+def parse_entry(record: str, log_format: str = "") -> Event:
+    """Parse a single record, detecting its format if none is given."""
+    fmt = FORMATS[log_format or detect_format(record)]
+    return fmt.parse(record.strip()) or parse_plain(record.strip())
+
+
+# -------------------- Files --------------------
+class LogSummary:
+    """Bounded aggregate of parsed events; summaries of separate shards merge exactly like IncidentRollup."""
+
+    def __init__(self, bucket: str = "hour", top_k: int = 10):
+        self.rollup = IncidentRollup(bucket=bucket, top_k=top_k)
+        self.events = 0
+        self.unparsed = 0
+        self.formats: Counter = Counter()
+        self.hosts = TopK(top_k)
+        self.iocs = {kind: TopK(top_k) for kind in IOC_KINDS}
+
+    def add(self, event: Event) -> None:
+        self.events += 1
+        self.formats[event.format] += 1
+        if event.host:
+            self.hosts.add(event.host)
+        for kind in IOC_KINDS:
+            top = self.iocs[kind]
+            for value in getattr(event, kind):
+                top.add(value)
+        # Only events that look like an attack become incidents; IOCs are counted for all.
+        if event.attack_type != "unknown":
+            self.rollup.add(event.attack_type, event.affected_system, event.src_ip, event.timestamp)
+
+    def add_records(self, records: Iterable, log_format: str, lines: int) -> None:
+        """Count a scanned file of `lines` lines from its keyword LogRecords (see stream.LogRecord)."""
+        self.events += lines
+        self.formats[log_format] += lines
+        add_ip, add_incident = self.iocs["ips"].add, self.rollup.add
+        for rec in records:
+            if rec.source_ip:
+                add_ip(rec.source_ip)
+            if rec.attack_type != "unknown":
+                add_incident(rec.attack_type, rec.affected_system, rec.source_ip, rec.timestamp)
+
+    def merge(self, other: "LogSummary") -> None:
+        self.events += other.events
+        self.unparsed += other.unparsed
+        self.formats.update(other.formats)
+        self.hosts.merge(other.hosts)
+        for kind in IOC_KINDS:
+            self.iocs[kind].merge(other.iocs[kind])
+        self.rollup.merge(other.rollup)
+
+    def to_dict(self, limit: int = 25) -> dict:
+        hashes = [{"hash": h, "type": hash_type(h), "events": n} for h, n in self.iocs["hashes"].top()]
+        return {
+            "events": self.events,
+            "unparsed_records": self.unparsed,
+            "formats": dict(self.formats.most_common()),
+            "top_hosts": [{"host": h, "events": n} for h, n in self.hosts.top()],
+            "iocs": {
+                "ips": [{"ip": v, "events": n} for v, n in self.iocs["ips"].top()],
+                "domains": [{"domain": v, "events": n} for v, n in self.iocs["domains"].top()],
+                "hashes": hashes,
+                "users": [{"user": v, "events": n} for v, n in self.iocs["users"].top()],
+            },
+            "incidents": self.rollup.to_dict(limit),
+        }
+
+
+def _iter_records(path: str, start: int, end: int, delimiter: bytes) -> Iterator[str]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        tail = b""
+        while remaining > 0:
+            block = f.read(min(CHUNK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            pieces = (tail + block).split(delimiter)
+            tail = pieces.pop()
+            for piece in pieces:
+                yield piece.decode("utf-8", "replace")
+        if tail.strip():
+            yield tail.decode("utf-8", "replace")
+
+
+def iter_events(path: str, log_format: str = "", start: int = 0, end: int = -1) -> Iterator[Event]:
+    """Parse the records of a file (or of the byte range [start, end)) one at a time."""
+    fmt = FORMATS[log_format or sniff_file(path)]
+    if end < 0:
+        end = os.path.getsize(path)
+    for record in _iter_records(path, start, end, fmt.delimiter):
+        record = record.strip()
+        if record:
+            yield fmt.parse(record) or parse_plain(record)
+
+
+def _parse_shard(path: str, start: int, end: int, log_format: str, bucket: str) -> LogSummary:
+    fmt = FORMATS[log_format]
+    summary = LogSummary(bucket)
+    add, parse = summary.add, fmt.parse
+    for record in _iter_records(path, start, end, fmt.delimiter):
+        record = record.strip()
+        if not record:
+            continue
+        event = parse(record)
+        if event is None:
+            summary.unparsed += 1
+            if fmt.delimiter != b"\n":
+                continue  # e.g. the closing </Events> of an EVTX export
+            event = parse_plain(record)
+        add(event)
+    return summary
+
+
+def _count_lines(path: str) -> int:
+    lines, last = 0, b"\n"
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    return lines + (last != b"\n")
+
+
+def scan_summary(path: str, log_format: str = "legacy", bucket: str = "hour") -> LogSummary:
+    """Summarize a legacy or plain-text log with stream.scan_file.
+
+    Only keyword lines are materialized, so IOCs are limited to their source IPs; timestamps
+    are read from the bracketed "[YYYY-MM-DD HH:MM:SS]" prefix only.
+    """
+    summary = LogSummary(bucket)
+    summary.add_records(scan_file(path), log_format, _count_lines(path))
+    return summary
+
+
+def sniff_file(path: str) -> str:
+    with open(path, "rb") as f:
+        sample = f.read(SNIFF_BYTES).decode("utf-8", "replace")
+    # The last line of the sample is usually cut off.
+    if len(sample) == SNIFF_BYTES and "\n" in sample:
+        sample = sample[:sample.rfind("\n")]
+    return detect_format(sample)
+
+
+def shard_bounds(path: str, shards: int, delimiter: bytes = b"\n") -> List[Tuple[int, int]]:
+    """Split a file into about `shards` byte ranges that each end right after a delimiter."""
+    size = os.path.getsize(path)
+    cuts = [0]
+    with open(path, "rb") as f:
+        for i in range(1, shards):
+            target = max(size * i // shards, cuts[-1])
+            f.seek(target)
+            buffered = b""
+            while True:
+                block = f.read(1 << 16)
+                if not block:
+                    cut = size
+                    break
+                buffered += block
+                idx = buffered.find(delimiter)
+                if idx >= 0:
+                    cut = target + idx + len(delimiter)
+                    break
+            if cut > cuts[-1]:
+                cuts.append(cut)
+    if cuts[-1] != size:
+        cuts.append(size)
+    return list(zip(cuts, cuts[1:]))
+
+
+def _pool_context():
+    # Never fork the caller: it is usually a multi-threaded agent server, and a forked child can
+    # inherit a lock another thread was holding. The fork server is single-threaded and imports
+    # this module (and the agent package around it) once, so later pools start quickly.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def parse_file(path: str, log_format: str = "", bucket: str = "hour", workers: int = 0) -> Tuple[str, LogSummary]:
+    """Summarize a whole log file and return (format, LogSummary).
+
+    Legacy and plain-text logs go through scan_summary. Structured formats are parsed in a
+    process pool: `workers=0` uses every CPU; small files are always parsed in-process.
+    """
+    log_format = log_format or sniff_file(path)
+    if log_format not in FORMATS:
+        raise ValueError(f"Unknown log format {log_format!r}; expected one of {sorted(FORMATS)}")
+    if log_format in SCANNED_FORMATS:
+        return log_format, scan_summary(path, log_format, bucket)
+    size = os.path.getsize(path)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or size < MIN_PARALLEL_BYTES:
+        return log_format, _parse_shard(path, 0, size, log_format, bucket)
+
+    # Several shards per worker so one slow shard does not leave the other processes idle.
+    bounds = shard_bounds(path, workers * 4, FORMATS[log_format].delimiter)
+    summary = LogSummary(bucket)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+        futures = [pool.submit(_parse_shard, path, start, end, log_format, bucket) for start, end in bounds]
+        for future in futures:
+            summary.merge(future.result())
+    return log_format, summary
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Parse a security log and print its IOC and incident summary.")
+    parser.add_argument("path")
+    parser.add_argument("--format", default="", choices=[""] + sorted(FORMATS), help="skip auto-detection")
+    parser.add_argument("--bucket", default="hour", choices=["minute", "hour", "day"])
+    parser.add_argument("--workers", type=int, default=0, help="processes (default: all CPUs)")
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    log_format, summary = parse_file(args.path, args.format, args.bucket, args.workers)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(args.path)
+    print(json.dumps({"format": log_format, **summary.to_dict()}, indent=2))
+    print(f"{summary.events:,} events, {size / 1e6:.0f} MB in {elapsed:.2f}s ({size / elapsed / 1e6:.0f} MB/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Incident rollups over parsed log events.
+
+Attack events collected by parsers.LogSummary are grouped by (attack type,
+affected system, source IP, time bucket) with counts and first/last seen.
+Memory stays bounded on arbitrarily large logs: groups beyond `max_groups`
+(also when shard rollups are merged) are folded into a per-(attack, system,
+bucket) "other" group, distinct IPs are estimated with HyperLogLog, and the
+most frequent indicators come from a Count-Min sketch. Only the rollup, a
+few KB, is passed to the LLM.
+"""
+
+import functools
+import hashlib
+import heapq
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+OTHER = "*other*"
+# Slice lengths of "YYYY-MM-DD HH:MM:SS" that truncate a timestamp to the bucket.
+BUCKETS = {"minute": 16, "hour": 13, "day": 10}
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _hash64(item: str) -> int:
+    # Stable across processes (unlike hash()), so sketches built in workers can be merged.
+    # Cached: the same few thousand IPs recur millions of times in a log.
+    return int.from_bytes(hashlib.blake2b(item.encode("utf-8", "surrogatepass"), digest_size=8).digest(), "little")
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _columns(item: str, width: int, depth: int) -> Tuple[int, ...]:
+    h = _hash64(item)
+    h1, h2 = h & 0xFFFFFFFF, h >> 32
+    return tuple((h1 + i * h2) % width for i in range(depth))
+
+
+class HyperLogLog:
+    """Cardinality estimate in 2**p bytes (p=12: 4 KB, ~1.6% standard error)."""
+
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def add(self, item: str) -> None:
+        x = _hash64(item)
+        idx = x >> (64 - self.p)
+        rest = x & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other: "HyperLogLog") -> None:
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def __len__(self) -> int:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # linear counting for small cardinalities
+        return int(round(estimate))
+
+
+class CountMinSketch:
+    """Approximate frequencies; estimates never undercount."""
+
+    def __init__(self, width: int = 4096, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.rows = [[0] * width for _ in range(depth)]
+
+    def _cells(self, item: str) -> Iterable[Tuple[List[int], int]]:
+        return zip(self.rows, _columns(item, self.width, self.depth))
+
+    def add(self, item: str, count: int = 1) -> int:
+        estimate = None
+        for row, col in self._cells(item):
+            row[col] += count
+            estimate = row[col] if estimate is None else min(estimate, row[col])
+        return estimate
+
+    def estimate(self, item: str) -> int:
+        return min(row[col] for row, col in self._cells(item))
+
+    def merge(self, other: "CountMinSketch") -> None:
+        for row, other_row in zip(self.rows, other.rows):
+            for i, v in enumerate(other_row):
+                row[i] += v
+
+
+class BloomFilter:
+    """Set membership with no false negatives; 2**bits bits of memory (bits=24: 2 MB)."""
+
+    def __init__(self, bits: int = 24, hashes: int = 4):
+        self.size = 1 << bits
+        self.hashes = hashes
+        self.array = bytearray(self.size >> 3)
+
+    def add(self, item: str) -> bool:
+        """Insert item; return True if it was (probably) already present."""
+        present = True
+        array = self.array
+        for bit in _columns(item, self.size, self.hashes):
+            byte, mask = bit >> 3, 1 << (bit & 7)
+            if not array[byte] & mask:
+                present = False
+                array[byte] |= mask
+        return present
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.array[bit >> 3] & (1 << (bit & 7)) for bit in _columns(item, self.size, self.hashes))
+
+    def merge(self, other: "BloomFilter") -> None:
+        self.array = bytearray(a | b for a, b in zip(self.array, other.array))
+
+
+class TopK:
+    """Heavy hitters: a Count-Min sketch plus a bounded candidate table."""
+
+    def __init__(self, k: int = 10, capacity: int = 256):
+        self.k = k
+        self.capacity = capacity
+        self.sketch = CountMinSketch()
+        self.candidates: Dict[str, int] = {}
+
+    def add(self, item: str, count: int = 1) -> None:
+        estimate = self.sketch.add(item, count)
+        self.candidates[item] = estimate
+        if len(self.candidates) > 2 * self.capacity:
+            self.candidates = dict(heapq.nlargest(self.capacity, self.candidates.items(), key=lambda kv: kv[1]))
+
+    def merge(self, other: "TopK") -> None:
+        self.sketch.merge(other.sketch)
+        for item in list(self.candidates) + list(other.candidates):
+            self.candidates[item] = self.sketch.estimate(item)
+
+    def top(self) -> List[Tuple[str, int]]:
+        return heapq.nlargest(self.k, self.candidates.items(), key=lambda kv: kv[1])
+
+
+class IncidentRollup:
+    def __init__(self, bucket: str = "hour", max_groups: int = 50_000, top_k: int = 10):
+        if bucket not in BUCKETS:
+            raise ValueError(f"bucket must be one of {sorted(BUCKETS)}")
+        self.bucket = bucket
+        self._cut = BUCKETS[bucket]
+        self.max_groups = max_groups
+        self.events = 0
+        # key -> [count, first_seen, last_seen]
+        self.groups: Dict[Tuple[str, str, str, str], list] = {}
+        self.distinct_ips: Dict[Tuple[str, str], HyperLogLog] = {}
+        self.all_ips = HyperLogLog()
+        self.top_ips = TopK(top_k)
+        self.first_seen: Optional[str] = None
+        self.last_seen: Optional[str] = None
+
+    def add(self, attack_type: str, affected_system: str, source_ip: str, timestamp: str) -> None:
+        self.events += 1
+        has_ts = timestamp != "unknown"
+        bucket = timestamp[:self._cut] if has_ts else "unknown"
+        ip = source_ip or "-"
+        key = (attack_type, affected_system, ip, bucket)
+        group = self.groups.get(key)
+        if group is None:
+            if len(self.groups) >= self.max_groups:
+                key = (attack_type, affected_system, OTHER, bucket)
+                group = self.groups.get(key)
+            if group is None:
+                group = self.groups[key] = [0, None, None]
+        group[0] += 1
+        if has_ts:
+            if group[1] is None or timestamp < group[1]:
+                group[1] = timestamp
+            if group[2] is None or timestamp > group[2]:
+                group[2] = timestamp
+            if self.first_seen is None or timestamp < self.first_seen:
+                self.first_seen = timestamp
+            if self.last_seen is None or timestamp > self.last_seen:
+                self.last_seen = timestamp
+        if source_ip:
+            hll = self.distinct_ips.get((attack_type, affected_system))
+            if hll is None:
+                hll = self.distinct_ips[(attack_type, affected_system)] = HyperLogLog()
+            hll.add(source_ip)
+            self.all_ips.add(source_ip)
+            self.top_ips.add(source_ip)
+
+    def merge(self, other: "IncidentRollup") -> None:
+        self.events += other.events
+        for key, (count, first, last) in other.groups.items():
+            group = self.groups.get(key)
+            if group is None:
+                if len(self.groups) >= self.max_groups:
+                    key = key[:2] + (OTHER, key[3])
+                group = self.groups.setdefault(key, [0, None, None])
+            group[0] += count
+            group[1] = min(filter(None, (group[1], first)), default=None)
+            group[2] = max(filter(None, (group[2], last)), default=None)
+        for key, hll in other.distinct_ips.items():
+            self.distinct_ips.setdefault(key, HyperLogLog()).merge(hll)
+        self.all_ips.merge(other.all_ips)
+        self.top_ips.merge(other.top_ips)
+        self.first_seen = min(filter(None, (self.first_seen, other.first_seen)), default=None)
+        self.last_seen = max(filter(None, (self.last_seen, other.last_seen)), default=None)
+
+    def to_dict(self, limit: int = 25) -> dict:
+        """Compact rollup for the LLM: totals per (attack, system) and the `limit` largest groups."""
+        totals: Dict[Tuple[str, str], list] = {}
+        for (attack, system, _ip, _bucket), (count, first, last) in self.groups.items():
+            t = totals.setdefault((attack, system), [0, None, None])
+            t[0] += count
+            t[1] = min(filter(None, (t[1], first)), default=None)
+            t[2] = max(filter(None, (t[2], last)), default=None)
+        largest = heapq.nlargest(limit, self.groups.items(), key=lambda kv: kv[1][0])
+        return {
+            "events": self.events,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "bucket": self.bucket,
+            "distinct_source_ips": len(self.all_ips),
+            "by_attack_and_system": [
+                {
+                    "attack_type": attack,
+                    "affected_system": system,
+                    "events": count,
+                    "distinct_source_ips": len(self.distinct_ips[(attack, system)]) if (attack, system) in self.distinct_ips else 0,
+                    "first_seen": first,
+                    "last_seen": last,
+                }
+                for (attack, system), (count, first, last) in sorted(totals.items(), key=lambda kv: -kv[1][0])
+            ],
+            "top_groups": [
+                {
+                    "attack_type": attack,
+                    "affected_system": system,
+                    "source_ip": ip,
+                    "time_bucket": bucket,
+                    "events": count,
+                    "first_seen": first,
+                    "last_seen": last,
+                }
+                for (attack, system, ip, bucket), (count, first, last) in largest
+            ],
+            "top_source_ips": [{"ip": ip, "events": n} for ip, n in self.top_ips.top()],
+        }
@@ -0,0 +1,226 @@
+"""
+Streaming scanner behind summarize_threat_log_file for legacy and plain-text logs.
+
+Instead of handling one log entry per call, the scanner works on large
+chunks (a file read in blocks, or an iterator of lines batched together):
+each chunk is lower-cased once and searched for every attack-type and
+system keyword with C-level substring search, so lines without a keyword
+never reach Python code. Matching lines are emitted as compact
+LogRecord tuples (line number, byte offset, attack type, system,
+timestamp, first IPv4 address) without copying the raw line.
+
+Benchmark:
+    python -m manager.sub_agents.log_summarizer.stream --bench 5000000
+"""
+
+import argparse
+import os
+import random
+import re
+import tempfile
+import time
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+ATTACK_TYPES = ("malware", "phishing", "sql injection", "ddos", "ransomware")
+AFFECTED_SYSTEMS = ("server", "database", "network", "workstation", "cloud")
+CHUNK_SIZE = 8 * 1024 * 1024
+LINES_PER_BATCH = 65536
+
+# When a line mentions several keywords of the same kind, the one listed last wins
+# (this matches the original per-keyword loop in summarize_threat_log).
+_RANK = {kw: n for kws in (ATTACK_TYPES, AFFECTED_SYSTEMS) for n, kw in enumerate(kws)}
+_KIND = {**{kw: "attack" for kw in ATTACK_TYPES}, **{kw: "system" for kw in AFFECTED_SYSTEMS}}
+_KEYWORDS = sorted(_RANK, key=len, reverse=True)
+
+KEYWORD_RE = re.compile("|".join(re.escape(k) for k in _KEYWORDS))
+TIMESTAMP_RE = re.compile(r"\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\]")
+TIMESTAMP_RE_B = re.compile(rb"\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\]")
+IPV4_RE = re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}\b")
+IPV4_RE_B = re.compile(rb"\b(?:\d{1,3}\.){3}\d{1,3}\b")
+
+
+class LogRecord(NamedTuple):
+    line_no: int  # 1-based
+    offset: int  # byte offset of the line in the file (-1 when scanning an iterator)
+    attack_type: str
+    affected_system: str
+    timestamp: str
+    source_ip: str  # first IPv4 address on the line, "" if none
+
+
+def classify(log_entry: str) -> tuple:
+    """Return (attack_type, affected_system, timestamp) for a single entry."""
+    attack = system = "unknown"
+    for kw in KEYWORD_RE.findall(log_entry.lower()):
+        if _KIND[kw] == "attack":
+            if attack == "unknown" or _RANK[kw] > _RANK[attack]:
+                attack = kw
+        elif system == "unknown" or _RANK[kw] > _RANK[system]:
+            system = kw
+    m = TIMESTAMP_RE.search(log_entry)
+    return attack, system, m.group(1) if m else "unknown"
+
+
+def _keyword_hits(lower, binary: bool) -> list:
+    """Return sorted (position, keyword) pairs for every keyword occurrence in `lower`.
+
+    One C-level substring search per keyword (bytes.find) is several times faster on
+    large chunks than a combined regex alternation or an Aho-Corasick automaton, both of
+    which step through the buffer one byte at a time.
+    """
+    hits = []
+    append = hits.append
+    find = lower.find
+    for kw in _KEYWORDS:
+        needle = kw.encode() if binary else kw
+        pos = find(needle)
+        while pos >= 0:
+            append((pos, kw))
+            pos = find(needle, pos + 1)
+    hits.sort()
+    return hits
+
+
+def _scan_chunk(chunk, lower, line_base: int, offset_base: int, binary: bool) -> Iterator[LogRecord]:
+    """Yield a record for every line of `chunk` that contains a keyword.
+
+    `lower` is chunk.lower(); keyword positions come from it, timestamps from the original.
+    """
+    nl = b"\n" if binary else "\n"
+    timestamp_re, ip_re = (TIMESTAMP_RE_B, IPV4_RE_B) if binary else (TIMESTAMP_RE, IPV4_RE)
+    count, rfind, find = lower.count, lower.rfind, lower.find
+    line_no, counted_to = line_base, 0
+    line_start = line_end = -1
+    attack = system = None
+
+    def record():
+        m = timestamp_re.search(chunk, line_start, line_end)
+        ts = (m.group(1).decode() if binary else m.group(1)) if m else "unknown"
+        m = ip_re.search(chunk, line_start, line_end)
+        ip = (m.group().decode() if binary else m.group()) if m else ""
+        return LogRecord(line_no, offset_base + line_start if binary else -1, attack or "unknown", system or "unknown", ts, ip)
+
+    for pos, kw in _keyword_hits(lower, binary):
+        if pos >= line_end:
+            if line_end >= 0:
+                yield record()
+            line_start = rfind(nl, 0, pos) + 1
+            line_end = find(nl, pos)
+            if line_end < 0:
+                line_end = len(lower)
+            line_no += count(nl, counted_to, line_start)
+            counted_to = line_start
+            attack = system = None
+        if _KIND[kw] == "attack":
+            if attack is None or _RANK[kw] > _RANK[attack]:
+                attack = kw
+        elif system is None or _RANK[kw] > _RANK[system]:
+            system = kw
+    if line_end >= 0:
+        yield record()
+
+
+def scan_file(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[LogRecord]:
+    """Stream LogRecords from a (multi-GB) log file, reading it in blocks."""
+    line_base, offset_base = 1, 0
+    with open(path, "rb") as f:
+        tail = b""
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            block = tail + block
+            cut = block.rfind(b"\n") + 1
+            if cut == 0:
+                tail = block
+                continue
+            chunk, tail = block[:cut], block[cut:]
+            yield from _scan_chunk(chunk, chunk.lower(), line_base, offset_base, True)
+            line_base += chunk.count(b"\n")
+            offset_base += len(chunk)
+        if tail:
+            yield from _scan_chunk(tail, tail.lower(), line_base, offset_base, True)
+
+
+def scan_lines(lines: Iterable[str], batch: int = LINES_PER_BATCH) -> Iterator[LogRecord]:
+    """Stream LogRecords from an iterator of log lines (e.g. a socket or a decompressor)."""
+    buffer = []
+    line_base = 1
+    for line in lines:
+        buffer.append(line.rstrip("\n"))
+        if len(buffer) >= batch:
+            chunk = "\n".join(buffer)
+            yield from _scan_chunk(chunk, chunk.lower(), line_base, 0, False)
+            line_base += len(buffer)
+            buffer.clear()
+    if buffer:
+        chunk = "\n".join(buffer)
+        yield from _scan_chunk(chunk, chunk.lower(), line_base, 0, False)
+
+
+def scan(source) -> Iterator[LogRecord]:
+    """Scan a file path or an iterable of lines."""
+    if isinstance(source, (str, os.PathLike)):
+        return scan_file(os.fspath(source))
+    return scan_lines(source)
+
+
+# -------------------- Benchmark --------------------
+def _synthetic_lines(n: int, hit_ratio: float = 0.1) -> Iterator[str]:
+    rng = random.Random(7)
+    benign = [
+        "sshd[4121]: Accepted publickey for deploy from 10.0.0.{} port 52234",
+        "kernel: [UFW BLOCK] IN=eth0 OUT= SRC=172.16.4.{} DST=10.0.0.5 PROTO=TCP DPT=443",
+        "cron[2231]: (root) CMD (/usr/local/bin/backup.sh --target s3://bucket/{})",
+        "nginx: 10.1.2.{} - - \"GET /api/v1/health HTTP/1.1\" 200 17",
+    ]
+    for i in range(n):
+        ts = f"[2024-05-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:{(i * 7) % 60:02d}]"
+        if rng.random() < hit_ratio:
+            attack, system = rng.choice(ATTACK_TYPES), rng.choice(AFFECTED_SYSTEMS)
+            yield f"{ts} {attack.title()} attack detected on {system} system from IP 192.168.1.{i % 255}\n"
+        else:
+            yield f"{ts} {rng.choice(benign).format(i % 255)}\n"
+
+
+def benchmark(n: int, hit_ratio: float = 0.1) -> None:
+    with tempfile.NamedTemporaryFile("w", suffix=".log", delete=False) as f:
+        f.writelines(_synthetic_lines(n, hit_ratio))
+        path = f.name
+    try:
+        size = os.path.getsize(path)
+        start = time.perf_counter()
+        hits = sum(1 for _ in scan_file(path))
+        elapsed = time.perf_counter() - start
+        print(f"scan_file: {n:,} lines ({size / 1e6:.0f} MB), {hits:,} records in {elapsed:.2f}s "
+              f"-> {n / elapsed / 1e6:.2f}M lines/s, {size / elapsed / 1e6:.0f} MB/s")
+
+        sample = min(n, 200_000)
+        with open(path) as lines:
+            head = [next(lines) for _ in range(sample)]
+        start = time.perf_counter()
+        for line in head:
+            classify(line)
+        per_entry = time.perf_counter() - start
+        print(f"classify() per entry: {sample / per_entry / 1e6:.2f}M lines/s (reference)")
+    finally:
+        os.unlink(path)
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Scan a threat log or benchmark the scanner.")
+    parser.add_argument("path", nargs="?", help="log file to scan")
+    parser.add_argument("--bench", type=int, metavar="LINES", help="benchmark on a synthetic log of LINES lines")
+    parser.add_argument("--hit-ratio", type=float, default=0.1, help="fraction of synthetic lines with a keyword")
+    args = parser.parse_args(argv)
+    if args.bench:
+        benchmark(args.bench, args.hit_ratio)
+    elif args.path:
+        for rec in scan_file(args.path):
+            print(rec)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,19 @@
 from google.adk.agents import Agent
+from common.chain_render import render_threat_chain
+from common.threat_chains import enumerate_threat_chains
 
 threat_chain_visualizer = Agent(
     name="threat_chain_visualizer",
     model="gemini-2.0-flash",
     description="Visualizes threat chains as diagrams or graphs for easier analysis.",
     instruction="""
-    When given a threat chain, convert it into a visual diagram or graph.
-    Present the visualization in a format suitable for security professionals.
+    When given a threat chain, convert it into a visual diagram with the render_threat_chain tool:
+    - If you are given chains as sequences of IDs (e.g. T1190 > T1059 > T1486), pass each chain as one string.
+    - If you are given a threat path (CVE-CWE-CAPEC-TTP-MITIGATION) instead, call enumerate_threat_chains first and
+      pass the ttp_ids of the returned chains, one string per chain.
+    The tool writes SVG, Graphviz DOT and Mermaid files locally. Do not draw the diagram yourself (no ASCII art and no
+    Mermaid or DOT code in your reply): give the file paths, and in a few sentences describe what the diagram shows
+    (where the chains start, where they branch or merge, and where they end) for security professionals.
     """,
-    tools=[],
-)
\ No newline at end of file
+    tools=[render_threat_chain, enumerate_threat_chains],
+)
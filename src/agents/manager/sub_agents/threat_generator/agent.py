@@ -1,31 +1,40 @@
 from google.adk.agents import Agent
+from common.blackboard import count_llm_call, reset_llm_calls
+from common.threat_chains import enumerate_threat_chains
 
 # Define the threat generator agent
 threat_generator = Agent(
     name="threat_generator",
     model="gemini-2.0-flash",
-    description="Generates detailed, realistic cyber threat chains from CVE-CWE-CAPEC-TTP-MITIGATION paths. Outputs all possible chains including the given TTP, with clear end goals and a final chain in bullet points.",
+    description="Generates detailed, realistic cyber threat chains from CVE-CWE-CAPEC-TTP-MITIGATION paths. Outputs the top-ranked chains through the path from the local ATT&CK knowledge base, with clear end goals and a final chain in bullet points.",
     instruction="""
     You are an assistant that reads threat paths in the format CVE-CWE-CAPEC-TTP-MITIGATION.
 
     When provided with a path:
-    1. Parse and identify each component (CVE, CWE, CAPEC, TTP, MITIGATION).
-    2. Research and generate all possible real-world threat chains that include the specified TTP (or any other element in the path).
-    3. For each chain:
-        - Combine multiple relevant TTPs in a logical, realistic attack progression.
-        - Clearly state the end goal for the chain (e.g., data exfiltration, privilege escalation, ransomware deployment).
+    1. Call enumerate_threat_chains with the path exactly as given. It returns the top-ranked chains, computed
+       deterministically from the local MITRE ATT&CK knowledge base: each chain has a score, an end goal, and steps
+       with technique ID, name, tactic and why the technique relates to the path. Chains another specialist already
+       computed for the path this session come back from the session blackboard (from_blackboard) unchanged.
+    2. Narrate only the returned chains, in the order returned. Do not add, remove or reorder steps, and do not invent
+       other chains. For each chain:
+        - State its end goal and score.
         - For each step, list:
             - TTP ID
             - Step description
             - Impact of the step
             - Goal of the step
         - Explain how the chain operates, how attackers use it, and why each step is necessary.
-        - Ensure the provided TTP is included somewhere in the chain.
-    4. Present the information in a structured, easy-to-understand format for security professionals.
-    5. Be detailed, realistic, and avoid vague or generic statements.
-    6. At the end, output one possible chain in bullet points, listing only the sequence of TTP IDs (no sentences, no extra explanation).
+    3. Present the information in a structured, easy-to-understand format for security professionals.
+    4. Be detailed, realistic, and avoid vague or generic statements.
+    5. At the end, output the first chain in bullet points, listing only its ttp_ids in order (no sentences, no extra explanation).
+
+    If the tool returns an error (for example the knowledge base is not built), say so, then generate chains that
+    include the given TTP yourself following the same format, and label them as model-generated and unverified.
     """,
-    tools=[],
+    tools=[enumerate_threat_chains],
+    before_agent_callback=reset_llm_calls,
+    before_model_callback=count_llm_call,
+    output_key="threat_chains_narrative",
 )
 
 # Example usage:
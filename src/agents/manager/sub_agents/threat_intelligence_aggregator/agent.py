@@ -1,4 +1,5 @@
 from google.adk.agents import Agent
+from common.blackboard import count_llm_call, publish_iocs, read_blackboard, reset_llm_calls
 
 threat_intelligence_aggregator = Agent(
     name="threat_intelligence_aggregator",
@@ -9,9 +10,17 @@ threat_intelligence_aggregator = Agent(
     When requested, you should:
     1. Search for recent updates and news about cyber threats from platforms such as Twitter, security blogs, news sites, and official advisories (e.g., CISA, CERT, vendor bulletins).
     2. Summarize the most relevant and recent findings, including new vulnerabilities, attack campaigns, malware trends, and mitigation strategies.
-    3. Correlate this intelligence with existing threat chains or attack paths if provided.
+    3. Correlate this intelligence with existing threat chains or attack paths if provided. For a threat path, first call
+       read_blackboard with kind "threat_chains" (and "risk") and the path: correlate with the chains and scores other
+       specialists already produced this session instead of describing new ones.
     4. Present the information in a structured, actionable format for security professionals.
     5. Always cite the source (e.g., Twitter handle, blog URL, advisory link) for each piece of intelligence.
+    6. If you found indicators of compromise (IP addresses, domains, URLs, file hashes, e-mail addresses, CVEs), call
+       publish_iocs once with the threat path (or the campaign or topic) and all of them, so incident_response_agent
+       can use them.
     """,
-    tools=[],
-)
\ No newline at end of file
+    tools=[read_blackboard, publish_iocs],
+    before_agent_callback=reset_llm_calls,
+    before_model_callback=count_llm_call,
+    output_key="threat_intelligence",
+)
@@ -1,45 +1,48 @@
 from google.adk.agents import Agent
 from google.adk.tools.tool_context import ToolContext
-from google.genai import types
-from google.genai.client import Client
+from common.genai_client import get_client
+from manager.sub_agents.youtube_summarizer import mapreduce, transcripts
 
-def transcribe_video(video_url: str, tool_context: ToolContext) -> dict:
-    client = Client(api_key="Your API Key")
+# Only the start of the transcript goes back to the model; the outline and sections cover the rest
+TRANSCRIPT_PREVIEW_CHARS = 2000
 
-    response = client.models.generate_content(
-        model='gemini-2.0-flash',
-        contents=types.Content(
-            parts=[
-                types.Part(
-                    file_data=types.FileData(file_uri=video_url, mime_type='video/mp4')
-                ),
-                types.Part(text='Transcribe the audio from this video, giving timestamps for salient events in the video. Also provide visual descriptions.')
-            ]
-        )
-    )
 
-    transcription = response.text
+def transcribe_video(video_url: str, mode: str, tool_context: ToolContext) -> dict:
+    """Transcribe a YouTube video from the cheapest available source and return a timestamped outline.
 
-    # Extract key points from the transcription
-    key_points = []
-    for line in transcription.splitlines():
-        if line.startswith("Timestamp:"):
-            key_point = line.split(":", 1)[1].strip()
-            key_points.append(key_point)
+    mode is "auto" (captions, then audio only, then full video) or one of "captions", "audio", "video".
+    """
+    print(f"--- Tool: transcribe_video called for {video_url} (mode={mode}) ---")
+    try:
+        transcript, metrics = transcripts.transcribe(video_url, get_client, mode or "auto")
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    if transcript is None:
+        return {"status": "error", "message": "No tier could transcribe the video.", "tiers": metrics}
 
-    # Create a summary of the transcription
-    summary = "Summary of the video transcription:"
-    for i, key_point in enumerate(key_points):
-        summary += f"\n• {key_point}"
+    # Chunks are summarized concurrently and merged; cached chunk summaries are reused (see mapreduce.py)
+    result = mapreduce.summarize(transcript, get_client)
+    text = transcripts.as_text(transcript)
+
+    return {
+        "status": "success",
+        "tier": transcript.tier,
+        "language": transcript.language,
+        "transcript_preview": text[:TRANSCRIPT_PREVIEW_CHARS],
+        "transcript_chars": len(text),
+        "summary": result.pop("outline"),
+        **result,
+        "tiers": metrics,
+    }
 
-    return {"status": "success", "transcription": transcription, "summary": summary}
 youtube_summarizer = Agent(
     name="youtube_summarizer",
     model="gemini-2.0-flash",
     description="Analyze a YouTube video by transcribing its content, detecting key moments, and generating a structured sand a detailed summary with timestamps.",
     instruction=(
         "Given a YouTube video URL:\n"
-        "1. Transcribe the full audio content of the video accurately.\n"
+        "Call transcribe_video with mode 'auto' unless the user asks for visual details, in which case use 'video'.\n"
+        "1. Work from the outline and per-section summaries it returns; the transcript itself is only previewed.\n"
         "2. Identify key moments and moments of interest in the video"
         "3. If the video is an explanation of a technical topic, provide a detailed summary of the content talked about in the video."
         "4. Provide what are the areas or topics to be learnt from the video and how the video can be used to learn them."
@@ -0,0 +1,158 @@
+"""
+Map-reduce summarization of long transcripts.
+
+Asking for a whole hour-long talk in one response runs into output limits.
+Instead the transcript is split into time-aligned chunks (five minutes
+each), the chunks are summarized concurrently with at most MAX_CONCURRENCY
+model calls in flight (map), and the chunk summaries are merged into one
+timestamped outline (reduce).
+
+Chunk summaries are stored in the persistent summary cache under the video
+ID and the chunk's start time, tagged with the hash of the chunk text, so a
+re-run only calls the model for chunks that are new, changed, or failed
+last time. A chunk whose call fails falls back to its extractive key points
+and is not cached.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+from google.genai.client import Client
+
+from common.summary_cache import content_hash, get_cache
+from manager.sub_agents.youtube_summarizer.transcripts import (
+    CHUNK_SECONDS, MODEL, Segment, Transcript, chunk_segments, format_timestamp, key_points,
+)
+
+MAX_CONCURRENCY = int(os.environ.get("YOUTUBE_MAP_CONCURRENCY", "4"))
+# Part of every cache key: bump it when the prompts change so old summaries are redone.
+PROMPT_VERSION = "1"
+
+MAP_PROMPT = """Summarize this excerpt of a video transcript ({start} to {end}) in 2 to 4 bullet points.
+Keep technical terms and name any tools, CVEs or products mentioned. Reply with the bullet points only.
+
+{text}"""
+
+REDUCE_PROMPT = """Below are summaries of consecutive sections of one video, each headed by its time range.
+Write a timestamped outline of the whole video: one line per topic in the form '[MM:SS] topic - one sentence',
+merging neighbouring sections that cover the same topic. Then add a paragraph headed 'Overview:' that
+summarizes the video as a whole.
+
+{sections}"""
+
+
+def _chunk_text(chunk: List[Segment]) -> str:
+    return "\n".join(f"[{format_timestamp(s.start)}] {s.text}" for s in chunk)
+
+
+def _chunk_key(video_id: str, chunk: List[Segment]) -> str:
+    return f"youtube://{video_id}/chunks/{int(chunk[0].start)}"
+
+
+def map_chunks(transcript: Transcript, client_factory: Callable[[], Client],
+               chunk_seconds: float = CHUNK_SECONDS, max_concurrency: int = MAX_CONCURRENCY) -> List[dict]:
+    """Summarize every chunk, from the cache where possible; returns one entry per chunk in order."""
+    chunks = chunk_segments(transcript.segments, chunk_seconds)
+    cache = get_cache()
+    sections = []
+    for i, chunk in enumerate(chunks):
+        end = chunks[i + 1][0].start if i + 1 < len(chunks) else chunk[-1].start
+        text = _chunk_text(chunk)
+        sections.append({
+            "start": format_timestamp(chunk[0].start),
+            "end": format_timestamp(end),
+            "key": _chunk_key(transcript.video_id, chunk),
+            "hash": content_hash(PROMPT_VERSION + text),
+            "text": text,
+            "chunk": chunk,
+        })
+
+    todo = []
+    for section in sections:
+        cached = cache.get(section["key"], section["hash"])
+        if cached and cached["llm_summary"]:
+            section.update(summary=cached["llm_summary"], source="cache")
+        else:
+            todo.append(section)
+
+    if todo:
+        try:
+            client = client_factory()
+        except Exception as e:
+            client, client_error = None, f"{type(e).__name__}: {e}"
+
+        def summarize_one(section: dict) -> None:
+            if client is None:
+                raise RuntimeError(client_error)
+            response = client.models.generate_content(
+                model=MODEL,
+                contents=MAP_PROMPT.format(start=section["start"], end=section["end"], text=section["text"]),
+            )
+            if not (response.text or "").strip():
+                raise RuntimeError("empty response")
+            section.update(summary=response.text.strip(), source="model")
+            cache.put(section["key"], section["hash"], extracted_text=section["text"], llm_summary=section["summary"])
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(todo))), thread_name_prefix="yt-map") as pool:
+            futures = [(section, pool.submit(summarize_one, section)) for section in todo]
+            for section, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    # Keep the outline complete; the next run retries this chunk
+                    points = key_points(section["chunk"])
+                    section.update(summary="\n".join(f"- {p}" for p in points), source="extractive",
+                                   error=f"{type(e).__name__}: {e}")
+
+    for section in sections:
+        del section["text"], section["chunk"], section["key"], section["hash"]
+    return sections
+
+
+def reduce_sections(video_id: str, sections: List[dict], client_factory: Callable[[], Client]) -> str:
+    """Merge the chunk summaries into one timestamped outline; cached like the chunks."""
+    body = "\n\n".join(f"[{s['start']} - {s['end']}]\n{s['summary']}" for s in sections)
+    if any(s["source"] == "extractive" for s in sections):
+        # Do not cache an outline built on fallback summaries
+        digest = None
+    else:
+        digest = content_hash(PROMPT_VERSION + body)
+        cached = get_cache().get(f"youtube://{video_id}/outline", digest)
+        if cached and cached["llm_summary"]:
+            return cached["llm_summary"]
+    response = client_factory().models.generate_content(model=MODEL, contents=REDUCE_PROMPT.format(sections=body))
+    outline = (response.text or "").strip()
+    if digest and outline:
+        get_cache().put(f"youtube://{video_id}/outline", digest, llm_summary=outline)
+    return outline
+
+
+def summarize(transcript: Transcript, client_factory: Callable[[], Client]) -> dict:
+    """Run map and reduce; a failed reduce returns the section summaries on their own."""
+    start = time.perf_counter()
+    sections = map_chunks(transcript, client_factory)
+    map_s = time.perf_counter() - start
+    try:
+        outline, reduce_error = reduce_sections(transcript.video_id, sections, client_factory), ""
+    except Exception as e:
+        outline, reduce_error = "", f"{type(e).__name__}: {e}"
+    if not outline:
+        outline = "\n".join(f"[{s['start']}] {s['summary']}" for s in sections)
+    sources = [s["source"] for s in sections]
+    result = {
+        "outline": outline,
+        "sections": sections,
+        "chunks": {
+            "total": len(sections),
+            "cached": sources.count("cache"),
+            "summarized": sources.count("model"),
+            "failed": sources.count("extractive"),
+        },
+        "map_seconds": round(map_s, 3),
+        "reduce_seconds": round(time.perf_counter() - start - map_s, 3),
+    }
+    if reduce_error:
+        result["reduce_error"] = reduce_error
+    return result
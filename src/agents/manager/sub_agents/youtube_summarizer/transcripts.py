@@ -0,0 +1,284 @@
+"""
+Tiered transcription behind transcribe_video.
+
+Sending the whole video to Gemini is the slowest and most expensive way to
+get a transcript (video is billed at roughly ten times the tokens per second
+of audio), and most videos already have captions. Tiers are tried cheapest
+first and the first that yields text wins:
+
+    captions  published or auto-generated captions (youtube_transcript_api)
+    audio     the audio track only, downloaded with yt-dlp and transcribed
+              by Gemini (skipped if yt-dlp is not installed)
+    video     the full video as file_data, as transcribe_video did originally
+
+Every attempted tier is timed. Only the winning tier's segments are
+summarized (see mapreduce.py).
+"""
+
+import os
+import re
+import tempfile
+import time
+from typing import Callable, Dict, List, NamedTuple
+from urllib.parse import parse_qs, urlparse
+
+from google.genai import types
+from google.genai.client import Client
+
+from common.extractive import WORD_RE, split_sentences, summarize, term_matrix, textrank_scores
+
+try:
+    from youtube_transcript_api import NoTranscriptFound, YouTubeTranscriptApi
+except ImportError:
+    YouTubeTranscriptApi = None
+
+try:
+    import yt_dlp
+except ImportError:
+    yt_dlp = None
+
+TIERS = ("captions", "audio", "video")
+MODEL = "gemini-2.0-flash"
+CAPTION_LANGUAGES = ("en", "en-US", "en-GB")
+CHUNK_SECONDS = 300
+POINTS_PER_CHUNK = 2
+MAX_AUDIO_BYTES = 200 * 1024 * 1024
+UPLOAD_POLL_SECONDS = 2
+UPLOAD_TIMEOUT = 300
+
+VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+TIMESTAMP_LINE_RE = re.compile(r"^\s*[\[(]?(?:(\d{1,2}):)?(\d{1,2}):(\d{2})[\])]?\s*[-:]?\s*(.+)$")
+
+AUDIO_PROMPT = (
+    "Transcribe the speech in this audio. Write one line per utterance in the form "
+    "'[MM:SS] text', using the time the utterance starts. Do not add commentary."
+)
+VIDEO_PROMPT = (
+    "Transcribe the audio from this video. Write one line per utterance or salient event in the form "
+    "'[MM:SS] text', using the time it starts. Include short visual descriptions of salient events "
+    "in square brackets on their own timestamped lines."
+)
+
+
+class Segment(NamedTuple):
+    start: float  # seconds from the start of the video
+    text: str
+
+
+class Transcript(NamedTuple):
+    tier: str
+    video_id: str
+    segments: List[Segment]
+    language: str
+
+
+class TierUnavailable(Exception):
+    """The tier cannot produce a transcript for this video; try the next one."""
+
+
+def video_id(url: str) -> str:
+    """Return the 11-character video ID of a YouTube watch, short, embed or youtu.be URL."""
+    if VIDEO_ID_RE.match(url):
+        return url
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    parts = [p for p in parsed.path.split("/") if p]
+    if host.endswith("youtu.be") and parts:
+        candidate = parts[0]
+    elif "v" in parse_qs(parsed.query):
+        candidate = parse_qs(parsed.query)["v"][0]
+    elif len(parts) >= 2 and parts[0] in ("shorts", "embed", "live", "v"):
+        candidate = parts[1]
+    else:
+        candidate = ""
+    if not VIDEO_ID_RE.match(candidate):
+        raise ValueError(f"Not a YouTube video URL: {url}")
+    return candidate
+
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours}:{rest // 60:02d}:{rest % 60:02d}" if hours else f"{rest // 60:02d}:{rest % 60:02d}"
+
+
+def parse_timestamped_lines(text: str) -> List[Segment]:
+    """Parse '[MM:SS] text' lines written by the model; untimed lines join the previous segment."""
+    segments = []
+    for line in text.splitlines():
+        match = TIMESTAMP_LINE_RE.match(line)
+        if match:
+            hours, minutes, secs, body = match.groups()
+            start = int(hours or 0) * 3600 + int(minutes) * 60 + int(secs)
+            segments.append(Segment(float(start), body.strip()))
+        elif line.strip() and segments:
+            last = segments[-1]
+            segments[-1] = Segment(last.start, f"{last.text} {line.strip()}")
+        elif line.strip():
+            segments.append(Segment(0.0, line.strip()))
+    return segments
+
+
+# -------------------- Tiers --------------------
+def captions_tier(url: str, client: Client) -> Transcript:
+    if YouTubeTranscriptApi is None:
+        raise TierUnavailable("youtube_transcript_api is not installed")
+    vid = video_id(url)
+    api = YouTubeTranscriptApi()
+    try:
+        transcripts = api.list(vid)
+        try:
+            # Prefers manually created captions over auto-generated ones
+            transcript = transcripts.find_transcript(CAPTION_LANGUAGES)
+        except NoTranscriptFound:
+            transcript = next(iter(transcripts))
+        fetched = transcript.fetch()
+    except StopIteration:
+        raise TierUnavailable("no captions published")
+    except Exception as e:
+        raise TierUnavailable(f"{type(e).__name__}: {e}") from e
+    segments = [Segment(s.start, s.text.replace("\n", " ")) for s in fetched if s.text.strip()]
+    if not segments:
+        raise TierUnavailable("captions are empty")
+    return Transcript("captions", vid, segments, transcript.language_code)
+
+
+def _wait_until_active(client: Client, uploaded):
+    deadline = time.monotonic() + UPLOAD_TIMEOUT
+    while uploaded.state and uploaded.state.name == "PROCESSING":
+        if time.monotonic() > deadline:
+            raise TimeoutError("uploaded audio was not processed in time")
+        time.sleep(UPLOAD_POLL_SECONDS)
+        uploaded = client.files.get(name=uploaded.name)
+    if uploaded.state and uploaded.state.name == "FAILED":
+        raise RuntimeError("Gemini could not process the uploaded audio")
+    return uploaded
+
+
+def audio_tier(url: str, client: Client) -> Transcript:
+    if yt_dlp is None:
+        raise TierUnavailable("yt-dlp is not installed")
+    vid = video_id(url)
+    with tempfile.TemporaryDirectory(prefix="yt-audio-") as tmp:
+        options = {
+            "format": "bestaudio[ext=m4a]/bestaudio",
+            "outtmpl": os.path.join(tmp, "%(id)s.%(ext)s"),
+            "max_filesize": MAX_AUDIO_BYTES,
+            "quiet": True,
+            "noprogress": True,
+            "noplaylist": True,
+        }
+        try:
+            with yt_dlp.YoutubeDL(options) as ydl:
+                info = ydl.extract_info(f"https://www.youtube.com/watch?v={vid}", download=True)
+                path = ydl.prepare_filename(info)
+        except Exception as e:
+            raise TierUnavailable(f"audio download failed: {e}") from e
+        if not os.path.exists(path):
+            raise TierUnavailable("audio stream larger than the download limit")
+        uploaded = _wait_until_active(client, client.files.upload(file=path))
+    try:
+        response = client.models.generate_content(
+            model=MODEL,
+            contents=[types.Part(file_data=types.FileData(file_uri=uploaded.uri, mime_type=uploaded.mime_type)),
+                      types.Part(text=AUDIO_PROMPT)],
+        )
+    finally:
+        try:
+            client.files.delete(name=uploaded.name)
+        except Exception:
+            pass  # uploads expire on their own after 48 hours
+    segments = parse_timestamped_lines(response.text or "")
+    if not segments:
+        raise TierUnavailable("empty audio transcription")
+    return Transcript("audio", vid, segments, "")
+
+
+def video_tier(url: str, client: Client) -> Transcript:
+    response = client.models.generate_content(
+        model=MODEL,
+        contents=types.Content(
+            parts=[
+                types.Part(file_data=types.FileData(file_uri=url, mime_type="video/mp4")),
+                types.Part(text=VIDEO_PROMPT),
+            ]
+        ),
+    )
+    segments = parse_timestamped_lines(response.text or "")
+    if not segments:
+        raise TierUnavailable("empty video transcription")
+    return Transcript("video", video_id(url), segments, "")
+
+
+TIER_FUNCTIONS: Dict[str, Callable[[str, Client], Transcript]] = {
+    "captions": captions_tier,
+    "audio": audio_tier,
+    "video": video_tier,
+}
+
+
+def transcribe(url: str, client_factory: Callable[[], Client], mode: str = "auto"):
+    """Return (transcript, metrics) from the first tier that succeeds.
+
+    mode is "auto" (captions, then audio, then video) or a single tier name.
+    metrics maps each attempted tier to its status, latency and error. The
+    Gemini client is only built if a tier needs it. transcript is None if
+    every tier failed.
+    """
+    tiers = TIERS if mode == "auto" else (mode,)
+    if any(t not in TIER_FUNCTIONS for t in tiers):
+        raise ValueError(f"Unknown mode {mode!r}; expected 'auto' or one of {', '.join(TIERS)}")
+    client = None
+    metrics = {}
+    for tier in tiers:
+        start = time.perf_counter()
+        try:
+            if tier != "captions" and client is None:
+                client = client_factory()
+            transcript = TIER_FUNCTIONS[tier](url, client)
+        except TierUnavailable as e:
+            metrics[tier] = {"status": "unavailable", "seconds": round(time.perf_counter() - start, 3), "error": str(e)}
+            continue
+        except Exception as e:
+            metrics[tier] = {"status": "error", "seconds": round(time.perf_counter() - start, 3),
+                             "error": f"{type(e).__name__}: {e}"}
+            continue
+        metrics[tier] = {"status": "success", "seconds": round(time.perf_counter() - start, 3),
+                         "segments": len(transcript.segments)}
+        return transcript, metrics
+    return None, metrics
+
+
+# -------------------- Chunking and summaries --------------------
+def chunk_segments(segments: List[Segment], window_seconds: float = CHUNK_SECONDS) -> List[List[Segment]]:
+    """Group consecutive segments into windows of about window_seconds."""
+    chunks, current = [], []
+    for segment in segments:
+        if current and segment.start - current[0].start >= window_seconds:
+            chunks.append(current)
+            current = []
+        current.append(segment)
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def key_points(segments: List[Segment], n: int = POINTS_PER_CHUNK) -> List[str]:
+    """The n most central sentences of a chunk.
+
+    Auto-generated captions have no punctuation, so when the chunk does not
+    split into enough sentences the caption lines themselves are ranked.
+    """
+    text = " ".join(s.text for s in segments)
+    if len(split_sentences(text)) >= n:
+        return summarize(text, num_sentences=n)
+    lines = [s.text for s in segments if len(WORD_RE.findall(s.text)) >= 3] or [s.text for s in segments]
+    if len(lines) <= n:
+        return lines
+    scores = textrank_scores(term_matrix(lines))
+    top = sorted(range(len(lines)), key=lambda i: -scores[i])[:n]
+    return [lines[i] for i in sorted(top)]
+
+
+def as_text(transcript: Transcript) -> str:
+    return "\n".join(f"[{format_timestamp(s.start)}] {s.text}" for s in transcript.segments)
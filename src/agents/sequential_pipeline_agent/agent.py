@@ -1,6 +1,7 @@
 from google.adk.agents import Agent, LlmAgent, ParallelAgent, SequentialAgent 
 from google.adk.tools.tool_context import ToolContext
 from google.adk.tools import google_search
+import common.scheduled_gemini  # noqa: F401  (gemini-* models go through the shared LLM scheduler)
 
 # --- Existing YouTube Summarizer Agent ---
 youtube_summarizer = Agent(
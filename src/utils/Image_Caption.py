@@ -1,24 +1,36 @@
+import json
+import os
+import sys
+
 from google.genai import types
-from google.genai.client import Client
 
-# Create a client instance
-client = Client(api_key="Your API Key")
+# Shared, lazily built client configured from GOOGLE_API_KEY (src/agents/common/genai_client.py);
+# run with PYTHONPATH=src/agents, like the agents
+from common.genai_client import get_client
+from common.image_batch import MODEL, PROMPT, caption_directory, prepare
+
+# An image file, or a directory to caption in batch (deduplicated, cached; see common/image_batch.py)
+path = sys.argv[1] if len(sys.argv) > 1 else '/home/administrator/workspace/Shreya/Agentic_AI/Agentic_AI/sample.png'
 
-# Load the image file
-with open('/home/administrator/workspace/Shreya/Agentic_AI/Agentic_AI/sample.png', 'rb') as f:
-    image_bytes = f.read()
+if os.path.isdir(path):
+    report = caption_directory(path)
+    for result in report.pop("results"):
+        print(json.dumps(result, ensure_ascii=False))
+    print(json.dumps(report))
+else:
+    # Downscaled and re-encoded if needed, with the MIME type taken from the file contents
+    image = prepare(path)
+    if image.error:
+        sys.exit(f"{path}: {image.error}")
 
-# Generate a caption for the image
-response = client.models.generate_content(
-    model='gemini-2.0-flash',
-    contents=[
-        types.Part.from_bytes(
-            data=image_bytes,
-            mime_type='image/png',  # Update the mime type to 'image/png'
-        ),
-        'Caption this image.'
-    ]
-)
+    # Generate a caption for the image
+    response = get_client().models.generate_content(
+        model=MODEL,
+        contents=[
+            types.Part.from_bytes(data=image.data, mime_type=image.mime_type),
+            PROMPT,
+        ]
+    )
 
-# Print the generated caption
-print(response.text)
+    # Print the generated caption
+    print(response.text)
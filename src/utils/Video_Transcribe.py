@@ -1,7 +1,10 @@
 from google.genai import types
-from google.genai.client import Client
 
-client = Client(api_key="Your API Key")
+# Shared, lazily built client configured from GOOGLE_API_KEY (src/agents/common/genai_client.py);
+# run with PYTHONPATH=src/agents, like the agents
+from common.genai_client import get_client, stats
+
+client = get_client()
 
 response = client.models.generate_content(
     model='models/gemini-2.0-flash',
@@ -16,3 +19,4 @@ response = client.models.generate_content(
 )
 
 print(response.text)
+print(stats())
@@ -2,7 +2,7 @@
 """
 CVE Intelligence Report Generator (single-file)
 - Uses Gemini 2.0 Flash via google-genai
-- Hardcode your API key below (local testing only)
+- API key from GOOGLE_API_KEY (or GEMINI_API_KEY) in the environment
 - Produces PDF only: concise (2-page aimed) or detailed report
 """
 
@@ -14,26 +14,26 @@ from typing import Dict
 import streamlit as st
 from fpdf import FPDF
 
-# IMPORTANT: Replace with your Gemini API key (for local testing only).
-# Do NOT commit this file with your real key to a public repo.
-API_KEY = "API Key"  # <-- REPLACE WITH YOUR KEY
+# Gemini API key; leave unset to use the shared client's environment configuration.
+API_KEY = os.environ.get("GOOGLE_API_KEY") or os.environ.get("GEMINI_API_KEY", "")
 
 # Model name (as requested)
 MODEL_NAME = "gemini-2.0-flash"
 
-# try importing google-genai and create a client
+# try importing the shared google-genai client (src/agents/common/genai_client.py; needs PYTHONPATH=src/agents)
 try:
-    from google import genai
+    from common.genai_client import get_client
+    from common.llm_scheduler import BATCH, priority
 except Exception as exc:
-    genai = None
+    get_client = None
     _genai_import_exc = exc
 
 # -------------------- Helper utilities --------------------
 def init_client(api_key: str):
-    if genai is None:
-        raise RuntimeError(f"google-genai is not installed: {_genai_import_exc}")
-    # create single client explicitly with api_key
-    return genai.Client(api_key=api_key)
+    if get_client is None:
+        raise RuntimeError(f"Shared google-genai client unavailable (run with PYTHONPATH=src/agents): {_genai_import_exc}")
+    # one client per process: Streamlit reruns this script on every interaction
+    return get_client(api_key=api_key or None)
 
 def get_response_text(resp) -> str:
     """
@@ -76,10 +76,12 @@ def call_model(client, prompt: str) -> str:
     Do NOT pass unsupported kwargs like temperature to generate_content.
     """
     try:
-        resp = client.models.generate_content(
-            model=MODEL_NAME,
-            contents=prompt
-        )
+        # Reports wait behind interactive agent requests sharing the scheduler
+        with priority(BATCH):
+            resp = client.models.generate_content(
+                model=MODEL_NAME,
+                contents=prompt
+            )
         return get_response_text(resp) or ""
     except Exception as e:
         # return an error marker so the PDF shows the issue
@@ -128,6 +130,18 @@ def build_mitigation_prompt(cve_id: str, concise: bool) -> str:
         + ("\nKeep concise." if concise else "\nProvide thorough implementation details.")
     )
 
+def threat_chain_layout(cve_id: str):
+    """Diagram layout of the top ATT&CK chains for the CVE from the local MITRE KB, or None if unavailable."""
+    try:
+        from common.chain_render import layout
+        from common.mitre_kb import get_kb
+        from common.threat_chains import cached_chains
+
+        chains = cached_chains(cve_id, get_kb())["chains"]
+    except Exception:
+        return None
+    return layout([[cve_id] + c["ttp_ids"] for c in chains[:3]]) if chains else None
+
 def build_references_prompt(cve_id: str) -> str:
     return f"List all references (title + full URL) you used to support claims about {cve_id}. Number them and include source type (NVD/MITRE/GitHub/Blog/Exploit-DB/etc.)."
 
@@ -173,6 +187,20 @@ class PDFReport:
             self.pdf.multi_cell(epw, 5, para)
             self.pdf.ln(1)
 
+    def add_chain_diagram(self, heading: str, layout):
+        # Same layout as the threat_chain_visualizer SVG (common/chain_render.py), drawn natively
+        from common.chain_render import draw_pdf, pdf_scale
+
+        epw = self.pdf.w - self.pdf.l_margin - self.pdf.r_margin
+        self.pdf.set_font("Arial", "B", 12)
+        self.pdf.multi_cell(epw, 7, heading)
+        self.pdf.ln(1)
+        if self.pdf.get_y() + layout.height * pdf_scale(layout, epw) > self.pdf.h - self.pdf.b_margin:
+            self.pdf.add_page()
+        top = self.pdf.get_y()
+        used = draw_pdf(self.pdf, layout, self.pdf.l_margin, top, epw)
+        self.pdf.set_xy(self.pdf.l_margin, top + used + 3)
+
     def output_bytes(self) -> bytes:
         # FPDF.output(dest="S") returns a bytearray in recent versions
         return bytes(self.pdf.output(dest="S"))
@@ -184,7 +212,7 @@ st.title("CVE Intelligence PDF Generator — Gemini 2.0 Flash")
 st.markdown(
     """
 **Notes**
-- The API key is hardcoded in this script (top `API_KEY` variable). Replace it before running.
+- The API key is read from `GOOGLE_API_KEY` (or `GEMINI_API_KEY`). Set it before running.
 - The app calls Gemini 2.0 Flash. Be mindful of API usage/costs.
 """
 )
@@ -197,14 +225,10 @@ generate_btn = st.button("Generate PDF Report")
 # Validate client initialization
 client = None
 client_error = None
-if API_KEY.startswith("ya29.") or (API_KEY and not API_KEY.startswith("ya29.")):
-    # attempt to init; if API_KEY not replaced, still attempt but show warning later
-    try:
-        client = init_client(API_KEY)
-    except Exception as e:
-        client_error = str(e)
-else:
-    client_error = "Please set your API_KEY at the top of the script."
+try:
+    client = init_client(API_KEY)
+except Exception as e:
+    client_error = f"{e} (set GOOGLE_API_KEY, or GOOGLE_GENAI_USE_VERTEXAI with a project and location)"
 
 if client_error:
     st.error(f"GenAI client initialization error: {client_error}")
@@ -268,6 +292,9 @@ if generate_btn:
                 pdf.add_section("1) CVE Overview", outputs.get("Overview", "No data"))
                 pdf.add_section("2) Exploitability / PoC (detailed)", outputs.get("PoCs", "No data"))
                 pdf.add_section("3) MITRE ATT&CK Mapping & TTPs", outputs.get("MITRE Mapping", "No data"))
+                chain_layout = threat_chain_layout(cve_input.strip())
+                if chain_layout is not None:
+                    pdf.add_chain_diagram("Top ATT&CK chains (local MITRE knowledge base)", chain_layout)
                 pdf.add_section("4) Exploitation Scenarios", outputs.get("Exploitation Scenarios", "No data"))
                 pdf.add_section("5) Mitigation & Detection", outputs.get("Mitigation & Detection", "No data"))
                 pdf.add_section("6) References", outputs.get("References", "No data"))
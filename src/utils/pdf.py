@@ -2,12 +2,17 @@ import streamlit as st
 import requests
 from requests.exceptions import RequestException, Timeout
 import json
+import os
 import time
 import io
 from datetime import datetime, timedelta
 import random
 import re
 
+# The summary cache is shared with the agents (src/agents/common); run with PYTHONPATH=src/agents
+from common.summary_cache import content_hash, get_cache
+from common.llm_scheduler import BATCH, estimate_tokens, get_scheduler, request_key, retry_after
+
 st.set_page_config(page_title="Research and Summarization Agent", layout="wide")
 
 # App styling: inject a compact CSS theme to improve visuals (no icons, just clean styling)
@@ -72,18 +77,29 @@ a { color: #2563eb !important; text-decoration: none; }
 
 # Configuration
 GEMINI_API_KEY = ""  # Replace with your actual Gemini API key
+# Cached research older than this is generated again: the model's answers about a topic go stale
+RESEARCH_CACHE_TTL_S = float(os.environ.get("RESEARCH_CACHE_TTL_HOURS", "24")) * 3600
 
 class ResearchAgent:
     def __init__(self, api_key):
         self.api_key = api_key
-        self.endpoint = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
+        self.model = "gemini-2.0-flash"
+        self.endpoint = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}:generateContent"
         self.headers = {"Content-Type": "application/json"}
+        self.use_cache = True
     
     def call_gemini(self, prompt):
-        """Make API call to Gemini with retries and exponential backoff.
+        """Make API call to Gemini through the shared LLM scheduler, at batch priority.
 
+        The scheduler paces calls to the RPM/TPM limits, waits out 429s for
+        every caller at once and shares an identical prompt already in flight;
+        timeouts and 5xx are retried with exponential backoff.
         Returns the text on success or a descriptive error string on failure.
         """
+        scheduler = get_scheduler()
+        return scheduler.shared(self.model, request_key(self.model, prompt), lambda: self._call_gemini(scheduler, prompt))
+
+    def _call_gemini(self, scheduler, prompt):
         payload = {
             "contents": [
                 {"role": "user", "parts": [{"text": prompt}]}
@@ -93,6 +109,7 @@ class ResearchAgent:
         max_retries = 3
         base_timeout = 60  # seconds per request
         for attempt in range(1, max_retries + 1):
+            grant = scheduler.acquire(self.model, estimate_tokens(prompt), BATCH)
             try:
                 resp = requests.post(
                     f"{self.endpoint}?key={self.api_key}",
@@ -103,15 +120,26 @@ class ResearchAgent:
 
                 if resp.status_code == 200:
                     try:
-                        return resp.json()["candidates"][0]["content"]["parts"][0]["text"]
+                        body = resp.json()
+                        scheduler.settle(grant, body.get("usageMetadata", {}).get("totalTokenCount"))
+                        return body["candidates"][0]["content"]["parts"][0]["text"]
                     except Exception:
                         return f"Error: unexpected response format (status=200)."
 
                 # Non-200 response: for 429 or 5xx we retry, otherwise return error
                 status = resp.status_code
                 text = resp.text
-                if status in (429, 500, 502, 503, 504):
-                    # Retryable server-side or rate limit errors
+                if status == 429:
+                    # Rate limited: pause the model for every caller for as long as the API asked;
+                    # the next acquire waits it out
+                    try:
+                        body = resp.json()
+                    except ValueError:
+                        body = None
+                    scheduler.throttled(self.model, retry_after(resp.headers, body))
+                    continue
+                if status in (500, 502, 503, 504):
+                    # Retryable server-side errors
                     wait = (2 ** (attempt - 1)) + random.uniform(0, 1)
                     time.sleep(wait)
                     continue
@@ -134,6 +162,25 @@ class ResearchAgent:
                 return f"Network error: {str(e)}"
 
         return "Error: failed to get a response after multiple attempts."
+
+    def call_gemini_cached(self, kind, topic, prompt):
+        """call_gemini through the persistent summary cache.
+
+        Entries are keyed by research kind and normalized topic and invalidated
+        when the prompt changes or after RESEARCH_CACHE_TTL_S, so repeating a
+        recent search costs no model call. With use_cache off the model is
+        always called and its answer replaces the cached one.
+        """
+        key = f"research://{kind}/{' '.join(topic.lower().split())}"
+        digest = content_hash(prompt)
+        cached = get_cache().get(key, digest, max_age=RESEARCH_CACHE_TTL_S) if self.use_cache else None
+        if cached and cached["llm_summary"]:
+            return cached["llm_summary"]
+        result = self.call_gemini(prompt)
+        # Error strings are returned in place of text; never cache them
+        if not result.startswith(("Error", "API Error", "Network error")):
+            get_cache().put(key, digest, llm_summary=result)
+        return result
     
     def research_web_articles(self, topic):
         """Generate web article research using Gemini"""
@@ -197,7 +244,7 @@ class ResearchAgent:
         
         Focus on providing deep technical content that goes beyond general explanations. Each source should offer specific, actionable technical information about "{topic}".
         """
-        return self.call_gemini(prompt)
+        return self.call_gemini_cached("web-articles", topic, prompt)
     
     def research_youtube_content(self, topic):
         """Generate YouTube content research using Gemini"""
@@ -261,7 +308,7 @@ class ResearchAgent:
         
         Focus on technical educational content that provides deep implementation details and practical knowledge about "{topic}".
         """
-        return self.call_gemini(prompt)
+        return self.call_gemini_cached("youtube", topic, prompt)
     
     def research_github_repos(self, topic):
         """Generate GitHub repository research using Gemini"""
@@ -325,7 +372,7 @@ class ResearchAgent:
         
         Focus on providing deep technical analysis of code implementations and practical usage for "{topic}".
         """
-        return self.call_gemini(prompt)
+        return self.call_gemini_cached("github", topic, prompt)
     
     def research_reddit_discussions(self, topic):
         """Generate Reddit discussion research using Gemini"""
@@ -389,7 +436,7 @@ class ResearchAgent:
         
         Focus on real-world practitioner experiences and community-driven technical insights about "{topic}".
         """
-        return self.call_gemini(prompt)
+        return self.call_gemini_cached("reddit", topic, prompt)
     
     def research_twitter_content(self, topic):
         """Generate Twitter/X content research using Gemini"""
@@ -453,7 +500,7 @@ class ResearchAgent:
         
         Focus on high-level expert insights and industry-grade technical analysis of "{topic}".
         """
-        return self.call_gemini(prompt)
+        return self.call_gemini_cached("twitter", topic, prompt)
     
     def generate_comprehensive_analysis(self, topic, research_data):
         """Generate final comprehensive analysis"""
@@ -494,7 +541,7 @@ class ResearchAgent:
 
         Make this report comprehensive, technical, and actionable. Use the research data to support all claims and recommendations.
         """
-        return self.call_gemini(prompt)
+        return self.call_gemini_cached("analysis", topic, prompt)
 
 def main():
     # Initialize the research agent
@@ -591,6 +638,11 @@ def main():
         with col5:
             platforms["Twitter/X"] = st.checkbox("Twitter/X", value=False)
         research_platforms = [platform for platform, selected in platforms.items() if selected]
+        agent.use_cache = not st.checkbox(
+            "Ignore cached research",
+            value=False,
+            help=f"Research on a topic is reused for {RESEARCH_CACHE_TTL_S / 3600:g} hours; tick to ask the model again",
+        )
 
         st.markdown("<hr>", unsafe_allow_html=True)
         st.markdown("<div style='color:#888;font-size:15px;text-align:center;'></div>", unsafe_allow_html=True)